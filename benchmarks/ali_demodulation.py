@@ -0,0 +1,62 @@
+"""
+Compares the vectorized AOLP/DOLP demodulation used by the ALI L1bGeneratorILS against the previous
+implementation that fits and evaluates a spline one line of sight at a time.
+
+    python benchmarks/ali_demodulation.py
+"""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from hawcsimulator.ali.inst_model import _demodulate_loop, demodulate
+
+
+def _modulation(num_los: int, wavelength: np.ndarray) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    aolp = rng.uniform(0, np.pi, num_los)
+    dolp = rng.uniform(0.01, 0.5, num_los)
+    intensity = 1 + 0.1 * np.sin(wavelength / 50)[:, np.newaxis]
+
+    return (
+        intensity
+        * dolp
+        * np.cos(2 * np.pi * 13000 / wavelength[:, np.newaxis] + 2 * aolp)
+    )
+
+
+def _time(fn, *args, repeats: int = 5) -> float:
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    wavelength = np.arange(450, 800, 1.0)
+
+    # Compile the kernel before timing
+    demodulate(wavelength, _modulation(1, wavelength))
+
+    print(f"{'num_los':>8} {'loop [ms]':>10} {'vectorized [ms]':>16} {'speedup':>8}")  # noqa: T201
+    for num_los in (10, 60, 200):
+        modulation = _modulation(num_los, wavelength)
+
+        loop_result = _demodulate_loop(wavelength, modulation)
+        result = demodulate(wavelength, modulation)
+        for a, b in zip(loop_result, result, strict=True):
+            np.testing.assert_array_equal(a, b)
+
+        loop = _time(_demodulate_loop, wavelength, modulation)
+        vectorized = _time(demodulate, wavelength, modulation)
+        print(  # noqa: T201
+            f"{num_los:>8} {loop * 1000:>10.1f} {vectorized * 1000:>16.1f} {loop / vectorized:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares the accuracy and speed of the two AOLP/DOLP demodulation methods of the ALI L1bGeneratorILS,
+the zero crossing method (`demodulate`) and Fourier filtering around the carrier (`demodulate_fft`).
+
+    python benchmarks/ali_fft_demodulation.py
+
+The zero crossing method only determines the AOLP up to a multiple of pi/4, so its AOLP error is
+reported modulo pi/4.  Errors are medians over the lines of sight and the wavelengths where the method
+returns a value.
+"""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from hawcsimulator.ali.inst_model import demodulate, demodulate_fft
+
+
+def _truth(num_los: int, wavelength: np.ndarray):
+    rng = np.random.default_rng(0)
+    aolp = rng.uniform(0, np.pi, num_los)
+    dolp = rng.uniform(0.01, 0.5, num_los)
+    intensity = 1 + 0.1 * np.sin(wavelength / 50)[:, np.newaxis]
+
+    modulation = (
+        intensity
+        * dolp
+        * np.cos(2 * np.pi * 13000 / wavelength[:, np.newaxis] + 2 * aolp)
+    )
+    return modulation, aolp, (intensity * dolp).T
+
+
+def _time(fn, *args, repeats: int = 5) -> float:
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _errors(result, aolp, dolp, period):
+    result_aolp, result_dolp = result
+    aolp_error = (result_aolp - aolp[:, np.newaxis] + period / 2) % period - period / 2
+    dolp_error = np.abs(result_dolp - dolp) / dolp
+    return np.nanmedian(np.abs(aolp_error)), np.nanmedian(dolp_error)
+
+
+def main() -> None:
+    wavelength = np.arange(450, 800, 1.0)
+
+    # Compile the kernel before timing
+    demodulate(wavelength, _truth(1, wavelength)[0])
+
+    print(  # noqa: T201
+        f"{'num_los':>8} {'method':>14} {'time [ms]':>10} {'AOLP err [rad]':>15} {'DOLP rel err':>13}"
+    )
+    for num_los in (10, 60, 200):
+        modulation, aolp, dolp = _truth(num_los, wavelength)
+        for name, fn, period in (
+            ("zero_crossing", demodulate, np.pi / 4),
+            ("fft", demodulate_fft, np.pi),
+        ):
+            aolp_error, dolp_error = _errors(fn(wavelength, modulation), aolp, dolp, period)
+            elapsed = _time(fn, wavelength, modulation)
+            print(  # noqa: T201
+                f"{num_los:>8} {name:>14} {elapsed * 1000:>10.1f} {aolp_error:>15.2e} {dolp_error:>13.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
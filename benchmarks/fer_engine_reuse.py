@@ -0,0 +1,111 @@
+"""
+Compares FERGeneratorBasic, which constructs a new sasktran2 Engine for every scene, against
+PersistentFERGenerator which reuses the engine when only the atmosphere changes.  Three sequences of
+scenes are run: only the surface albedo changes, the temperature profile alternates between two states
+(so the refractive index changes), and the solar zenith angle changes every scene as along an orbit,
+where nothing can be reused.
+
+    python benchmarks/fer_engine_reuse.py
+"""
+
+from __future__ import annotations
+
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import sasktran2 as sk
+
+from hawcsimulator.fer import FERGeneratorBasic, PersistentFERGenerator
+from hawcsimulator.geometry.observation import SimulatedObservationGeometry
+
+
+def _observation(sza: float = 60.0):
+    viewing_geo = sk.viewinggeo.LimbVertical.from_tangent_parameters(
+        solar_handler=sk.solar.SolarGeometryHandlerForced(sza, 0.0),
+        tangent_altitudes=np.arange(0, 40001, 500.0),
+        tangent_latitude=30.0,
+        tangent_longitude=0.0,
+        time=pd.Timestamp("2022-01-01T12:00:00Z"),
+        observer_altitude=450000.0,
+        viewing_azimuth=0.0,
+    )
+    return SimulatedObservationGeometry(
+        viewing_geo=viewing_geo, sample_wavel=np.array([745.0])
+    )
+
+
+def _scene(fer_gen, scale: float, temperature_offset: float = 0.0):
+    fer_gen.sk_config.multiple_scatter_source = (
+        sk.MultipleScatterSource.DiscreteOrdinates
+    )
+    fer_gen.sk_config.num_streams = 2
+    fer_gen.sk_config.los_refraction = True
+
+    atmo = sk.Atmosphere(
+        fer_gen.model_geo,
+        fer_gen.sk_config,
+        wavelengths_nm=np.array([470.0, 745.0, 1020.0]),
+        calculate_derivatives=False,
+    )
+    sk.climatology.us76.add_us76_standard_atmosphere(atmo)
+    atmo.temperature_k = atmo.temperature_k + temperature_offset
+    atmo["rayleigh"] = sk.constituent.Rayleigh()
+    atmo["albedo"] = sk.constituent.LambertianSurface(0.3 * scale)
+
+    return fer_gen.run(atmo)
+
+
+def _compare(name: str, scenes: list[dict]) -> None:
+    alt_grid = np.arange(0, 65001, 1000.0)
+
+    start = time.perf_counter()
+    basic = [
+        _scene(FERGeneratorBasic(_observation(s["sza"]), alt_grid), s["scale"], s["dt"])
+        for s in scenes
+    ]
+    basic_time = time.perf_counter() - start
+
+    persistent_gen = PersistentFERGenerator()
+    start = time.perf_counter()
+    persistent = []
+    for s in scenes:
+        persistent_gen.update(_observation(s["sza"]), alt_grid)
+        persistent.append(_scene(persistent_gen, s["scale"], s["dt"]))
+    persistent_time = time.perf_counter() - start
+
+    max_diff = max(
+        float(np.abs(a.data["radiance"] - b.data["radiance"]).max())
+        for a, b in zip(basic, persistent, strict=True)
+    )
+
+    num_scenes = len(scenes)
+    print(name)  # noqa: T201
+    print(f"  FERGeneratorBasic:      {basic_time / num_scenes * 1000:.1f} ms/scene")  # noqa: T201
+    print(f"  PersistentFERGenerator: {persistent_time / num_scenes * 1000:.1f} ms/scene")  # noqa: T201
+    print(f"  Speedup: {basic_time / persistent_time:.2f}x")  # noqa: T201
+    print(f"  Max radiance difference: {max_diff:.3e}")  # noqa: T201
+    print(f"  {persistent_gen.cache_info()}")  # noqa: T201
+
+
+def main(num_scenes: int = 20):
+    warnings.filterwarnings("ignore")
+    scales = np.linspace(0.5, 1.5, num_scenes)
+
+    _compare(
+        "Surface albedo changes",
+        [{"sza": 60.0, "scale": s, "dt": 0.0} for s in scales],
+    )
+    _compare(
+        "Temperature alternates between two profiles",
+        [{"sza": 60.0, "scale": s, "dt": 5.0 * (i % 2)} for i, s in enumerate(scales)],
+    )
+    _compare(
+        "Solar zenith angle and albedo change every scene",
+        [{"sza": 60.0 + i, "scale": s, "dt": 0.0} for i, s in enumerate(scales)],
+    )
+
+
+if __name__ == "__main__":
+    main()
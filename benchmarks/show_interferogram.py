@@ -0,0 +1,69 @@
+"""
+Compares the throughput of the two SHOW instrument paths, the sparse ILS operator applied to the
+FER spectra and the interferogram model that forward models the raw interferogram and inverts it,
+and the agreement between the spectra they produce.
+
+    python benchmarks/show_interferogram.py
+"""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+import hawcsimulator.show.configurations.base  # noqa: F401
+from hawcsimulator import resources
+from hawcsimulator.show.inst_model import ils_operator
+from hawcsimulator.show.interferogram import InterferogramModel
+
+
+def _radiance(wavenumber: np.ndarray, num_los: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    lines = rng.uniform(wavenumber[0], wavenumber[-1], 200)
+    depth = rng.uniform(0, 0.5, 200)
+    optical_depth = (
+        depth * np.exp(-(((wavenumber[:, np.newaxis] - lines) / 0.03) ** 2))
+    ).sum(axis=1)
+
+    return np.exp(-optical_depth)[:, np.newaxis] * np.linspace(1, 2, num_los)
+
+
+def _time(fn, repeats: int = 10) -> float:
+    fn()
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    cal_db = resources.get("show.calibration_database.ideal")
+    model = InterferogramModel()
+    wavenumber = np.arange(7295, 7340, 0.01)
+
+    operator = ils_operator(cal_db, model.sample_wavenumber, wavenumber)
+
+    print(  # noqa: T201
+        f"{'num_los':>8} {'ILS [ms]':>9} {'interferogram [ms]':>19} {'max rel diff':>13}"
+    )
+    for num_los in (10, 100, 500):
+        radiance = _radiance(wavenumber, num_los)
+
+        ils = operator @ radiance
+        interferogram = model(wavenumber, radiance)
+        diff = np.abs(interferogram - ils).max() / np.abs(ils).max()
+
+        ils_time = _time(lambda radiance=radiance: operator @ radiance)
+        interferogram_time = _time(
+            lambda radiance=radiance: model(wavenumber, radiance)
+        )
+        print(  # noqa: T201
+            f"{num_los:>8} {ils_time * 1000:>9.1f} {interferogram_time * 1000:>19.1f} {diff:>13.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
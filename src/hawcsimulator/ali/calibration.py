@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import functools
 from pathlib import Path
 
 import appdirs
 import numpy as np
 import xarray as xr
 
+from hawcsimulator.filecache import cached_file
+from hawcsimulator.nodecache import fingerprint
+
 
 def _generate_ideal_spectrograph_cal_db():
     res = xr.Dataset()
@@ -19,8 +23,14 @@ def _generate_ideal_spex_cal_db():
     return xr.Dataset()
 
 
-def calibration_database(name: str = "ideal", version: str = "v1"):
-    dir = (
+_GENERATORS = {
+    "ideal_spectrograph": _generate_ideal_spectrograph_cal_db,
+    "ideal_spex": _generate_ideal_spex_cal_db,
+}
+
+
+def _calibration_dir() -> Path:
+    return (
         Path(
             appdirs.AppDirs(
                 appname="hawc-simulator", appauthor="usask-arg"
@@ -30,25 +40,30 @@ def calibration_database(name: str = "ideal", version: str = "v1"):
         / "calibration"
     )
 
-    file = dir / f"{name}_{version}.nc"
-
-    if not file.exists() or True:
-        if name == "ideal_spectrograph":
-            cal_db = _generate_ideal_spectrograph_cal_db()
-
-            file.parent.mkdir(parents=True, exist_ok=True)
-            cal_db.to_netcdf(file)
-
-            return file
-
-        if name == "ideal_spex":
-            cal_db = _generate_ideal_spex_cal_db()
-
-            file.parent.mkdir(parents=True, exist_ok=True)
-            cal_db.to_netcdf(file)
-
-            return file
 
+@functools.cache
+def calibration_database(name: str = "ideal", version: str = "v1") -> Path:
+    """
+    File containing the calibration database, generated the first time it is requested.  The file name
+    contains a hash of the code generating the database so that changes to the generator are picked up
+    automatically, and the file is written atomically so that worker processes can share it.
+
+    Parameters
+    ----------
+    name : str, optional
+        By default "ideal"
+    version : str, optional
+        By default "v1"
+
+    Returns
+    -------
+    Path
+    """
+    if name not in _GENERATORS:
         error_message = f"Unknown calibration database name: {name}"
         raise ValueError(error_message)
-    return file
+    generator = _GENERATORS[name]
+
+    file = _calibration_dir() / f"{name}_{version}_{fingerprint(generator)[:16]}.nc"
+
+    return cached_file(file, lambda tmp: generator().to_netcdf(tmp))
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import sasktran2 as sk
+import xarray as xr
+from aliprocessing.l2.optical import aerosol_median_radius_db
+
+from hawcsimulator import resources
+from hawcsimulator.ali.calibration import calibration_database
+
+
+@resources.register("ali.calibration_database.ideal_spectrograph")
+def _ideal_spectrograph_calibration_database() -> xr.Dataset:
+    cal_db = xr.open_dataset(calibration_database("ideal_spectrograph", "v1")).load()
+    cal_db.close()
+
+    return cal_db
+
+
+@resources.register("ali.aerosol_median_radius_db")
+def _aerosol_median_radius_db():
+    return aerosol_median_radius_db()
+
+
+@resources.register("solar_irradiance.average_1nm")
+def _solar_irradiance():
+    return sk.constituent.SolarIrradiance(mode="average", resolution=1.0)
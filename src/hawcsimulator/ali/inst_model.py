@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import numba
 import numpy as np
 import pandas as pd
+import scipy.fft
 import xarray as xr
 from aliprocessing.l1b.data import L1bImage, L1bSpectra
 from scipy.interpolate import CubicSpline
@@ -9,6 +11,312 @@ from skretrieval.core.lineshape import Gaussian
 from skretrieval.retrieval.forwardmodel import SpectrometerMixin
 from skretrieval.retrieval.measvec import MeasurementVector, select
 
+from hawcsimulator.noise import ConstantNoise, NoiseModel, NoiseStreams
+
+
+def _highres_wavelength(wavelength: np.ndarray) -> np.ndarray:
+    return np.arange(wavelength.min(), wavelength.max(), 0.01)
+
+
+def _aolp_from_crossing(wavelength: np.ndarray) -> np.ndarray:
+    # 2 * (aolp + pi * 13000 / lambda) = n * pi/2
+    # aolp = n * pi/4 - pi * 13000 / lambda, pick n so we are in the range 0 to pi
+    return (-np.pi * 13000 / wavelength) % np.pi
+
+
+def _demodulate_loop(
+    wavelength: np.ndarray, modulation: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reference implementation of `demodulate` handling one line of sight at a time
+    """
+    highres_wavel = _highres_wavelength(wavelength)
+
+    all_aolp = np.zeros((modulation.shape[1], len(wavelength)))
+    all_dolp = np.zeros((modulation.shape[1], len(wavelength)))
+
+    for i in range(modulation.shape[1]):
+        # Interpolate to a highres grid
+        spline = CubicSpline(wavelength, modulation[:, i])
+        interp_modulation = spline(highres_wavel)
+        interp_deriv = spline(highres_wavel, 1)
+
+        zero_crossings = np.where(np.diff(np.signbit(interp_modulation)))[0]
+        aolp_wavelength = highres_wavel[zero_crossings]
+
+        all_aolp[i, :] = np.interp(
+            wavelength,
+            aolp_wavelength,
+            _aolp_from_crossing(aolp_wavelength),
+            left=np.nan,
+            right=np.nan,
+        )
+
+        # Zeros of deriv at equal to DOLP
+        zero_crossings = np.where(np.diff(np.signbit(interp_deriv)))[0]
+        dolp_wavelength = highres_wavel[zero_crossings]
+        d = np.abs(spline(dolp_wavelength))
+
+        all_dolp[i, :] = np.interp(
+            wavelength, dolp_wavelength, d, left=np.nan, right=np.nan
+        )
+
+    return all_aolp, all_dolp
+
+
+@numba.njit(cache=True)
+def _interp(x: np.ndarray, xp: np.ndarray, fp: np.ndarray, out: np.ndarray) -> None:
+    # np.interp(x, xp, fp, left=np.nan, right=np.nan)
+    n = len(xp)
+    for m in range(len(x)):
+        xv = x[m]
+        if n == 0 or xv < xp[0] or xv > xp[n - 1]:
+            out[m] = np.nan
+        elif xv == xp[n - 1]:
+            out[m] = fp[n - 1]
+        else:
+            j = np.searchsorted(xp, xv, side="right") - 1
+            slope = (fp[j + 1] - fp[j]) / (xp[j + 1] - xp[j])
+            out[m] = slope * (xv - xp[j]) + fp[j]
+            if np.isnan(out[m]):
+                out[m] = slope * (xv - xp[j + 1]) + fp[j + 1]
+                if np.isnan(out[m]) and fp[j] == fp[j + 1]:
+                    out[m] = fp[j]
+
+
+@numba.njit(cache=True)
+def _demodulate_kernel(
+    wavelength: np.ndarray,
+    highres_wavel: np.ndarray,
+    breaks: np.ndarray,
+    coeffs: np.ndarray,
+    interval: np.ndarray,
+    aolp: np.ndarray,
+    dolp: np.ndarray,
+) -> None:
+    nh = len(highres_wavel)
+
+    aolp_wavelength = np.empty(nh)
+    aolp_value = np.empty(nh)
+    dolp_wavelength = np.empty(nh)
+    dolp_value = np.empty(nh)
+
+    for j in range(coeffs.shape[0]):
+        num_aolp = 0
+        num_dolp = 0
+
+        prev_value = 0.0
+        prev_value_sign = False
+        prev_deriv_sign = False
+        for h in range(nh):
+            i = interval[h]
+            s = highres_wavel[h] - breaks[i]
+            c = coeffs[j, i]
+
+            # Same operations in the same order as scipy.interpolate.PPoly, so the results are bit
+            # for bit identical
+            s2 = s * s
+            value = c[3] + c[2] * s + c[1] * s2 + c[0] * (s2 * s)
+            deriv = c[2] + c[1] * s * 2.0 + c[0] * s2 * 3.0
+
+            value_sign = np.signbit(value)
+            deriv_sign = np.signbit(deriv)
+
+            if h > 0 and value_sign != prev_value_sign:
+                w = highres_wavel[h - 1]
+                aolp_wavelength[num_aolp] = w
+                aolp_value[num_aolp] = (-np.pi * 13000 / w) % np.pi
+                num_aolp += 1
+
+            # Zeros of deriv at equal to DOLP
+            if h > 0 and deriv_sign != prev_deriv_sign:
+                dolp_wavelength[num_dolp] = highres_wavel[h - 1]
+                dolp_value[num_dolp] = np.abs(prev_value)
+                num_dolp += 1
+
+            prev_value = value
+            prev_value_sign = value_sign
+            prev_deriv_sign = deriv_sign
+
+        _interp(
+            wavelength, aolp_wavelength[:num_aolp], aolp_value[:num_aolp], aolp[j]
+        )
+        _interp(
+            wavelength, dolp_wavelength[:num_dolp], dolp_value[:num_dolp], dolp[j]
+        )
+
+
+def demodulate(
+    wavelength: np.ndarray, modulation: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Recovers the AOLP and DOLP from the instrument modulation for every line of sight at once.  The
+    modulation is interpolated to a 0.01 nm grid with a cubic spline, the AOLP is found from the zero
+    crossings of the modulation and the DOLP from its extrema.
+
+    The spline is fit to every line of sight together, and the high resolution evaluation and zero
+    crossing search are fused in a compiled kernel so the high resolution spectra are never stored.
+    The result is identical to `_demodulate_loop`.
+
+    Parameters
+    ----------
+    wavelength : np.ndarray
+        Wavelengths of the modulation in [nm], shape (nwavel,)
+    modulation : np.ndarray
+        Modulated signal, shape (nwavel, nlos)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        AOLP and DOLP, both with shape (nlos, nwavel), NaN outside the first and last crossing
+    """
+    wavelength = np.ascontiguousarray(wavelength, dtype=np.float64)
+    highres_wavel = _highres_wavelength(wavelength)
+
+    spline = CubicSpline(wavelength, modulation, axis=0)
+    breaks = spline.x
+    # (los, interval, power) so that each line of sight is contiguous in the kernel
+    coeffs = np.ascontiguousarray(
+        spline.c.reshape(4, len(breaks) - 1, -1).transpose(2, 1, 0)
+    )
+    interval = np.clip(
+        np.searchsorted(breaks, highres_wavel, side="right") - 1, 0, len(breaks) - 2
+    )
+
+    aolp = np.empty((coeffs.shape[0], len(wavelength)))
+    dolp = np.empty_like(aolp)
+    _demodulate_kernel(
+        wavelength, highres_wavel, breaks, coeffs, interval, aolp, dolp
+    )
+
+    return aolp, dolp
+
+
+def _linear_interp_columns(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    # np.interp(x, xp, fp[:, i]) for every column of fp at once, xp must be increasing
+    idx = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, len(xp) - 2)
+    w = np.clip((x - xp[idx]) / (xp[idx + 1] - xp[idx]), 0, 1)[:, np.newaxis]
+    return fp[idx] * (1 - w) + fp[idx + 1] * w
+
+
+def demodulate_fft(
+    wavelength: np.ndarray,
+    modulation: np.ndarray,
+    opd_nm: float = 13000,
+    bandwidth: float = 0.8,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Recovers the AOLP and DOLP from the instrument modulation by Fourier filtering.  The modulation
+    DOLP * cos(2 pi opd / lambda + 2 AOLP) is a carrier at `opd_nm` in wavenumber space, so the spectrum
+    is resampled to a uniform wavenumber grid, the positive sideband around the carrier is isolated in
+    a single FFT over every line of sight, and the amplitude and phase of the resulting analytic signal
+    give the DOLP and AOLP.
+
+    Unlike `demodulate` no high resolution grid is needed and every wavelength has a value, but the
+    resolution of the recovered DOLP/AOLP is limited by `bandwidth` and the edges of the spectral range
+    are less accurate.
+
+    Parameters
+    ----------
+    wavelength : np.ndarray
+        Wavelengths of the modulation in [nm], shape (nwavel,)
+    modulation : np.ndarray
+        Modulated signal, shape (nwavel, nlos)
+    opd_nm : float, optional
+        Optical path difference of the retarder in [nm], by default 13000
+    bandwidth : float, optional
+        Half width of the frequency window around the carrier as a fraction of the carrier frequency,
+        by default 0.8
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        AOLP in [0, pi) and DOLP, both with shape (nlos, nwavel)
+    """
+    wavenumber = 1 / np.asarray(wavelength, dtype=np.float64)
+    order = np.argsort(wavenumber)
+    uniform = np.linspace(wavenumber.min(), wavenumber.max(), len(wavenumber))
+
+    resampled = _linear_interp_columns(uniform, wavenumber[order], modulation[order])
+
+    # Keep only the positive frequency sideband around the carrier, a Hann window limits the ringing
+    spectrum = scipy.fft.fft(resampled, axis=0, workers=-1)
+    freq = scipy.fft.fftfreq(len(uniform), d=uniform[1] - uniform[0])
+    offset = (freq - opd_nm) / (bandwidth * opd_nm)
+    window = np.where(np.abs(offset) < 1, np.cos(np.pi * offset / 2) ** 2, 0)
+    analytic = scipy.fft.ifft(spectrum * window[:, np.newaxis], axis=0, workers=-1)
+
+    # Removing the carrier leaves 0.5 * DOLP * exp(2i AOLP), which varies slowly enough to interpolate
+    baseband = analytic * np.exp(-2j * np.pi * opd_nm * uniform)[:, np.newaxis]
+    baseband = _linear_interp_columns(wavenumber, uniform, baseband).T
+
+    dolp = 2 * np.abs(baseband)
+    aolp = (0.5 * np.angle(baseband)) % np.pi
+
+    return aolp, dolp
+
+
+def l1b_geometry(fer: xr.Dataset) -> tuple:
+    """
+    The geometry arguments of `L1bSpectra.from_np_arrays` after the radiance and its noise.  These are
+    the same for every polarization state, so they are converted from the FER once and the arrays are
+    shared by every spectra built from it.
+
+    Parameters
+    ----------
+    fer : xr.Dataset
+        Front end radiance
+
+    Returns
+    -------
+    tuple
+        (tangent_altitude, tangent_latitude, tangent_longitude, wavelength, time, observer_latitude,
+        observer_longitude, observer_altitude, sza, saa, los_azimuth_angle)
+    """
+    data = fer.data
+
+    return (
+        data["tangent_altitude"].to_numpy(),
+        data["tangent_latitude"].to_numpy(),
+        data["tangent_longitude"].to_numpy(),
+        data["wavelength_nm"].to_numpy(),
+        pd.to_datetime(data["time"].to_numpy()[0]),
+        0.0,
+        0.0,
+        float(data["observer_altitude"].to_numpy()[0]),
+        np.rad2deg(np.arccos(data["tangent_cos_sza"].to_numpy())),
+        data["tangent_solar_azimuth"].to_numpy(),
+        data["tangent_observer_azimuth"].to_numpy(),
+    )
+
+
+def stokes_products(fer: xr.Dataset) -> dict[str, np.ndarray]:
+    """
+    The Stokes components of the FER and the DOLP and AOLP derived from them, computed once as numpy
+    arrays with the shape of a single Stokes component, (wavelength, los)
+
+    Parameters
+    ----------
+    fer : xr.Dataset
+        Front end radiance
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        Dictionary with keys "I", "Q", "U", "dolp" and "aolp"
+    """
+    radiance = fer.data["radiance"]
+    stokes = np.moveaxis(radiance.to_numpy(), radiance.dims.index("stokes"), 0)
+    I, Q, U = stokes[0], stokes[1], stokes[2]  # noqa: E741
+
+    return {
+        "I": I,
+        "Q": Q,
+        "U": U,
+        "dolp": np.sqrt(Q**2 + U**2) / I,
+        "aolp": 0.5 * np.arctan(U / Q),
+    }
+
 
 class L1bGenerator:
     def run(self, fer: xr.Dataset):
@@ -21,11 +329,14 @@ class L1bGeneratorIdeal(L1bGenerator):
         cal_db: xr.Dataset,  # noqa: ARG002
         observation,
         pol_states,
-        noise_model=None,  # noqa: ARG002
+        noise_model: NoiseModel | None = None,
         include_noise=False,
+        noise_streams: NoiseStreams | None = None,
         **kwargs,
     ):
         self._observation = observation
+        self._noise_model = noise_model
+        self._streams = NoiseStreams() if noise_streams is None else noise_streams
 
         self._pol_states = pol_states
 
@@ -34,118 +345,46 @@ class L1bGeneratorIdeal(L1bGenerator):
         self._intensity_error = kwargs.get("intensity_error", 0.01)
         self._noise = include_noise
 
-    def _map_errors_to_fer(self, fer: xr.Dataset):
+    def _map_errors_to_fer(self, intensity: np.ndarray):
+        zeros = np.zeros_like(intensity)
+
         if np.isscalar(self._dolp_error):
-            dolp_error = (
-                np.zeros_like(fer.data["radiance"].isel(stokes=0).to_numpy())
-                + self._dolp_error
-            )
+            dolp_error = zeros + self._dolp_error
         else:
-            dolp_error = (
-                np.zeros_like(fer.data["radiance"].isel(stokes=0).to_numpy())
-                + self._dolp_error[:, np.newaxis]
-            )
+            dolp_error = zeros + self._dolp_error[:, np.newaxis]
 
         if np.isscalar(self._aolp_error):
-            aolp_error = (
-                np.zeros_like(fer.data["radiance"].isel(stokes=0).to_numpy())
-                + self._aolp_error
-            )
+            aolp_error = zeros + self._aolp_error
         else:
-            aolp_error = (
-                np.zeros_like(fer.data["radiance"].isel(stokes=0).to_numpy())
-                + self._aolp_error[:, np.newaxis]
-            )
-
-        if np.isscalar(self._intensity_error):
-            intensity_error = (
-                fer.data["radiance"].isel(stokes=0).to_numpy() * self._intensity_error
-            )
+            aolp_error = zeros + self._aolp_error[:, np.newaxis]
+
+        if self._noise_model is not None:
+            # The noise model replaces the fractional intensity error
+            intensity_error = self._noise_model(
+                xr.DataArray(intensity, dims=["wavelength", "los"])
+            ).to_numpy()
+        elif np.isscalar(self._intensity_error):
+            intensity_error = intensity * self._intensity_error
         else:
-            intensity_error = (
-                fer.data["radiance"].isel(stokes=0).to_numpy()
-                * self._intensity_error[:, np.newaxis]
-            )
+            intensity_error = intensity * self._intensity_error[:, np.newaxis]
 
         return np.abs(intensity_error), dolp_error, aolp_error
 
-    def run(self, fer: xr.Dataset):
-        result = {}
+    def _products(self, fer: xr.Dataset) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        stokes = stokes_products(fer)
 
-        I = fer.data["radiance"].isel(stokes=0)  # noqa: E741
-
-        intensity_error, dolp_error, aolp_error = self._map_errors_to_fer(fer)
-
-        result["I"] = L1bSpectra.from_np_arrays(
-            I.to_numpy(),
-            intensity_error,
-            fer.data["tangent_altitude"].to_numpy(),
-            fer.data["tangent_latitude"].to_numpy(),
-            fer.data["tangent_longitude"].to_numpy(),
-            fer.data["wavelength_nm"].to_numpy(),
-            pd.to_datetime(fer.data["time"].to_numpy()[0]),
-            0.0,
-            0.0,
-            float(fer.data["observer_altitude"].to_numpy()[0]),
-            np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
-            fer.data["tangent_solar_azimuth"].to_numpy(),
-            fer.data["tangent_observer_azimuth"].to_numpy(),
-        )
+        intensity_error, dolp_error, aolp_error = self._map_errors_to_fer(stokes["I"])
+
+        result = {"I": (stokes["I"], intensity_error)}
 
         if "dolp" in self._pol_states:
-            dolp = np.sqrt(
-                fer.data["radiance"].isel(stokes=1) ** 2
-                + fer.data["radiance"].isel(stokes=2) ** 2
-            ) / fer.data["radiance"].isel(stokes=0)
-            result["dolp"] = L1bSpectra.from_np_arrays(
-                dolp.to_numpy(),
-                dolp_error,
-                fer.data["tangent_altitude"].to_numpy(),
-                fer.data["tangent_latitude"].to_numpy(),
-                fer.data["tangent_longitude"].to_numpy(),
-                fer.data["wavelength_nm"].to_numpy(),
-                pd.to_datetime(fer.data["time"].to_numpy()[0]),
-                0.0,
-                0.0,
-                float(fer.data["observer_altitude"].to_numpy()[0]),
-                np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
-                fer.data["tangent_solar_azimuth"].to_numpy(),
-                fer.data["tangent_observer_azimuth"].to_numpy(),
-            )
+            result["dolp"] = (stokes["dolp"], dolp_error)
 
         if "aolp" in self._pol_states:
-            aolp = 0.5 * np.arctan(
-                fer.data["radiance"].isel(stokes=2)
-                / fer.data["radiance"].isel(stokes=1)
-            )
-            result["aolp"] = L1bSpectra.from_np_arrays(
-                aolp.to_numpy(),
-                aolp_error,
-                fer.data["tangent_altitude"].to_numpy(),
-                fer.data["tangent_latitude"].to_numpy(),
-                fer.data["tangent_longitude"].to_numpy(),
-                fer.data["wavelength_nm"].to_numpy(),
-                pd.to_datetime(fer.data["time"].to_numpy()[0]),
-                0.0,
-                0.0,
-                float(fer.data["observer_altitude"].to_numpy()[0]),
-                np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
-                fer.data["tangent_solar_azimuth"].to_numpy(),
-                fer.data["tangent_observer_azimuth"].to_numpy(),
-            )
-        if "q" in self._pol_states:
-            q = fer.data["radiance"].isel(stokes=1) / fer.data["radiance"].isel(
-                stokes=0
-            )
+            result["aolp"] = (stokes["aolp"], aolp_error)
 
-            aolp = 0.5 * np.arctan(
-                fer.data["radiance"].isel(stokes=2)
-                / fer.data["radiance"].isel(stokes=1)
-            )
-            dolp = np.sqrt(
-                fer.data["radiance"].isel(stokes=1) ** 2
-                + fer.data["radiance"].isel(stokes=2) ** 2
-            ) / fer.data["radiance"].isel(stokes=0)
+        if "q" in self._pol_states:
+            q = stokes["Q"] / stokes["I"]
 
             # Estimate the error in q from the errors in DOLP and AOLP
             # q = dolp * cos(2*aolp)
@@ -153,36 +392,110 @@ class L1bGeneratorIdeal(L1bGenerator):
             # abs_error = self._dolp_error * np.abs(np.cos(2*aolp))
 
             # abs errors from aolp are
-            abs_error = dolp * np.abs(-2 * np.sin(2 * aolp) * aolp_error)
+            abs_error = stokes["dolp"] * np.abs(
+                -2 * np.sin(2 * stokes["aolp"]) * aolp_error
+            )
             abs_error += dolp_error
 
-            result["q"] = L1bSpectra.from_np_arrays(
-                q.to_numpy(),
-                np.zeros_like(q.to_numpy()) + abs_error.to_numpy(),
-                fer.data["tangent_altitude"].to_numpy(),
-                fer.data["tangent_latitude"].to_numpy(),
-                fer.data["tangent_longitude"].to_numpy(),
-                fer.data["wavelength_nm"].to_numpy(),
-                pd.to_datetime(fer.data["time"].to_numpy()[0]),
-                0.0,
-                0.0,
-                float(fer.data["observer_altitude"].to_numpy()[0]),
-                np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
-                fer.data["tangent_solar_azimuth"].to_numpy(),
-                fer.data["tangent_observer_azimuth"].to_numpy(),
-            )
+            result["q"] = (q, abs_error)
+
+        return result
 
-        if self._noise:
-            for k in result:
-                result[k]._ds["radiance"] += np.random.default_rng().normal(
-                    0, result[k]._ds["radiance_noise"].to_numpy()
-                )
+    def run(self, fer: xr.Dataset):
+        geometry = l1b_geometry(fer)
+
+        result = {}
+        for k, (values, error) in self._products(fer).items():
+            noisy = values
+            if self._noise:
+                noisy = self._streams.standard_normal(error.shape, k)
+                noisy *= error
+                noisy += values
+            result[k] = L1bSpectra.from_np_arrays(noisy, error, *geometry)
 
         return L1bImage(result)
 
+    def run_ensemble(self, fer: xr.Dataset, num_realizations: int) -> list[L1bImage]:
+        """
+        Noisy realizations of the L1b from a single FER.  The noise free products are calculated once
+        and the noise for every realization is drawn into a single array with a leading realization
+        dimension.  Realization i uses the noise stream (scene_id, product, i) of the generator's
+        `NoiseStreams`.
+
+        Parameters
+        ----------
+        fer : xr.Dataset
+            Front end radiance
+        num_realizations : int
+            Number of noisy L1b realizations
+
+        Returns
+        -------
+        list[L1bImage]
+            One L1bImage per realization
+        """
+        geometry = l1b_geometry(fer)
+        products = self._products(fer)
+
+        noise = {}
+        for k, (values, error) in products.items():
+            noise[k] = self._streams.standard_normal_ensemble(
+                error.shape, k, num_realizations
+            )
+            noise[k] *= error
+            noise[k] += values
+
+        return [
+            L1bImage(
+                {
+                    k: L1bSpectra.from_np_arrays(noise[k][i], error, *geometry)
+                    for k, (_, error) in products.items()
+                }
+            )
+            for i in range(num_realizations)
+        ]
+
+
+_DEMODULATION_METHODS = {"zero_crossing": demodulate, "fft": demodulate_fft}
+
 
 class L1bGeneratorILS(L1bGenerator, SpectrometerMixin):
-    def __init__(self, cal_db: xr.Dataset, observation, noise_model=None, **kwargs):
+    """
+    Parameters
+    ----------
+    demodulation : str, optional
+        Method used to recover the AOLP and DOLP from the modulation, "zero_crossing" for `demodulate`
+        or "fft" for `demodulate_fft`, by default "zero_crossing".  Can be set through `l1b_cfg`.
+    pol_states : tuple, optional
+        Products included in the L1b, "I" is always included.  "dolp" and "aolp" are demodulated from
+        the instrument modulation and require a calibration database with `include_modulation`, by
+        default ("I",)
+    dolp_error : float, optional
+        Error assigned to the demodulated DOLP, by default 0.003
+    aolp_error : float, optional
+        Error assigned to the demodulated AOLP in [degrees], by default 0.2
+    """
+
+    def __init__(
+        self,
+        cal_db: xr.Dataset,
+        observation,
+        noise_model=None,
+        demodulation: str = "zero_crossing",
+        pol_states: tuple = ("I",),
+        dolp_error: float = 0.003,
+        aolp_error: float = 0.2,
+        **kwargs,
+    ):
+        if demodulation not in _DEMODULATION_METHODS:
+            msg = f"Unknown demodulation method {demodulation}, expected one of {list(_DEMODULATION_METHODS)}"
+            raise ValueError(msg)
+        self._demodulate = _DEMODULATION_METHODS[demodulation]
+
+        self._pol_states = pol_states
+        self._dolp_error = dolp_error
+        self._aolp_error = np.deg2rad(aolp_error)
+
         self._ils = lambda _: Gaussian(fwhm=2)
 
         self._observation = observation
@@ -211,10 +524,15 @@ class L1bGeneratorILS(L1bGenerator, SpectrometerMixin):
         if noise_model is not None:
             self._noise_model = noise_model
         else:
-            self._noise_model = lambda rad: rad * 0.01
+            self._noise_model = ConstantNoise(0.01)
 
         self._include_modulation = bool(cal_db["include_modulation"])
 
+        demodulated = {"dolp", "aolp"}.intersection(pol_states)
+        if demodulated and not self._include_modulation:
+            msg = f"{sorted(demodulated)} requested but the calibration database does not include the modulation"
+            raise ValueError(msg)
+
     def run(self, fer: xr.Dataset):
         # Adjust the Q component of the FER to be the modulated component
 
@@ -246,88 +564,49 @@ class L1bGeneratorILS(L1bGenerator, SpectrometerMixin):
             inst_result = self._inst_model["measurement"].model_radiance(fer, None)
 
         # Always include I
-        result["I"] = (
-            inst_result["plus_modulation"].data.radiance
-            + inst_result["minus_modulation"].data.radiance
-        )
+        intensity = (
+            inst_result["plus_modulation"].data["radiance"]
+            + inst_result["minus_modulation"].data["radiance"]
+        ).transpose("wavelength", "los")
+        result["I"] = (intensity.to_numpy(), self._noise_model(intensity).to_numpy())
 
-        if self._include_modulation:
+        if "dolp" in self._pol_states or "aolp" in self._pol_states:
             instrument_modulation = (
                 inst_result["plus_modulation"].data["radiance"]
                 - inst_result["minus_modulation"].data["radiance"]
             )
 
-            highres_wavel = np.arange(
-                instrument_modulation.wavelength.min(),
-                instrument_modulation.wavelength.max(),
-                0.01,
+            all_aolp, all_dolp = self._demodulate(
+                instrument_modulation.wavelength.to_numpy(),
+                instrument_modulation.transpose("wavelength", "los").to_numpy(),
             )
 
-            all_aolp = np.zeros(
-                (len(instrument_modulation.los), len(instrument_modulation.wavelength))
-            )
-            all_dolp = np.zeros(
-                (len(instrument_modulation.los), len(instrument_modulation.wavelength))
-            )
-
-            for i in range(len(instrument_modulation.los)):
-                modulation = instrument_modulation.isel(los=i).to_numpy()
-                # Interpolate to a highres grid
-                spline = CubicSpline(
-                    instrument_modulation.wavelength.to_numpy(), modulation
-                )
-                interp_modulation = spline(highres_wavel)
-                interp_deriv = spline(highres_wavel, 1)
-
-                zero_crossings = np.where(np.diff(np.signbit(interp_modulation)))[0]
-                aolp_wavelength = highres_wavel[zero_crossings]
-
-                # 2 * (aolp + pi * 13000 / lambda) = n * pi/2
-                # aolp = n * pi/4 - pi * 13000 / lambda, pick n so we are in the range 0 to pi
-                a = -np.pi * 13000 / aolp_wavelength
-
-                # Put in range 0 to pi
-                a = a % np.pi
-
-                all_aolp[i, :] = np.interp(
-                    instrument_modulation.wavelength.to_numpy(),
-                    aolp_wavelength,
-                    a,
-                    left=np.nan,
-                    right=np.nan,
-                )
-
-                # Zeros of deriv at equal to DOLP
-                zero_crossings = np.where(np.diff(np.signbit(interp_deriv)))[0]
-                dolp_wavelength = highres_wavel[zero_crossings]
-                d = np.abs(spline(dolp_wavelength))
-
-                all_dolp[i, :] = np.interp(
-                    instrument_modulation.wavelength.to_numpy(),
-                    dolp_wavelength,
-                    d,
-                    left=np.nan,
-                    right=np.nan,
-                )
-
             # Zero crossings are where AOLP = -pi * 13000 / lambda
+            if "dolp" in self._pol_states:
+                # The modulation amplitude is DOLP * I
+                dolp = all_dolp.T / intensity.to_numpy()
+                result["dolp"] = (dolp, np.full_like(dolp, self._dolp_error))
+
+            if "aolp" in self._pol_states:
+                result["aolp"] = (all_aolp.T, np.full_like(all_aolp.T, self._aolp_error))
 
+        data = inst_result["plus_modulation"].data
         spectra = {}
-        for k, v in result.items():
+        for k, (values, error) in result.items():
             spectra[k] = L1bSpectra.from_np_arrays(
-                v.data["radiance"].to_numpy(),
-                self._noise_model(v.data["radiance"]).to_numpy(),
-                v.data["tangent_altitude"].to_numpy(),
-                v.data["tangent_latitude"].to_numpy(),
-                v.data["tangent_longitude"].to_numpy(),
-                v.data["wavelength"].to_numpy(),
+                values,
+                error,
+                data["tangent_altitude"].to_numpy(),
+                data["tangent_latitude"].to_numpy(),
+                data["tangent_longitude"].to_numpy(),
+                data["wavelength"].to_numpy(),
                 pd.to_datetime("2021-01-01"),
                 0.0,
                 0.0,
-                float(v.data["observer_altitude"].to_numpy()[0]),
-                np.rad2deg(np.arccos(v.data["tangent_cos_sza"].to_numpy())),
-                v.data["tangent_solar_azimuth"].to_numpy(),
-                v.data["tangent_observer_azimuth"].to_numpy(),
+                float(data["observer_altitude"].to_numpy()[0]),
+                np.rad2deg(np.arccos(data["tangent_cos_sza"].to_numpy())),
+                data["tangent_solar_azimuth"].to_numpy(),
+                data["tangent_observer_azimuth"].to_numpy(),
             )
 
         # Create L1b data here
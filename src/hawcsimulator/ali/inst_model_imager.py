@@ -1,125 +1,244 @@
 from __future__ import annotations
 
 import numpy as np
-import pandas as pd
 import xarray as xr
 from aliprocessing.l1b.data import L1bImage, L1bSpectra
 
-from hawcsimulator.ali.inst_model import L1bGenerator
+from hawcsimulator.ali.inst_model import L1bGenerator, l1b_geometry, stokes_products
+from hawcsimulator.noise import NoiseModel, NoiseStreams
+
+
+def analyzer_matrix(
+    angles: np.ndarray,
+    transmission: np.ndarray | float = 1.0,
+    diattenuation: np.ndarray | float = 1.0,
+) -> np.ndarray:
+    """
+    Rows of the Mueller matrices of a set of linear analyzers acting on (I, Q, U).  An analyzer at angle
+    a with transmission t and diattenuation d measures t / 2 * (I + d * (cos(2a) Q + sin(2a) U)).
+
+    Parameters
+    ----------
+    angles : np.ndarray
+        Analyzer angles in [degrees], shape (nangle,)
+    transmission : np.ndarray | float, optional
+        Transmission of each analyzer, by default 1.0
+    diattenuation : np.ndarray | float, optional
+        Diattenuation of each analyzer, 1 for an ideal polarizer, by default 1.0
+
+    Returns
+    -------
+    np.ndarray
+        Shape (nangle, 3)
+    """
+    angles = np.deg2rad(2 * np.atleast_1d(np.asarray(angles, dtype=float)))
+    transmission = np.broadcast_to(transmission, angles.shape)
+    diattenuation = np.broadcast_to(diattenuation, angles.shape)
+
+    return (
+        transmission[:, np.newaxis]
+        / 2.0
+        * np.stack(
+            [
+                np.ones_like(angles),
+                diattenuation * np.cos(angles),
+                diattenuation * np.sin(angles),
+            ],
+            axis=1,
+        )
+    )
+
+
+def least_squares_stokes(
+    measurements: np.ndarray, variance: np.ndarray, matrix: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Recovers (I, Q, U) from the analyzer measurements with the pseudo-inverse of `matrix`, applied to
+    every pixel at once, and propagates the measurement variance to the full Stokes covariance.
+
+    Parameters
+    ----------
+    measurements : np.ndarray
+        Measurements with the analyzer along the first axis, shape (nangle, ...)
+    variance : np.ndarray
+        Variance of the measurements, same shape as `measurements`
+    matrix : np.ndarray
+        Analyzer matrix from `analyzer_matrix`, shape (nangle, 3)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Stokes vector with shape (3, ...) and covariance with shape (3, 3, ...)
+    """
+    if matrix.shape[0] < 3 or np.linalg.matrix_rank(matrix) < 3:
+        msg = "At least three analyzers with independent angles are needed to recover I, Q and U"
+        raise ValueError(msg)
+
+    inverse = np.linalg.pinv(matrix)
+
+    stokes = np.tensordot(inverse, measurements, axes=1)
+    covariance = np.einsum("ik,jk,k...->ij...", inverse, inverse, variance)
+
+    return stokes, covariance
 
 
 class L1bGeneratorIdealImager(L1bGenerator):
+    """
+    An imager measuring the radiance through a set of linear analyzers, I, Q and U are recovered with
+    `least_squares_stokes`.
+
+    Parameters
+    ----------
+    noise_model : NoiseModel | None, optional
+        Noise of each analyzer measurement, e.g. `ConstantNoise` or `DetectorNoise`, by default None
+        which is noise free
+    pol_angles : list[float] | None, optional
+        Analyzer angles in [degrees], by default [-60, 0, 60]
+    transmission : list[float] | float, optional
+        Transmission of each analyzer, by default 1.0
+    diattenuation : list[float] | float, optional
+        Diattenuation of each analyzer, by default 1.0
+    pol_states : list[str] | None, optional
+        Products to include in the L1b, any of "I", "q", "u" and "dolp" where q and u are normalized by
+        I, by default ["I", "dolp"]
+    """
+
     def __init__(
         self,
         cal_db: xr.Dataset,  # noqa: ARG002
         observation,
-        noise_model=None,
+        noise_model: NoiseModel | None = None,
         pol_states=None,
         include_noise=False,
+        pol_angles=None,
+        transmission=1.0,
+        diattenuation=1.0,
+        noise_streams: NoiseStreams | None = None,
         **kwargs,
     ):
         self._observation = observation
+        self._streams = NoiseStreams() if noise_streams is None else noise_streams
         self._noise = include_noise
         self._noise_model = noise_model
 
-        self._pol_angles = [-60.0, 0.0, 60.0]
+        self._pol_angles = [-60.0, 0.0, 60.0] if pol_angles is None else pol_angles
+        self._analyzer_matrix = analyzer_matrix(
+            self._pol_angles, transmission, diattenuation
+        )
+
         if pol_states is None:
             self._pol_states = ["I", "dolp"]
         else:
             self._pol_states = pol_states
 
-    def run(self, fer: xr.Dataset):
-        result = {}
+    def _measurements(self, fer: xr.Dataset) -> np.ndarray:
+        # Every analyzer measured at once, shape (angle, wavelength, los)
+        stokes = stokes_products(fer)
+        true_stokes = np.stack([stokes["I"], stokes["Q"], stokes["U"]])
 
-        I = fer.data["radiance"].isel(stokes=0)  # noqa: E741
-        Q = fer.data["radiance"].isel(stokes=1)
-        U = fer.data["radiance"].isel(stokes=2)
+        return np.tensordot(self._analyzer_matrix, true_stokes, axes=1)
 
-        measurements = []
-        errors = []
-        mueller = []
-        for a in self._pol_angles:
-            mueller.append([1, np.cos(np.deg2rad(2 * a)), np.sin(np.deg2rad(2 * a))])
-            m = (
-                I + np.cos(np.deg2rad(2 * a)) * Q + np.sin(np.deg2rad(2 * a)) * U
-            ) / 2.0
+    def _add_noise(
+        self, measurements: np.ndarray, dims: list[str], standard_normal: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if self._noise_model is None:
+            return measurements, np.zeros_like(measurements)
 
-            m, sigma = self._noise_model.calc_noise(m)
+        noisy, sigma = self._noise_model.calc_noise(
+            xr.DataArray(measurements, dims=dims), standard_normal=standard_normal
+        )
+        return np.asarray(noisy), np.asarray(sigma) ** 2
 
-            sigma = sigma**2
+    def _products(
+        self, measurements: np.ndarray, variance: np.ndarray
+    ) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        (I, Q, U), cov = least_squares_stokes(  # noqa: E741
+            measurements, variance, self._analyzer_matrix
+        )
 
-            errors.append(sigma)
+        result = {"I": (I, np.sqrt(cov[0, 0]))}
 
-            measurements.append(m)
+        if "q" in self._pol_states:
+            # Gradient of Q / I with respect to (I, Q)
+            grad = np.stack([-Q / I**2, 1 / I])
+            var_q = np.einsum("i...,ij...,j...->...", grad, cov[:2, :2], grad)
+            result["q"] = (Q / I, np.sqrt(var_q))
 
-        mueller = np.array(mueller) / 2.0
+        if "u" in self._pol_states:
+            grad = np.stack([-U / I**2, 1 / I])
+            sub = cov[np.ix_([0, 2], [0, 2])]
+            var_u = np.einsum("i...,ij...,j...->...", grad, sub, grad)
+            result["u"] = (U / I, np.sqrt(var_u))
 
-        # Add noise to measurements
+        if "dolp" in self._pol_states:
+            den = np.sqrt(Q**2 + U**2)
 
-        inv_mueller = np.linalg.inv(mueller)
+            # Gradient of DOLP with respect to (I, Q, U), including the correlations between them
+            grad = np.stack([-den / I**2, Q / (den * I), U / (den * I)])
+            var_dolp = np.einsum("i...,ij...,j...->...", grad, cov, grad)
+            result["dolp"] = (den / I, np.sqrt(var_dolp))
 
-        recovered_I = (
-            measurements[0] * inv_mueller[0, 0]
-            + measurements[1] * inv_mueller[0, 1]
-            + measurements[2] * inv_mueller[0, 2]
-        )
-        recovered_Q = (
-            measurements[0] * inv_mueller[1, 0]
-            + measurements[1] * inv_mueller[1, 1]
-            + measurements[2] * inv_mueller[1, 2]
-        )
-        recovered_U = (
-            measurements[0] * inv_mueller[2, 0]
-            + measurements[1] * inv_mueller[2, 1]
-            + measurements[2] * inv_mueller[2, 2]
+        return result
+
+    def run(self, fer: xr.Dataset):
+        geometry = l1b_geometry(fer)
+
+        measurements = self._measurements(fer)
+        measurements, variance = self._add_noise(
+            measurements,
+            ["angle", "wavelength", "los"],
+            self._streams.standard_normal(measurements.shape, "analyzers"),
         )
 
-        dolp = np.sqrt(recovered_Q**2 + recovered_U**2) / recovered_I
-
-        # error prop for DOLP
-        inv2 = inv_mueller**2
-        var_I = inv2[0, 0] * errors[0] + inv2[0, 1] * errors[1] + inv2[0, 2] * errors[2]
-        var_Q = inv2[1, 0] * errors[0] + inv2[1, 1] * errors[1] + inv2[1, 2] * errors[2]
-        var_U = inv2[2, 0] * errors[0] + inv2[2, 1] * errors[1] + inv2[2, 2] * errors[2]
-
-        den = np.sqrt(recovered_Q**2 + recovered_U**2)
-        dQ = recovered_Q / (den * recovered_I)
-        dU = recovered_U / (den * recovered_I)
-        dI = -den / (recovered_I**2)
-
-        var_dolp = (dQ**2) * var_Q + (dU**2) * var_U + (dI**2) * var_I
-
-        result["I"] = L1bSpectra.from_np_arrays(
-            recovered_I.to_numpy(),
-            np.sqrt(var_I.to_numpy()),
-            fer.data["tangent_altitude"].to_numpy(),
-            fer.data["tangent_latitude"].to_numpy(),
-            fer.data["tangent_longitude"].to_numpy(),
-            fer.data["wavelength_nm"].to_numpy(),
-            pd.to_datetime(fer.data["time"].to_numpy()[0]),
-            0.0,
-            0.0,
-            float(fer.data["observer_altitude"].to_numpy()[0]),
-            np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
-            fer.data["tangent_solar_azimuth"].to_numpy(),
-            fer.data["tangent_observer_azimuth"].to_numpy(),
+        return L1bImage(
+            {
+                k: L1bSpectra.from_np_arrays(values, error, *geometry)
+                for k, (values, error) in self._products(measurements, variance).items()
+            }
         )
 
-        if "dolp" in self._pol_states:
-            result["dolp"] = L1bSpectra.from_np_arrays(
-                dolp.to_numpy(),
-                np.sqrt(var_dolp.to_numpy()),
-                fer.data["tangent_altitude"].to_numpy(),
-                fer.data["tangent_latitude"].to_numpy(),
-                fer.data["tangent_longitude"].to_numpy(),
-                fer.data["wavelength_nm"].to_numpy(),
-                pd.to_datetime(fer.data["time"].to_numpy()[0]),
-                0.0,
-                0.0,
-                float(fer.data["observer_altitude"].to_numpy()[0]),
-                np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
-                fer.data["tangent_solar_azimuth"].to_numpy(),
-                fer.data["tangent_observer_azimuth"].to_numpy(),
+    def run_ensemble(self, fer: xr.Dataset, num_realizations: int) -> list[L1bImage]:
+        """
+        Noisy realizations of the L1b from a single FER.  The noise model is applied once to every
+        realization and the Stokes parameters of all realizations are recovered together.  Realization
+        i uses the noise stream (scene_id, "analyzers", i) of the generator's `NoiseStreams`.
+
+        Parameters
+        ----------
+        fer : xr.Dataset
+            Front end radiance
+        num_realizations : int
+            Number of noisy L1b realizations
+
+        Returns
+        -------
+        list[L1bImage]
+            One L1bImage per realization
+        """
+        geometry = l1b_geometry(fer)
+
+        measurements = self._measurements(fer)
+        measurements = np.broadcast_to(
+            measurements[:, np.newaxis],
+            (measurements.shape[0], num_realizations, *measurements.shape[1:]),
+        )
+        # Realization i uses the same noise stream as realization i of any other ensemble size
+        standard_normal = self._streams.standard_normal_ensemble(
+            (measurements.shape[0], *measurements.shape[2:]), "analyzers", num_realizations
+        )
+        measurements, variance = self._add_noise(
+            measurements,
+            ["angle", "realization", "wavelength", "los"],
+            np.moveaxis(standard_normal, 0, 1),
+        )
+        products = self._products(measurements, variance)
+
+        return [
+            L1bImage(
+                {
+                    k: L1bSpectra.from_np_arrays(values[i], error[i], *geometry)
+                    for k, (values, error) in products.items()
+                }
             )
-
-        return L1bImage(result)
+            for i in range(num_realizations)
+        ]
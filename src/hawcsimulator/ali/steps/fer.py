@@ -2,18 +2,22 @@ from __future__ import annotations
 
 import numpy as np
 import sasktran2 as sk
-from hamilton.function_modifiers import extract_fields
+from hamilton.function_modifiers import config, extract_fields
 from skretrieval.core.sasktranformat import SASKTRANRadiance
 
+from hawcsimulator import resources
 from hawcsimulator.datastructures.atmosphere import Atmosphere
 from hawcsimulator.datastructures.viewinggeo import ObservationContainer
-from hawcsimulator.fer import FERGeneratorBasic
-from hamilton.function_modifiers import config
+from hawcsimulator.fer import FERGeneratorBasic, PersistentFERGenerator
+
+
+@resources.register("ali.persistent_fer_generator")
+def _persistent_fer_generator() -> PersistentFERGenerator:
+    return PersistentFERGenerator()
 
 
 @extract_fields(
     {
-        # "front_end_radiance": SASKTRANRadiance,
         "fer_gen": FERGeneratorBasic,
         "sk2_atmosphere": sk.Atmosphere,
     }
@@ -23,12 +27,18 @@ def sk2_atm_and_front_end_radiance_gen(
     atmosphere: Atmosphere,
     altitude_grid: np.ndarray,
     sk2_kwargs: dict | None = None,
+    persistent_fer: bool = False,
 ) -> dict:
     if sk2_kwargs is None:
         sk2_kwargs = {}
 
     # Construct the FER generator
-    fer_gen = FERGeneratorBasic(observation.observation, altitude_grid)
+    if persistent_fer:
+        # Reuses the engine and model geometry from previous scenes where possible
+        fer_gen = resources.get("ali.persistent_fer_generator")
+        fer_gen.update(observation.observation, altitude_grid)
+    else:
+        fer_gen = FERGeneratorBasic(observation.observation, altitude_grid)
 
     # Engine properties
     fer_gen.sk_config.num_stokes = 3
@@ -62,6 +72,18 @@ def sk2_atm_and_front_end_radiance_gen(
         "sk2_atmosphere": sk2_atmosphere,
     }
 
+
 @config.when(FER_provided=False)
-def front_end_radiance(fer_gen: FERGeneratorBasic, sk2_atmosphere: sk.Atmosphere)->SASKTRANRadiance:
-    return fer_gen.run(sk2_atmosphere)
\ No newline at end of file
+def front_end_radiance(
+    fer_gen: FERGeneratorBasic,
+    sk2_atmosphere: sk.Atmosphere,
+    fer_chunk_cfg: dict | None = None,
+) -> SASKTRANRadiance:
+    """
+    Runs the radiative transfer calculation.  If fer_chunk_cfg is set, e.g.
+    {"engine_memory_budget_bytes": 2e9} or {"chunk_size": 500}, the spectral grid is
+    calculated in blocks, see FERGeneratorBasic.run_chunked
+    """
+    if fer_chunk_cfg is not None:
+        return fer_gen.run_chunked(sk2_atmosphere, **fer_chunk_cfg)
+    return fer_gen.run(sk2_atmosphere)
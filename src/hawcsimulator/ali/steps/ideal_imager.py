@@ -6,22 +6,55 @@ from skretrieval.core.sasktranformat import SASKTRANRadiance
 
 from hawcsimulator.ali.inst_model_imager import L1bGeneratorIdealImager
 from hawcsimulator.datastructures.viewinggeo import ObservationContainer
+from hawcsimulator.noise import NoiseStreams
 
 
-def l1b(
+def _l1b_generator(
     calibration_database: xr.Dataset,
     observation: ObservationContainer,
-    front_end_radiance: SASKTRANRadiance,
     polarization_states: list,
-    l1b_cfg: dict | None = None,
-) -> L1bImage:
+    l1b_cfg: dict | None,
+    noise_streams: NoiseStreams | None,
+) -> L1bGeneratorIdealImager:
     if l1b_cfg is None:
         l1b_cfg = {}
 
-    l1b_gen = L1bGeneratorIdealImager(
+    return L1bGeneratorIdealImager(
         calibration_database,
         observation.observation,
         pol_states=polarization_states,
+        noise_streams=noise_streams,
         **l1b_cfg,
     )
+
+
+def l1b(
+    calibration_database: xr.Dataset,
+    observation: ObservationContainer,
+    front_end_radiance: SASKTRANRadiance,
+    polarization_states: list,
+    l1b_cfg: dict | None = None,
+    noise_streams: NoiseStreams | None = None,
+) -> L1bImage:
+    l1b_gen = _l1b_generator(
+        calibration_database, observation, polarization_states, l1b_cfg, noise_streams
+    )
     return l1b_gen.run(front_end_radiance)
+
+
+def l1b_ensemble(
+    calibration_database: xr.Dataset,
+    observation: ObservationContainer,
+    front_end_radiance: SASKTRANRadiance,
+    polarization_states: list,
+    num_realizations: int,
+    l1b_cfg: dict | None = None,
+    noise_streams: NoiseStreams | None = None,
+) -> list:
+    """
+    `num_realizations` noisy L1b realizations sharing the same front end radiance
+    """
+    l1b_gen = _l1b_generator(
+        calibration_database, observation, polarization_states, l1b_cfg, noise_streams
+    )
+    return l1b_gen.run_ensemble(front_end_radiance, num_realizations)
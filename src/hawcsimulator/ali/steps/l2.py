@@ -17,3 +17,26 @@ def l2(
     return process_l1b_to_l2_image(
         l1b, program_of_record.isel(time=0), calibration_database, **l2_cfg
     )
+
+
+def l2_ensemble(
+    l1b_ensemble: list,
+    program_of_record: xr.Dataset,
+    calibration_database: xr.Dataset,
+    l2_cfg: dict | None = None,
+) -> xr.Dataset:
+    """
+    Retrieves every L1b realization, the results are concatenated along a "realization" dimension
+    """
+    if l2_cfg is None:
+        l2_cfg = {}
+
+    por = program_of_record.isel(time=0)
+
+    return xr.concat(
+        [
+            process_l1b_to_l2_image(l1b, por, calibration_database, **l2_cfg)
+            for l1b in l1b_ensemble
+        ],
+        dim="realization",
+    )
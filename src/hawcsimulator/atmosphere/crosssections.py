@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+import inspect
+import time
+from pathlib import Path
+
+import sasktran2 as sk
+from showlib.l2.optical import h2o_optical_property
+
+
+def h2o_cross_section_table(
+    num_threads: int = 1,
+    db_root: Path | None = None,
+    **kwargs,
+) -> sk.database.HITRANDatabase:
+    """
+    Precomputed H2O absorption cross sections on a (pressure, temperature, wavenumber) grid.  The table is
+    generated from HITRAN once, stored in the sasktran2 database directory, and interpolated at run time,
+    so evaluating the absorber for a new temperature/pressure profile is a table lookup instead of a
+    line by line calculation.
+
+    By default this is `showlib.l2.optical.h2o_optical_property()`, the SHOW band at 0.01 cm^-1, so the
+    simulator and the SHOW retrieval share one table.
+
+    Parameters
+    ----------
+    num_threads : int, optional
+        Threads used if the table has to be generated, by default 1
+    db_root : Path | None, optional
+        Directory to store the table in, by default None which is the sasktran2 database directory
+    kwargs
+        Passed to `h2o_optical_property`, e.g. start_wavenumber, end_wavenumber and
+        wavenumber_resolution
+
+    Returns
+    -------
+    sk.database.HITRANDatabase
+        An optical property that can be used in place of sk.optical.HITRANAbsorber("h2o")
+
+    Notes
+    -----
+    The table is not memory mapped, sasktran2 reads the cross sections into memory when the optical
+    property is constructed, about 45 MB for the default table.  Construct it once per process, e.g.
+    through the "show.h2o_optical_property" resource, rather than once per scene.
+    """
+    if num_threads == 1 and db_root is None:
+        return h2o_optical_property(**kwargs)
+
+    # h2o_optical_property can't set these, build the same database with its defaults
+    params = {
+        name: p.default
+        for name, p in inspect.signature(h2o_optical_property).parameters.items()
+    }
+    params.update(kwargs)
+
+    return sk.database.HITRANDatabase(
+        molecule="H2O", num_threads=num_threads, db_root=db_root, **params
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hawcsimulator.atmosphere.crosssections",
+        description="Generates the H2O cross section table offline",
+    )
+    parser.add_argument("--start", type=float, default=None)
+    parser.add_argument("--end", type=float, default=None)
+    parser.add_argument("--resolution", type=float, default=None)
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--db-root", type=Path, default=None)
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Regenerate an existing table"
+    )
+    args = parser.parse_args(argv)
+
+    kwargs = {
+        name: value
+        for name, value in [
+            ("start_wavenumber", args.start),
+            ("end_wavenumber", args.end),
+            ("wavenumber_resolution", args.resolution),
+        ]
+        if value is not None
+    }
+
+    # Whole seconds since file modification times may be truncated
+    started = int(time.time())
+    table = h2o_cross_section_table(
+        num_threads=args.num_threads, db_root=args.db_root, **kwargs
+    )
+
+    # A missing table is generated on construction, only an existing one needs regenerating
+    if args.rebuild and table.path().stat().st_mtime < started:
+        table.clear()
+        table.generate()
+
+    print(table.path())  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import logging
+import re
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+
+from hawcsimulator.appconfig import APPDIRS, load_user_config
+
+# Every variable in the EarthCARE scene is on the latitude grid of this file
+_REFERENCE_FILE = "scene_ext_3d-1-0.680.nc"
+_WATER_FILE = "Test_data_39316D2_2014120712_specific_humidity.nc"
+_TEMPERATURE_FILE = "Test_data_39316D2_2014120712_temperature.nc"
+_BRDF_FILES = {
+    "BRDF_iso": "Test_data_39316D2_2014120712_BRDF_iso.nc",
+    "BRDF_vol": "Test_data_39316D2_2014120712_BRDF_vol.nc",
+}
+_AEROSOL_VARS = {"ext": "Extinction", "w": "SS_alb", "g": "g"}
+_AEROSOL_FILE = re.compile(r"scene_(ext|w|g)_3d-(\d+)-([\d\.]+)\.nc")
+
+_CHUNK_SIZE = 256
+
+
+def _earthcare_folder() -> Path:
+    cfg = load_user_config()
+
+    if "earthcare_folder" in cfg:
+        return Path(cfg["earthcare_folder"]).expanduser()
+    msg = "No earthcare folder specified the user config. Add 'earthcare_folder' to the user config."
+    raise ValueError(msg)
+
+
+def store_path() -> Path:
+    """
+    Location of the preprocessed EarthCARE store, set with 'earthcare_store' in the user config and by
+    default in the user data directory
+    """
+    cfg = load_user_config()
+
+    if "earthcare_store" in cfg:
+        return Path(cfg["earthcare_store"]).expanduser()
+    return Path(APPDIRS.user_data_dir) / "earthcare" / "scene.nc"
+
+
+def _sort_by_latitude(data: xr.Dataset) -> xr.Dataset:
+    if data["latitude"].dims != ("nx",):
+        msg = f"Expected latitude to be along nx, found {data['latitude'].dims}"
+        raise ValueError(msg)
+
+    order = np.argsort(data["latitude"].to_numpy(), kind="stable")
+    return data.isel(nx=order)
+
+
+def _with_lat_lon(data: xr.Dataset, reference: xr.Dataset) -> xr.Dataset:
+    data["latitude"] = reference["latitude"]
+    data["longitude"] = reference["longitude"]
+
+    if "nz" in data.dims:
+        data["height"] = reference["height"]
+
+    return data
+
+
+def _clip_negative(data: xr.Dataset, var: str, fill_nan: bool = False) -> None:
+    values = data[var].to_numpy()
+    values[values < 0] = 0
+    if fill_nan:
+        values[np.isnan(values)] = 0
+    data[var] = (data[var].dims, values)
+
+
+def _water(folder: Path, reference: xr.Dataset) -> xr.Dataset:
+    water = _with_lat_lon(xr.load_dataset(folder / _WATER_FILE), reference)
+    _clip_negative(water, "specific_humidity", fill_nan=True)
+
+    return _sort_by_latitude(water)
+
+
+def _temperature(folder: Path, reference: xr.Dataset) -> xr.Dataset:
+    temperature = _with_lat_lon(xr.load_dataset(folder / _TEMPERATURE_FILE), reference)
+
+    return _sort_by_latitude(temperature)
+
+
+def _brdf(folder: Path, reference: xr.Dataset) -> xr.Dataset:
+    brdf = xr.Dataset()
+    for var, file in _BRDF_FILES.items():
+        data = xr.load_dataset(folder / file).rename({"x": "nx"})
+        brdf[var] = _with_lat_lon(data, reference)[var]
+    brdf["latitude"] = reference["latitude"]
+    brdf["longitude"] = reference["longitude"]
+
+    return _sort_by_latitude(brdf)
+
+
+def _aerosol(folder: Path) -> dict[str, xr.Dataset]:
+    files = {}
+    for f in folder.glob("scene_*_3d-*-*.nc"):
+        match = _AEROSOL_FILE.fullmatch(f.name)
+        if match is None:
+            continue
+        k, type_id, wavelength_um = match.groups()
+        files.setdefault((k, int(type_id)), []).append((float(wavelength_um) * 1000, f))
+
+    result = {}
+    for (k, type_id), wavel_files in sorted(files.items()):
+        var = _AEROSOL_VARS[k]
+        temp = []
+        for vw, f in sorted(wavel_files):
+            aerosol = xr.load_dataset(f)
+            _clip_negative(aerosol, var)
+            aerosol = _sort_by_latitude(aerosol)
+            aerosol[var] = aerosol[var].expand_dims(wavelength=[vw])
+            temp.append(aerosol)
+
+        result[f"aerosol/{type_id}/{k}"] = xr.concat(
+            temp,
+            dim="wavelength",
+            data_vars="minimal",
+            coords="minimal",
+            compat="override",
+        )
+
+    return result
+
+
+def _encoding(data: xr.Dataset) -> dict:
+    encoding = {}
+    for name, var in data.data_vars.items():
+        if var.ndim == 0:
+            continue
+        chunks = [
+            min(_CHUNK_SIZE, size) if dim == "nx" else size
+            for dim, size in zip(var.dims, var.shape, strict=True)
+        ]
+        encoding[name] = {"zlib": True, "chunksizes": chunks}
+    return encoding
+
+
+def ingest(folder: Path | str | None = None, store: Path | str | None = None) -> Path:
+    """
+    Converts the EarthCARE scene files into a single preprocessed store.  Every product is sorted by
+    latitude, negative and missing values are already removed, and the arrays are chunked along the
+    track so that selecting a latitude band reads only the chunks that overlap it.
+
+    The store is a netCDF4 file with the groups "water", "brdf", and "aerosol/{type_id}/{ext,w,g}", and
+    "temperature" if the scene includes it.
+
+    Parameters
+    ----------
+    folder : Path | str | None, optional
+        Folder with the EarthCARE scene files, by default 'earthcare_folder' in the user config
+    store : Path | str | None, optional
+        File to write the store to, by default `store_path()`
+
+    Returns
+    -------
+    Path
+        Location of the store
+    """
+    folder = _earthcare_folder() if folder is None else Path(folder)
+    store = store_path() if store is None else Path(store)
+
+    reference = xr.load_dataset(folder / _REFERENCE_FILE)
+
+    groups = {
+        "water": _water(folder, reference),
+        "brdf": _brdf(folder, reference),
+        **_aerosol(folder),
+    }
+    if (folder / _TEMPERATURE_FILE).exists():
+        groups["temperature"] = _temperature(folder, reference)
+
+    # Write to a temporary file and rename so that a partially written store is never opened
+    store.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=store.parent, suffix=".tmp", delete=False) as f:
+        tmp = Path(f.name)
+    mode = "w"
+    for group, data in groups.items():
+        data.attrs["source_folder"] = str(folder)
+        data.to_netcdf(
+            tmp,
+            mode=mode,
+            group=group,
+            format="NETCDF4",
+            engine="netcdf4",
+            encoding=_encoding(data),
+        )
+        mode = "a"
+
+    open_group.cache_clear()
+    tmp.replace(store)
+
+    return store
+
+
+@functools.cache
+def open_group(group: str, store: Path | None = None) -> xr.Dataset:
+    """
+    Lazily opens a group of the preprocessed store, ingesting the EarthCARE scene first if the store
+    does not exist.  The file is opened once per process.
+
+    Parameters
+    ----------
+    group : str
+        Group in the store, e.g. "water"
+    store : Path | None, optional
+        Location of the store, by default `store_path()`
+
+    Returns
+    -------
+    xr.Dataset
+    """
+    if store is None:
+        store = store_path()
+
+    if not store.exists():
+        logging.info("Ingesting the EarthCARE scene into %s", store)
+        ingest(store=store)
+
+    return xr.open_dataset(store, group=group, engine="netcdf4")
+
+
+def latitude_slice(
+    data: xr.Dataset, central_latitude: float, lat_range: float = 1
+) -> xr.Dataset:
+    """
+    Selects the points strictly within lat_range of central_latitude from a dataset sorted by latitude
+    with a binary search
+
+    Parameters
+    ----------
+    data : xr.Dataset
+        Dataset from the store
+    central_latitude : float
+    lat_range : float, optional
+        By default 1
+
+    Returns
+    -------
+    xr.Dataset
+    """
+    latitude = data["latitude"].to_numpy()
+    if central_latitude < latitude[0] or central_latitude > latitude[-1]:
+        msg = f"Central latitude {central_latitude} is outside the range of the data"
+        raise ValueError(msg)
+
+    start = np.searchsorted(latitude, central_latitude - lat_range, side="right")
+    end = np.searchsorted(latitude, central_latitude + lat_range, side="left")
+
+    return data.isel(nx=slice(start, end))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hawcsimulator.atmosphere.earthcare.store",
+        description="Preprocesses the EarthCARE scene files into a latitude indexed store",
+    )
+    parser.add_argument("--folder", default=None, help="EarthCARE scene folder")
+    parser.add_argument("--store", default=None, help="Output file")
+    args = parser.parse_args(argv)
+
+    print(ingest(args.folder, args.store))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
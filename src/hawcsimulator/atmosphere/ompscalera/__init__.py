@@ -6,9 +6,10 @@ import numpy as np
 import pandas as pd
 import sasktran2 as sk
 import xarray as xr
-from skretrieval.core.lineshape import Rectangle
 
+from hawcsimulator import resources
 from hawcsimulator.appconfig import load_user_config
+from hawcsimulator.atmosphere import regrid
 
 
 def _curtain_file():
@@ -20,47 +21,85 @@ def _curtain_file():
 def _to_uniform_spacing(
     data: xr.Dataset, spacing: float, out_grid: np.ndarray, out_var: str
 ) -> xr.Dataset:
-    ls = Rectangle(width=spacing)
-
-    transform = np.zeros((len(out_grid), len(data["altitude"])))
-
-    for i, a in enumerate(out_grid):
-        transform[i] = ls.integration_weights(a, data["altitude"])
-
-    return (
-        xr.DataArray(
-            transform,
-            dims=["altitude2", "altitude"],
-            coords={"altitude2": out_grid, "altitude": data.altitude},
+    return regrid.to_uniform_spacing(data[out_var], "altitude", out_grid, spacing)
+
+
+class Curtain:
+    """
+    The OMPS/CALIPSO/ERA5 curtain, loaded once and kept in memory on the ERA5 latitudes and a uniform
+    altitude grid, so profiles at any number of latitudes are a single vectorized interpolation.
+
+    Parameters
+    ----------
+    file : Path | str | None, optional
+        Curtain file, by default the file in the sasktran2 standard database
+    altitude_grid : np.ndarray | None, optional
+        Altitude grid of the profiles in [km], by default 0 to 40 km in 0.5 km steps
+    """
+
+    def __init__(
+        self, file: Path | str | None = None, altitude_grid: np.ndarray | None = None
+    ) -> None:
+        if file is None:
+            file = _curtain_file()
+        if altitude_grid is None:
+            altitude_grid = np.arange(0, 40.0, 0.5)
+
+        with xr.open_datatree(file) as ds:
+            omps = xr.Dataset(ds["OMPS"]).load()
+            era5 = xr.Dataset(ds["ERA5"]).load()
+
+        era5 = era5.swap_dims({"time": "latitude"}).fillna(0.0)
+        omps = (
+            omps.swap_dims({"time": "latitude"})
+            .interp(latitude=era5.latitude)
+            .interp(altitude=altitude_grid)
         )
-        @ data[out_var]
-    ).rename({"altitude2": "altitude"})
 
+        omps["h2o_vmr"] = (
+            _to_uniform_spacing(era5, 0.5, altitude_grid, "specific_humidity")
+            * 28.97
+            / 18.01528
+        )
 
-def load_data(central_latitude):
-    ds = xr.open_datatree(_curtain_file())
-
-    calipso = xr.Dataset(ds["CALIPSO"])
-    omps = xr.Dataset(ds["OMPS"])
-    era5 = xr.Dataset(ds["ERA5"])
+        self._data = omps.sortby("latitude")
+
+    @property
+    def data(self) -> xr.Dataset:
+        """
+        The curtain on the ERA5 latitudes and the altitude grid
+        """
+        return self._data
+
+    def profiles(self, latitudes: float | np.ndarray) -> xr.Dataset:
+        """
+        Profiles linearly interpolated to the requested latitudes
+
+        Parameters
+        ----------
+        latitudes : float | np.ndarray
+            A single latitude, or an array of latitudes
+
+        Returns
+        -------
+        xr.Dataset
+            Profiles with dimensions (altitude,) for a single latitude and (latitude, altitude) for an
+            array of latitudes
+        """
+        if np.ndim(latitudes) == 0:
+            return self._data.interp(latitude=latitudes)
+        return self._data.interp(latitude=np.asarray(latitudes)).transpose(
+            "latitude", ...
+        )
 
-    omps = omps.swap_dims({"time": "latitude"}).interp(latitude=era5.latitude)
-    era5 = era5.swap_dims({"time": "latitude"}).fillna(0.0)
-    calipso = calipso.swap_dims({"time": "latitude"})
 
-    omps = (
-        omps.interp(altitude=np.arange(0, 40.0, 0.5))
-        .swap_dims({"time": "latitude"})
-        .interp(latitude=central_latitude)
-    )
+@resources.register("ompscalera.curtain")
+def _curtain() -> Curtain:
+    return Curtain()
 
-    omps["h2o_vmr"] = (
-        _to_uniform_spacing(era5, 0.5, omps.altitude.to_numpy(), "specific_humidity")
-        * 28.97
-        / 18.01528
-    ).interp(latitude=central_latitude)
 
-    return omps
+def load_data(central_latitude):
+    return resources.get("ompscalera.curtain").profiles(central_latitude)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import functools
+
+import numpy as np
+import xarray as xr
+from scipy import sparse
+from skretrieval.core.lineshape import (
+    _rectangle_analytic_linear_weights_helper_left,
+    _rectangle_analytic_linear_weights_helper_right,
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _rectangle_weights(in_key: bytes, out_key: bytes, width: float) -> sparse.csr_array:
+    in_grid = np.frombuffer(in_key, dtype=np.float64)
+    out_grid = np.frombuffer(out_key, dtype=np.float64)
+
+    # Same as skretrieval.core.lineshape.Rectangle(width).integration_weights evaluated for every
+    # output altitude at once, the helpers are numpy ufuncs so they broadcast over the whole matrix
+    widths = np.diff(in_grid)
+    width_left = np.abs(np.hstack(([widths[0]], widths)))
+    width_right = np.abs(np.hstack((widths, [widths[-1]])))
+    offsets = in_grid[np.newaxis, :] - out_grid[:, np.newaxis]
+
+    weights = _rectangle_analytic_linear_weights_helper_left(
+        width_left[np.newaxis, :], offsets, width
+    ) + _rectangle_analytic_linear_weights_helper_right(
+        width_right[np.newaxis, :], offsets, width
+    )
+
+    norm = np.nansum(weights, axis=1)
+    if np.any(norm == 0):
+        msg = f"Output altitudes {out_grid[norm == 0]} do not overlap the input grid"
+        raise ValueError(msg)
+
+    return sparse.csr_array(weights / norm[:, np.newaxis])
+
+
+def rectangle_weights(
+    in_grid: np.ndarray, out_grid: np.ndarray, width: float
+) -> sparse.csr_array:
+    """
+    Sparse matrix that averages a profile on `in_grid` over a rectangle of full width `width` centered
+    on every point of `out_grid`, assuming the profile is linear between samples.
+
+    Matrices are cached on the grids and width, the returned matrix is shared and must not be modified.
+
+    Parameters
+    ----------
+    in_grid : np.ndarray
+        Grid the profiles are on
+    out_grid : np.ndarray
+        Grid to average to
+    width : float
+        Full width of the rectangle, in the same units as the grids
+
+    Returns
+    -------
+    sparse.csr_array
+        Matrix with shape (len(out_grid), len(in_grid)), every row sums to 1
+    """
+    in_grid = np.ascontiguousarray(in_grid, dtype=np.float64)
+    out_grid = np.ascontiguousarray(out_grid, dtype=np.float64)
+
+    return _rectangle_weights(in_grid.tobytes(), out_grid.tobytes(), float(width))
+
+
+def to_uniform_spacing(
+    data: xr.DataArray,
+    dim: str,
+    out_grid: np.ndarray,
+    width: float,
+    in_grid: np.ndarray | None = None,
+    out_dim: str = "altitude",
+) -> xr.DataArray:
+    """
+    Averages every profile in `data` onto `out_grid` with `rectangle_weights`.  All profiles, e.g.
+    every latitude and wavelength, are regridded together in a single sparse matrix product.
+
+    Parameters
+    ----------
+    data : xr.DataArray
+        Profiles to regrid, along the dimension `dim`
+    dim : str
+        Dimension of `data` to regrid
+    out_grid : np.ndarray
+        Grid to average to
+    width : float
+        Full width of the averaging rectangle
+    in_grid : np.ndarray | None, optional
+        Grid of the profiles, by default None which uses the coordinate `dim` of `data`
+    out_dim : str, optional
+        Name of the regridded dimension, by default "altitude"
+
+    Returns
+    -------
+    xr.DataArray
+        Regridded profiles with dimensions (out_dim, *other dimensions of data)
+    """
+    if in_grid is None:
+        in_grid = data[dim].to_numpy()
+
+    weights = rectangle_weights(in_grid, out_grid, width)
+
+    data = data.transpose(dim, ...)
+    values = data.to_numpy()
+    result = weights @ values.reshape(values.shape[0], -1)
+
+    coords = {
+        name: coord
+        for name, coord in data.coords.items()
+        if dim not in coord.dims and out_dim not in coord.dims
+    }
+    coords[out_dim] = np.asarray(out_grid)
+
+    return xr.DataArray(
+        result.reshape(len(out_grid), *values.shape[1:]),
+        dims=[out_dim, *data.dims[1:]],
+        coords=coords,
+    )
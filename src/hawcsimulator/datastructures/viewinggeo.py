@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 from skretrieval.retrieval.observation import Observation
 
@@ -12,3 +13,9 @@ from .base import Data
 class ObservationContainer(Data):
     observation: Observation  # skretrieval.retrieval.observation.Observation object
     time: pd.Timestamp  # Reference time of the observation
+
+
+@dataclass
+class MultiSceneObservationContainer(ObservationContainer):
+    scenes: list[ObservationContainer]  # The individual observation for every scene
+    scene_index: np.ndarray  # Index into scenes for every line of sight of the combined observation
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import logging
+from collections import OrderedDict
+
 import numpy as np
 import sasktran2 as sk
 import xarray as xr
@@ -7,6 +10,20 @@ from skretrieval.core.sasktranformat import SASKTRANRadiance
 from skretrieval.retrieval.forwardmodel import IdealViewingMixin
 from skretrieval.retrieval.observation import Observation
 
+from hawcsimulator.nodecache import Unhashable, fingerprint
+
+# Assumed number of constituents when they can't be read from the atmosphere
+_DEFAULT_NUM_CONSTITUENTS = 8
+
+
+def _constituents(atmosphere: sk.Atmosphere) -> dict | None:
+    """
+    The constituents of a sasktran2 atmosphere, or None if this sasktran2 version doesn't expose them.
+    sasktran2 has no public API to list the constituents, so this reads the private storage.
+    """
+    constituents = getattr(atmosphere, "_constituents", None)
+    return constituents if isinstance(constituents, dict) else None
+
 
 class FERGenerator:
     def run(self):
@@ -38,15 +55,321 @@ class FERGeneratorBasic(IdealViewingMixin):
     def sk_config(self):
         return self._sk_config
 
-    def run(self, atmosphere: sk.Atmosphere):
+    def _engine(self, atmosphere: sk.Atmosphere) -> sk.Engine:
         self.model_geo.refractive_index = (
             sk.optical.refraction.ciddor_index_of_refraction(
                 atmosphere.temperature_k, atmosphere.pressure_pa, 0.0, 400, 1350.0
             )
         )
 
-        engine = sk.Engine(self._sk_config, self.model_geo, self.viewing_geo)
+        return sk.Engine(self._sk_config, self.model_geo, self.viewing_geo)
+
+    def run(self, atmosphere: sk.Atmosphere):
+        engine = self._engine(atmosphere)
 
         sk2_rad = engine.calculate_radiance(atmosphere)
 
         return SASKTRANRadiance.from_sasktran2(sk2_rad)
+
+    def bytes_per_spectral_point(self, atmosphere: sk.Atmosphere) -> int:
+        """
+        Approximate memory required for every wavelength/wavenumber of the calculation, including the
+        atmosphere storage, the radiance, and the weighting functions if derivatives are calculated.
+
+        Parameters
+        ----------
+        atmosphere : sk.Atmosphere
+
+        Returns
+        -------
+        int
+        """
+        num_loc = atmosphere.num_locations
+        num_los = len(self.viewing_geo.observer_rays)
+        num_stokes = self._sk_config.num_stokes
+        num_legendre = self._sk_config.num_singlescatter_moments * (
+            1 if num_stokes == 1 else 4
+        )
+
+        # Extinction, single scatter albedo and the legendre moments
+        num_values = num_loc * (2 + num_legendre)
+        num_values += num_los * num_stokes
+
+        if atmosphere.calculate_derivatives:
+            # Temperature, pressure and one weighting function for each constituent
+            constituents = _constituents(atmosphere)
+            num_derivs = 2 + (
+                _DEFAULT_NUM_CONSTITUENTS if constituents is None else len(constituents)
+            )
+            num_values += num_derivs * num_loc * num_los * num_stokes
+
+        # Factor of 2 for the intermediate copies made when formatting the output
+        return 2 * 8 * num_values
+
+    def _chunk_atmosphere(
+        self, atmosphere: sk.Atmosphere, constituents: dict, index: slice
+    ) -> sk.Atmosphere:
+        if atmosphere.spectral_coordinate == "wavenumber_cminv":
+            spectral = {"wavenumber_cminv": atmosphere.wavenumbers_cminv[index]}
+        else:
+            spectral = {"wavelengths_nm": atmosphere.wavelengths_nm[index]}
+
+        chunk = sk.Atmosphere(
+            model_geometry=atmosphere.model_geometry,
+            config=self._sk_config,
+            calculate_derivatives=atmosphere.calculate_derivatives,
+            **spectral,
+        )
+        chunk.temperature_k = atmosphere.temperature_k
+        chunk.pressure_pa = atmosphere.pressure_pa
+        if atmosphere.specific_humidity is not None:
+            chunk.specific_humidity = atmosphere.specific_humidity
+
+        for k, v in constituents.items():
+            chunk[k] = v
+
+        return chunk
+
+    def run_chunked(
+        self,
+        atmosphere: sk.Atmosphere,
+        chunk_size: int | None = None,
+        engine_memory_budget_bytes: int | None = None,
+    ) -> SASKTRANRadiance:
+        """
+        Calculates the radiance in blocks of the spectral grid, bounding the memory used by the engine
+        for each block, and stitches the blocks back together into a single radiance.
+
+        Parameters
+        ----------
+        atmosphere : sk.Atmosphere
+            Atmosphere specified on the full spectral grid
+        chunk_size : int | None, optional
+            Number of spectral points in each block.  If not set it is determined from
+            engine_memory_budget_bytes
+        engine_memory_budget_bytes : int | None, optional
+            Approximate memory allowed for the calculation of each block, by default None.  If neither
+            chunk_size or engine_memory_budget_bytes are set the full grid is calculated at once
+
+        Notes
+        -----
+        Only the memory of the radiative transfer calculation is bounded.  The input atmosphere has
+        already allocated its optical property storage on the full spectral grid, so peak memory is that
+        of the input atmosphere plus the budget.
+
+        Blocks are calculated sequentially since the sasktran2 objects cannot be shared between threads.
+        Parallelism within a block is controlled by `sk_config.num_threads`.  sasktran2 has no public API
+        to list the constituents of an atmosphere, if they can't be read to build the blocks the full
+        grid is calculated at once.
+
+        Returns
+        -------
+        SASKTRANRadiance
+        """
+        num_spectral = atmosphere.num_wavel
+
+        if chunk_size is None:
+            if engine_memory_budget_bytes is None:
+                chunk_size = num_spectral
+            else:
+                chunk_size = engine_memory_budget_bytes // self.bytes_per_spectral_point(
+                    atmosphere
+                )
+        chunk_size = int(np.clip(chunk_size, 1, num_spectral))
+
+        constituents = _constituents(atmosphere)
+        if constituents is None:
+            logging.warning(
+                "Cannot read the constituents of the atmosphere, calculating the full spectral grid at once"
+            )
+            return self.run(atmosphere)
+
+        chunks = [
+            slice(i, min(i + chunk_size, num_spectral))
+            for i in range(0, num_spectral, chunk_size)
+        ]
+
+        # The engine does not depend on the spectral grid so it is shared by every block
+        engine = self._engine(atmosphere)
+
+        results = [
+            engine.calculate_radiance(
+                self._chunk_atmosphere(atmosphere, constituents, c)
+            )
+            for c in chunks
+        ]
+
+        sk2_rad = xr.concat(
+            results,
+            dim="wavelength",
+            data_vars="minimal",
+            coords="minimal",
+            compat="override",
+        )
+
+        return SASKTRANRadiance.from_sasktran2(sk2_rad)
+
+
+def _config_key(config: sk.Config) -> tuple:
+    key = []
+    for name in dir(config):
+        if name.startswith("_"):
+            continue
+        value = getattr(config, name)
+        if not callable(value):
+            key.append((name, repr(value)))
+    return tuple(key)
+
+
+class PersistentFERGenerator(FERGeneratorBasic):
+    """
+    A FER generator intended to be kept alive across many scenes.
+
+    Constructing the sasktran2 Engine performs the ray tracing and caches most of the geometry
+    information, and is repeated by FERGeneratorBasic for every scene.  This generator instead keeps the
+    most recently used model geometries and engines, keyed on everything they depend on: the altitude grid,
+    the reference solar zenith angle and earth radius, the lines of sight, the refractive index profile and
+    the engine configuration.  Scenes that only change the atmosphere reuse the engine, scenes that only
+    change the lines of sight reuse the model geometry.
+
+    `update` must be called with the observation of each scene before configuring `sk_config` and calling
+    `run`.
+
+    Parameters
+    ----------
+    max_engines : int, optional
+        Maximum number of engines to keep alive, by default 8
+    """
+
+    def __init__(self, max_engines: int = 8):
+        self._sk_config = sk.Config()
+        self._max_engines = max_engines
+
+        self._model_geos = OrderedDict()
+        self._engines = OrderedDict()
+        self._geo_key = None
+        self._viewing_key = None
+
+        self._engine_hits = 0
+        self._engine_misses = 0
+        self._consecutive_misses = 0
+
+    def update(self, observation: Observation, model_altitude_grid: np.array) -> None:
+        """
+        Sets the observation for the next scene
+
+        Parameters
+        ----------
+        observation : Observation
+        model_altitude_grid : np.array
+        """
+        IdealViewingMixin.__init__(self, observation, model_altitude_grid)
+
+        # Engines keep a reference to the config they were built with, so every scene starts from a new one
+        self._sk_config = sk.Config()
+
+        self._viewing_geo = self._construct_viewing_geo()
+        viewing_geo = self._viewing_geo["measurement"]
+
+        try:
+            self._viewing_key = fingerprint(viewing_geo._geometry_ds)
+        except (AttributeError, Unhashable):
+            self._viewing_key = id(viewing_geo)
+
+        # The model geometry depends on the reference solar zenith angle, so scenes with a different solar
+        # geometry can never share an engine
+        self._geo_key = (
+            np.asarray(model_altitude_grid, dtype=float).tobytes(),
+            float(viewing_geo.recommended_cos_sza()),
+            float(viewing_geo.recommended_earth_radius()),
+        )
+
+        # The atmosphere only needs the altitude grid of the geometry, so any geometry with the same key is
+        # used to build it.  A new geometry is only constructed if there is none, and it is given its
+        # refractive index in _engine rather than constructing a second one.
+        model_geo = next(
+            (g for k, g in reversed(self._model_geos.items()) if k[0] == self._geo_key),
+            None,
+        )
+        if model_geo is None:
+            model_geo = self.viewing_geo.model_geometry(
+                np.asarray(model_altitude_grid, dtype=float)
+            )
+            self._store_model_geometry((self._geo_key, None), model_geo)
+        self._model_geo = {"measurement": model_geo}
+
+    def _store_model_geometry(self, key: tuple, model_geo) -> None:
+        self._model_geos[key] = model_geo
+        self._model_geos.move_to_end(key)
+
+        while len(self._model_geos) > self._max_engines:
+            self._model_geos.popitem(last=False)
+
+    def _model_geometry(self, geo_key: tuple, refractive_index: np.ndarray):
+        key = (geo_key, refractive_index.tobytes())
+
+        if key in self._model_geos:
+            self._model_geos.move_to_end(key)
+            return self._model_geos[key]
+
+        # A geometry that no engine uses yet can be given the refractive index in place
+        model_geo = self._model_geos.pop((geo_key, None), None)
+        if model_geo is None:
+            model_geo = self.viewing_geo.model_geometry(
+                np.frombuffer(geo_key[0], dtype=float)
+            )
+        model_geo.refractive_index = refractive_index
+        self._store_model_geometry(key, model_geo)
+
+        return model_geo
+
+    def cache_info(self) -> dict:
+        return {
+            "engine_hits": self._engine_hits,
+            "engine_misses": self._engine_misses,
+            "engines": len(self._engines),
+            "model_geometries": len(self._model_geos),
+        }
+
+    def clear(self) -> None:
+        self._engines.clear()
+        self._model_geos.clear()
+
+    def _engine(self, atmosphere: sk.Atmosphere) -> sk.Engine:
+        refractive_index = sk.optical.refraction.ciddor_index_of_refraction(
+            atmosphere.temperature_k, atmosphere.pressure_pa, 0.0, 400, 1350.0
+        )
+
+        # Each refractive index profile has its own geometry so that geometries shared by engines are never modified
+        self._model_geo = {
+            "measurement": self._model_geometry(self._geo_key, refractive_index)
+        }
+
+        key = (
+            self._geo_key,
+            refractive_index.tobytes(),
+            self._viewing_key,
+            _config_key(self._sk_config),
+        )
+
+        if key in self._engines:
+            self._engine_hits += 1
+            self._consecutive_misses = 0
+        else:
+            self._engine_misses += 1
+            self._consecutive_misses += 1
+            if self._consecutive_misses == self._max_engines:
+                logging.warning(
+                    "PersistentFERGenerator has not reused an engine in %d scenes, every scene changes the "
+                    "geometry, refractive index or configuration and FERGeneratorBasic is equivalent",
+                    self._consecutive_misses,
+                )
+            self._engines[key] = sk.Engine(
+                self._sk_config, self.model_geo, self.viewing_geo
+            )
+        self._engines.move_to_end(key)
+
+        while len(self._engines) > self._max_engines:
+            self._engines.popitem(last=False)
+
+        return self._engines[key]
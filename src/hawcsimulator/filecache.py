@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import contextlib
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(file: Path) -> Iterator[None]:
+    """
+    Exclusive inter-process lock associated with `file`, held through a "<file>.lock" file next to it.
+    On platforms without fcntl this is a no-op and only the atomic rename in `cached_file` protects
+    readers.
+
+    Parameters
+    ----------
+    file : Path
+        File to lock
+    """
+    lock_file = file.with_name(file.name + ".lock")
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+
+    with lock_file.open("w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def cached_file(file: Path, write: Callable[[Path], None]) -> Path:
+    """
+    Returns `file`, creating it first if it does not exist.  The file is written by `write` to a
+    temporary file that is then renamed, under `file_lock`, so that processes sharing the cache generate
+    it only once and never read a partially written file.
+
+    Parameters
+    ----------
+    file : Path
+        Cache file
+    write : Callable[[Path], None]
+        Function writing the contents to the path it is given
+
+    Returns
+    -------
+    Path
+    """
+    if file.exists():
+        return file
+
+    with file_lock(file):
+        # Another process may have created the file while we waited for the lock
+        if file.exists():
+            return file
+
+        with tempfile.NamedTemporaryFile(
+            dir=file.parent, prefix=file.stem, suffix=".tmp", delete=False
+        ) as f:
+            tmp = Path(f.name)
+        try:
+            write(tmp)
+            tmp.replace(file)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    return file
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import numpy as np
+import xarray as xr
+from sasktran2.solar import SolarGeometryHandlerBase
+from sasktran2.viewinggeo import LimbVertical
+
+
+class MultiSceneLimbVertical(LimbVertical):
+    """
+    The lines of sight of several limb scenes packed into a single viewing geometry so that they can be
+    calculated in one radiative transfer call.
+
+    Every line of sight keeps its own tangent location, time and solar angles.  The scenes share one
+    atmosphere and one model geometry, whose reference solar zenith angle and earth radius are the mean of
+    the individual scenes.  Note that for the multiple scatter source this reference solar zenith angle
+    is used for every scene unless `sk_config.num_sza` is increased.
+
+    Parameters
+    ----------
+    scenes : list[LimbVertical]
+        Viewing geometry for each scene
+    solar_handler : SolarGeometryHandlerBase
+        Solar geometry handler used to calculate the solar angles for every line of sight
+    reference_altitude : float, optional
+        Altitude in [m] where the lines of sight are referenced, should be the same as the scenes were
+        constructed with, by default 25000 which is the LimbVertical default
+    """
+
+    def __init__(
+        self,
+        scenes: list[LimbVertical],
+        solar_handler: SolarGeometryHandlerBase,
+        reference_altitude: float = 25000,
+    ):
+        ds = xr.concat([s.geometry_ds for s in scenes], dim="los")
+
+        self._scene_index = np.concatenate(
+            [np.full(s.geometry_ds.sizes["los"], i) for i, s in enumerate(scenes)]
+        )
+        self._scene_cos_sza = np.array([s.recommended_cos_sza() for s in scenes])
+        self._scene_earth_radius = np.array(
+            [s.recommended_earth_radius() for s in scenes]
+        )
+
+        super().__init__(
+            solar_handler,
+            ds["tangent_altitude"].to_numpy(),
+            ds["tangent_latitude"].to_numpy(),
+            ds["tangent_longitude"].to_numpy(),
+            ds["time"].to_numpy(),
+            ds["observer_altitude"].to_numpy(),
+            ds["observer_latitude"].to_numpy(),
+            ds["observer_longitude"].to_numpy(),
+            reference_altitude,
+        )
+
+    @property
+    def scene_index(self) -> np.ndarray:
+        """
+        Index of the scene for every line of sight
+        """
+        return self._scene_index
+
+    @property
+    def num_scenes(self) -> int:
+        return len(self._scene_cos_sza)
+
+    def recommended_cos_sza(self) -> float:
+        return float(np.mean(self._scene_cos_sza))
+
+    def recommended_earth_radius(self) -> float:
+        return float(np.mean(self._scene_earth_radius))
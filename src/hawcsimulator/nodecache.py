@@ -0,0 +1,470 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import sasktran2 as sk
+import xarray as xr
+from hamilton.lifecycle import NodeExecutionMethod
+
+from hawcsimulator.appconfig import APPDIRS
+
+_MISSING = "<missing>"
+
+
+class Unhashable(Exception):
+    """
+    Raised when an object cannot be fingerprinted, the node is then not cached
+    """
+
+
+def _update(h, obj: Any, seen: set) -> None:
+    if obj is None or isinstance(obj, bool | int | float | complex | str):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, bytes):
+        h.update(obj)
+    elif isinstance(obj, np.ndarray):
+        h.update(f"ndarray:{obj.dtype}:{obj.shape};".encode())
+        if obj.dtype.hasobject:
+            for v in obj.ravel():
+                _update(h, v, seen)
+        else:
+            h.update(np.ascontiguousarray(obj).reshape(-1).view(np.uint8))
+    elif isinstance(obj, np.generic | pd.Timestamp | np.datetime64):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, xr.DataArray):
+        _update(h, obj.to_dataset(name=obj.name or "__da__"), seen)
+    elif isinstance(obj, xr.Dataset):
+        h.update(b"dataset;")
+        for name in sorted(obj.variables, key=str):
+            var = obj.variables[name]
+            _update(h, str(name), seen)
+            _update(h, var.dims, seen)
+            _update(h, var.to_numpy(), seen)
+    elif isinstance(obj, dict):
+        h.update(b"dict;")
+        for k in sorted(obj, key=repr):
+            _update(h, k, seen)
+            _update(h, obj[k], seen)
+    elif isinstance(obj, list | tuple):
+        h.update(f"{type(obj).__name__}:{len(obj)};".encode())
+        for v in obj:
+            _update(h, v, seen)
+    elif isinstance(obj, sk.Config):
+        # Extension object, hashed through its public settings
+        h.update(b"sk.Config;")
+        for name in dir(obj):
+            if not name.startswith("_"):
+                value = getattr(obj, name)
+                if not callable(value):
+                    _update(h, name, seen)
+                    h.update(f"{value!r};".encode())
+    elif inspect.isfunction(obj) or inspect.ismethod(obj):
+        func = getattr(obj, "__func__", obj)
+        h.update(f"function:{func.__module__}.{func.__qualname__};".encode())
+        h.update(func.__code__.co_code)
+        _update(h, [c for c in func.__code__.co_consts if not inspect.iscode(c)], seen)
+        if id(func) in seen:
+            h.update(b"<cycle>;")
+            return
+        seen.add(id(func))
+        # Closures and defaults capture values that the code alone doesn't show
+        for cell in func.__closure__ or ():
+            try:
+                _update(h, cell.cell_contents, seen)
+            except ValueError:  # Empty cell
+                h.update(b"<empty>;")
+        _update(h, func.__defaults__, seen)
+        _update(h, func.__kwdefaults__, seen)
+    elif inspect.ismodule(obj) or inspect.isclass(obj):
+        h.update(f"{obj.__module__ if inspect.isclass(obj) else ''}.{obj.__name__};".encode())
+    elif hasattr(obj, "__dict__"):
+        if id(obj) in seen:
+            h.update(b"<cycle>;")
+            return
+        seen.add(id(obj))
+        h.update(f"{type(obj).__module__}.{type(obj).__qualname__};".encode())
+        _update(h, vars(obj), seen)
+    else:
+        # Extension objects without a python __dict__ are only hashable if they pickle
+        try:
+            h.update(pickle.dumps(obj))
+        except Exception as err:
+            msg = f"Cannot fingerprint object of type {type(obj)}"
+            raise Unhashable(msg) from err
+
+
+def fingerprint(obj: Any) -> str:
+    """
+    A content based hash of an arbitrary python object.  Numpy arrays, xarray objects, containers and
+    plain python objects are hashed by value.
+
+    Parameters
+    ----------
+    obj : Any
+
+    Returns
+    -------
+    str
+        Hex digest of the object
+
+    Raises
+    ------
+    Unhashable
+        If the object (or something it contains) cannot be hashed by value
+    """
+    h = hashlib.sha256()
+    _update(h, obj, set())
+    return h.hexdigest()
+
+
+@functools.cache
+def _function_source(fn) -> str:
+    try:
+        return inspect.getsource(fn)
+    except (OSError, TypeError):
+        return f"{fn.__module__}.{fn.__qualname__}"
+
+
+# Code that cached nodes call into but that isn't part of the DAG, e.g. FERGeneratorBasic.run
+_KEYED_MODULES = ("hawcsimulator.fer",)
+_KEYED_PACKAGES = ("hawcsimulator", "sasktran2")
+
+
+@functools.cache
+def _environment_fingerprint() -> str:
+    """
+    Versions of the packages and source of the modules that cached values depend on
+    """
+    h = hashlib.sha256()
+    for package in _KEYED_PACKAGES:
+        try:
+            version = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            version = _MISSING
+        h.update(f"{package}:{version};".encode())
+    for module in _KEYED_MODULES:
+        spec = importlib.util.find_spec(module)
+        h.update(f"{module};".encode())
+        if spec is not None and spec.origin is not None:
+            h.update(Path(spec.origin).read_bytes())
+    return h.hexdigest()
+
+
+class _NodeCacheAdapter(NodeExecutionMethod):
+    def __init__(self, cache: NodeCache) -> None:
+        self._cache = cache
+        self.keys = {}
+
+    def run_to_execute_node(
+        self,
+        *,
+        node_name: str,
+        node_tags: dict[str, Any],  # noqa: ARG002
+        node_callable: Any,
+        node_kwargs: dict[str, Any],
+        task_id: str | None,  # noqa: ARG002
+        **future_kwargs: Any,
+    ) -> Any:
+        key = self.keys.get(node_name)
+        if key is None:
+            return node_callable(**node_kwargs)
+
+        found, value = self._cache.load(node_name, key)
+        if found:
+            return value
+
+        value = node_callable(**node_kwargs)
+        self._cache.store(node_name, key, value)
+        return value
+
+
+class NodeCache:
+    """
+    An opt-in, content addressed on-disk cache for expensive nodes in the simulator DAG.
+
+    The key for a node is a hash of everything upstream of it: the user inputs it depends on, the
+    source code of every upstream step, and the driver configuration, together with the installed
+    hawcsimulator and sasktran2 versions and the source of hawcsimulator.fer.  Upgrading either package
+    or editing the FER generators therefore invalidates cached radiances.
+
+    Inputs must be fingerprinted by value.  Plain python objects, numpy and xarray objects and
+    `sk.Config` are supported, a node that depends on an input that can't be fingerprinted, e.g. a
+    `sk.Atmosphere` passed in directly, is not cached and a warning is logged.  Changing only downstream
+    settings, e.g. `l1b_cfg` or `l2_cfg`, therefore reuses the cached node.  The cache is size bounded
+    and evicts the least recently used entries.
+
+    Parameters
+    ----------
+    directory : Path | str | None, optional
+        Directory to store the cache in, by default the user cache directory
+    max_size_bytes : int, optional
+        Maximum total size of the cache, by default 10 GB
+    nodes : tuple[str], optional
+        Names of the nodes to cache, by default ("front_end_radiance",)
+    """
+
+    def __init__(
+        self,
+        directory: Path | str | None = None,
+        max_size_bytes: int = 10 * 1024**3,
+        nodes: tuple[str] = ("front_end_radiance",),
+    ) -> None:
+        if directory is None:
+            directory = Path(APPDIRS.user_cache_dir) / "nodes"
+        self._directory = Path(directory)
+        self._max_size_bytes = max_size_bytes
+        self._nodes = tuple(nodes)
+        self._adapter = _NodeCacheAdapter(self)
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def nodes(self) -> tuple[str]:
+        return self._nodes
+
+    @property
+    def adapter(self) -> _NodeCacheAdapter:
+        return self._adapter
+
+    def _file(self, node_name: str, key: str) -> Path:
+        return self._directory / f"{node_name}-{key}.pkl"
+
+    def prepare(self, graph_nodes: dict, inputs: dict, config: dict) -> None:
+        """
+        Computes the cache keys for every cached node in the graph before execution
+
+        Parameters
+        ----------
+        graph_nodes : dict
+            Dictionary of {name: hamilton.node.Node} for the driver graph
+        inputs : dict
+            Inputs passed to the driver
+        config : dict
+            Configuration of the driver
+        """
+        keys = {}
+        fingerprints = {}
+        for name in self._nodes:
+            if name not in graph_nodes:
+                continue
+            try:
+                keys[name] = self._node_key(
+                    graph_nodes[name], inputs, config, fingerprints
+                )
+            except Unhashable as err:
+                logging.warning("Not caching node %s: %s", name, err)
+
+        self._adapter.keys = keys
+
+    def _node_key(self, node, inputs: dict, config: dict, fingerprints: dict) -> str:
+        ancestors = {}
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.name in ancestors:
+                continue
+            ancestors[n.name] = n
+            stack.extend(n.dependencies)
+
+        h = hashlib.sha256()
+        h.update(node.name.encode())
+        h.update(_environment_fingerprint().encode())
+        h.update(fingerprint(config).encode())
+        for name in sorted(ancestors):
+            n = ancestors[name]
+            h.update(name.encode())
+            if n.user_defined:
+                if name not in fingerprints:
+                    fingerprints[name] = (
+                        fingerprint(inputs[name]) if name in inputs else _MISSING
+                    )
+                h.update(fingerprints[name].encode())
+            else:
+                for fn in n.originating_functions or ():
+                    h.update(_function_source(fn).encode())
+
+        return h.hexdigest()
+
+    def load(self, node_name: str, key: str) -> tuple[bool, Any]:
+        file = self._file(node_name, key)
+        try:
+            with file.open("rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self._misses += 1
+            return False, None
+        except Exception as err:
+            # Truncated entries, or entries written by an incompatible version, are recomputed
+            logging.warning("Evicting unreadable cache entry %s: %s", file, err)
+            file.unlink(missing_ok=True)
+            self._misses += 1
+            return False, None
+
+        # Access time is tracked through the modification time for LRU eviction
+        os.utime(file)
+        self._hits += 1
+        return True, value
+
+    def store(self, node_name: str, key: str, value: Any) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as err:
+            logging.warning("Could not cache node %s: %s", node_name, err)
+            return
+
+        # Write to a temporary file and rename so that concurrent readers never see partial files
+        fd, tmp = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        Path(tmp).replace(self._file(node_name, key))
+
+        self.evict()
+
+    def entries(self) -> list[dict]:
+        """
+        Every entry in the cache, ordered from least to most recently used
+
+        Returns
+        -------
+        list[dict]
+            Dictionaries with keys "node", "key", "size_bytes", "last_access" and "file"
+        """
+        if not self._directory.exists():
+            return []
+
+        result = []
+        for file in self._directory.glob("*.pkl"):
+            node_name, _, key = file.stem.rpartition("-")
+            stat = file.stat()
+            result.append(
+                {
+                    "node": node_name,
+                    "key": key,
+                    "size_bytes": stat.st_size,
+                    "last_access": pd.Timestamp(stat.st_mtime, unit="s"),
+                    "file": file,
+                }
+            )
+        return sorted(result, key=lambda e: e["last_access"])
+
+    def size_bytes(self) -> int:
+        return sum(e["size_bytes"] for e in self.entries())
+
+    def info(self) -> dict:
+        """
+        Summary statistics of the cache
+
+        Returns
+        -------
+        dict
+            Dictionary with keys "entries", "size_bytes", "max_size_bytes", "hits" and "misses"
+        """
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "size_bytes": sum(e["size_bytes"] for e in entries),
+            "max_size_bytes": self._max_size_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries until the cache is within its size limit
+
+        Returns
+        -------
+        int
+            Number of entries removed
+        """
+        entries = self.entries()
+        total = sum(e["size_bytes"] for e in entries)
+
+        removed = 0
+        for e in entries:
+            if total <= self._max_size_bytes:
+                break
+            e["file"].unlink(missing_ok=True)
+            total -= e["size_bytes"]
+            removed += 1
+        return removed
+
+    def purge(self, node_name: str | None = None, older_than: float | None = None) -> int:
+        """
+        Removes entries from the cache
+
+        Parameters
+        ----------
+        node_name : str | None, optional
+            Only remove entries for this node, by default None which removes every node
+        older_than : float | None, optional
+            Only remove entries that have not been used in this many seconds, by default None
+
+        Returns
+        -------
+        int
+            Number of entries removed
+        """
+        now = time.time()
+        removed = 0
+        for e in self.entries():
+            if node_name is not None and e["node"] != node_name:
+                continue
+            if older_than is not None and now - e["file"].stat().st_mtime < older_than:
+                continue
+            e["file"].unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hawcsimulator.nodecache",
+        description="Inspect and purge the hawcsimulator node cache",
+    )
+    parser.add_argument("--dir", default=None, help="Cache directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="Summary of the cache")
+    sub.add_parser("list", help="List every entry in the cache")
+    purge = sub.add_parser("purge", help="Remove entries from the cache")
+    purge.add_argument("--node", default=None, help="Only purge this node")
+    purge.add_argument(
+        "--older-than", type=float, default=None, help="Only purge entries unused for this many seconds"
+    )
+
+    args = parser.parse_args(argv)
+    cache = NodeCache(args.dir)
+
+    if args.command == "info":
+        print(f"directory: {cache.directory}")  # noqa: T201
+        for k, v in cache.info().items():
+            print(f"{k}: {v}")  # noqa: T201
+    elif args.command == "list":
+        for e in cache.entries():
+            print(f"{e['node']}\t{e['key'][:16]}\t{e['size_bytes']}\t{e['last_access']}")  # noqa: T201
+    elif args.command == "purge":
+        removed = cache.purge(args.node, args.older_than)
+        print(f"Removed {removed} entries")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,289 @@
 from __future__ import annotations
 
 import abc
+import zlib
 
 import numpy as np
 import xarray as xr
 
 
+class NoiseStreams:
+    """
+    Independent, reproducible random number streams for the simulator noise.
+
+    Every stream is keyed on (scene_id, product, realization) and seeded from a `np.random.SeedSequence`
+    with that key as its spawn key, driving a counter based Philox generator.  The noise drawn for a given
+    key therefore depends only on the seed and the key, not on how many other streams were used before
+    it, the order scenes are run in, or which worker process runs them.
+
+    Parameters
+    ----------
+    seed : int | None, optional
+        Root seed, by default None which draws fresh entropy.  The entropy used is available as `seed`
+        so that a run can be reproduced later
+    scene_id : int, optional
+        Identifier of the scene, by default 0
+    """
+
+    def __init__(self, seed: int | None = None, scene_id: int = 0) -> None:
+        self._seed = np.random.SeedSequence(seed).entropy
+        self._scene_id = int(scene_id)
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def scene_id(self) -> int:
+        return self._scene_id
+
+    def generator(self, product: str, realization: int = 0) -> np.random.Generator:
+        """
+        The random number generator for one product and realization of this scene
+
+        Parameters
+        ----------
+        product : str
+            Name of the product the noise is for, e.g. "I" or "dolp"
+        realization : int, optional
+            Realization number, by default 0
+
+        Returns
+        -------
+        np.random.Generator
+        """
+        seed_seq = np.random.SeedSequence(
+            self._seed,
+            spawn_key=(self._scene_id, zlib.crc32(product.encode()), int(realization)),
+        )
+        return np.random.Generator(np.random.Philox(seed_seq))
+
+    def standard_normal(
+        self,
+        shape: tuple[int, ...],
+        product: str,
+        realization: int = 0,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Unit normal noise for one product and realization, drawn directly into `out`
+
+        Parameters
+        ----------
+        shape : tuple[int, ...]
+            Shape of the noise
+        product : str
+            Name of the product the noise is for
+        realization : int, optional
+            Realization number, by default 0
+        out : np.ndarray | None, optional
+            Preallocated float64 array to draw into, by default None which allocates a new array
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if out is None:
+            out = np.empty(shape)
+        self.generator(product, realization).standard_normal(out=out)
+        return out
+
+    def standard_normal_ensemble(
+        self, shape: tuple[int, ...], product: str, num_realizations: int
+    ) -> np.ndarray:
+        """
+        Unit normal noise for realizations 0 to num_realizations - 1 of a product, every realization
+        is identical to the result of `standard_normal` for it
+
+        Parameters
+        ----------
+        shape : tuple[int, ...]
+            Shape of the noise for a single realization
+        product : str
+            Name of the product the noise is for
+        num_realizations : int
+            Number of realizations
+
+        Returns
+        -------
+        np.ndarray
+            Shape (num_realizations, *shape)
+        """
+        out = np.empty((num_realizations, *shape))
+        for i in range(num_realizations):
+            self.standard_normal(shape, product, i, out=out[i])
+        return out
+
+
 class NoiseModel(abc.ABC):
+    """
+    A model of the measurement noise.  Noise models are also callable, returning the standard deviation
+    of the noise, so they can be used anywhere a `noise_model` function of the radiance is accepted.
+    """
+
     @abc.abstractmethod
-    def calc_noise(self, signal: xr.DataArray):
-        pass
+    def noise_sigma(self, signal: xr.DataArray) -> xr.DataArray:
+        """
+        Standard deviation of the noise on the signal
+
+        Parameters
+        ----------
+        signal : xr.DataArray
+            Noise free signal
+
+        Returns
+        -------
+        xr.DataArray
+        """
+
+    @abc.abstractmethod
+    def calc_noise(
+        self, signal: xr.DataArray, standard_normal: np.ndarray | None = None
+    ):
+        """
+        Adds noise to the signal
+
+        Parameters
+        ----------
+        signal : xr.DataArray
+            Noise free signal
+        standard_normal : np.ndarray | None, optional
+            Unit normal draws with the shape of signal to build the noise from, e.g. from `NoiseStreams`,
+            by default None which draws them from an unseeded generator
+
+        Returns
+        -------
+        tuple
+            The noisy signal and the standard deviation of the noise
+        """
+
+    def __call__(self, signal: xr.DataArray) -> xr.DataArray:
+        return self.noise_sigma(signal)
 
 
 class ConstantNoise(NoiseModel):
     def __init__(self, noise_level: float):
         self._noise_level = noise_level
 
-    def calc_noise(self, signal: xr.DataArray):
+    def noise_sigma(self, signal: xr.DataArray) -> xr.DataArray:
+        return signal * self._noise_level
+
+    def calc_noise(
+        self, signal: xr.DataArray, standard_normal: np.ndarray | None = None
+    ):
+        noise_sigma = self.noise_sigma(signal)
 
-        noise_sigma = signal * self._noise_level
+        if standard_normal is None:
+            standard_normal = np.random.default_rng().standard_normal(signal.shape)
 
-        add_noise = np.random.default_rng().normal(0, noise_sigma.to_numpy())
+        add_noise = standard_normal * noise_sigma.to_numpy()
 
         return (signal + add_noise, noise_sigma)
+
+
+class DetectorNoise(NoiseModel):
+    """
+    Noise of a detector that counts photo-electrons.  The radiance is converted to electrons with
+
+        electrons = radiance * etendue * integration_time * bandwidth * quantum_efficiency
+
+    so the radiance must be in [photons / s / cm^2 / sr / nm].  The noise is the shot noise of the signal
+    and the dark current, the read noise, and the quantization of the analog to digital converter.  The
+    mean dark signal is removed, so the noisy radiance is unbiased.
+
+    Every operation is elementwise on the whole signal array, the shot noise uses the normal
+    approximation to the Poisson distribution so that the noise can be built from `NoiseStreams` draws.
+
+    Parameters
+    ----------
+    etendue : float
+        Etendue of a detector pixel in [cm^2 sr]
+    integration_time : float
+        Integration time in [s]
+    bandwidth : float, optional
+        Spectral width of a pixel in [nm], by default 1
+    quantum_efficiency : float | xr.DataArray, optional
+        Fraction of the photons converted to electrons, including the optical throughput.  A DataArray,
+        e.g. with a "wavelength" dimension, is broadcast against the signal, by default 1
+    read_noise : float, optional
+        Read noise in [electrons], by default 0
+    dark_current : float, optional
+        Dark current in [electrons / s], by default 0
+    gain : float | None, optional
+        Electrons per digital number of the ADC, by default None which does not quantize the signal
+    adc_bits : int | None, optional
+        Resolution of the ADC, the signal saturates at 2**adc_bits - 1 digital numbers.  Only used when
+        gain is set, by default None which does not saturate
+    """
+
+    def __init__(
+        self,
+        etendue: float,
+        integration_time: float,
+        bandwidth: float = 1.0,
+        quantum_efficiency: float | xr.DataArray = 1.0,
+        read_noise: float = 0.0,
+        dark_current: float = 0.0,
+        gain: float | None = None,
+        adc_bits: int | None = None,
+    ):
+        self._electrons_per_radiance = (
+            etendue * integration_time * bandwidth * quantum_efficiency
+        )
+        self._read_noise = read_noise
+        self._dark_electrons = dark_current * integration_time
+        self._gain = gain
+        self._adc_bits = adc_bits
+
+    def _conversion(self, signal: xr.DataArray) -> np.ndarray | float:
+        if isinstance(self._electrons_per_radiance, xr.DataArray):
+            return (
+                self._electrons_per_radiance.broadcast_like(signal)
+                .transpose(*signal.dims)
+                .to_numpy()
+            )
+        return self._electrons_per_radiance
+
+    def _electron_variance(self, electrons: np.ndarray) -> np.ndarray:
+        variance = np.abs(electrons) + self._dark_electrons + self._read_noise**2
+        if self._gain is not None:
+            variance += self._gain**2 / 12
+        return variance
+
+    def noise_sigma(self, signal: xr.DataArray) -> xr.DataArray:
+        conversion = self._conversion(signal)
+        electrons = signal.to_numpy() * conversion
+
+        return signal.copy(data=np.sqrt(self._electron_variance(electrons)) / conversion)
+
+    def calc_noise(
+        self, signal: xr.DataArray, standard_normal: np.ndarray | None = None
+    ):
+        conversion = self._conversion(signal)
+        electrons = signal.to_numpy() * conversion
+
+        if standard_normal is None:
+            standard_normal = np.random.default_rng().standard_normal(signal.shape)
+
+        variance = self._electron_variance(electrons)
+        sigma = np.sqrt(variance)
+
+        # Shot, dark and read noise, quantization is applied to the noisy count
+        random_variance = variance
+        if self._gain is not None:
+            random_variance = variance - self._gain**2 / 12
+        measured = np.sqrt(random_variance) * standard_normal
+        measured += electrons + self._dark_electrons
+
+        if self._gain is not None:
+            measured = np.round(measured / self._gain)
+            max_dn = np.inf if self._adc_bits is None else 2**self._adc_bits - 1
+            np.clip(measured, 0, max_dn, out=measured)
+            measured *= self._gain
+
+        measured -= self._dark_electrons
+
+        return (
+            signal.copy(data=measured / conversion),
+            signal.copy(data=sigma / conversion),
+        )
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from collections import deque
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from hamilton.lifecycle import NodeExecutionHook
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _max_rss_bytes() -> float:
+    if resource is None:
+        return np.nan
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return float(rss) if sys.platform == "darwin" else float(rss) * 1024
+
+
+class NodeProfiler(NodeExecutionHook):
+    """
+    Hamilton lifecycle hook that records the wall time, CPU time and memory usage of every node that
+    is executed.
+
+    By default memory is measured as the growth in the peak resident set size of the process while the
+    node runs, which is essentially free to measure but only shows nodes that raise the high water mark.
+    With `trace_allocations=True` the peak memory allocated inside each node is measured exactly with
+    tracemalloc, at the cost of slowing down allocation heavy python code.  Tracing is started by the
+    first node and stopped by `stop` when the run ends, unless it was already running beforehand.
+
+    Records are kept per run, and only the most recent `max_runs` runs are retained so that a profiler
+    left on over a long campaign uses bounded memory and every run costs the same to profile.
+
+    Parameters
+    ----------
+    trace_allocations : bool, optional
+        Use tracemalloc to measure peak allocated memory per node, by default False
+    max_runs : int | None, optional
+        Number of runs to retain records for, by default 100.  None retains every run
+    """
+
+    _COLUMNS = (
+        "run",
+        "node",
+        "wall_time_s",
+        "cpu_time_s",
+        "peak_memory_bytes",
+        "success",
+    )
+
+    def __init__(self, trace_allocations: bool = False, max_runs: int | None = 100) -> None:
+        self._trace_allocations = trace_allocations
+        self._runs = deque(maxlen=max_runs)
+        self._start = {}
+        self._started_tracing = False
+        self._run_index = -1
+        self.new_run()
+
+    def new_run(self) -> None:
+        self._run_index += 1
+        self._records = []
+        self._runs.append((self._run_index, self._records))
+
+    def run_before_node_execution(
+        self,
+        *,
+        node_name: str,
+        **future_kwargs: Any,
+    ) -> None:
+        if self._trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            mem = tracemalloc.get_traced_memory()[0]
+        else:
+            mem = _max_rss_bytes()
+
+        self._start[node_name] = (time.perf_counter(), time.process_time(), mem)
+
+    def run_after_node_execution(
+        self,
+        *,
+        node_name: str,
+        success: bool = True,
+        **future_kwargs: Any,
+    ) -> None:
+        wall, cpu, mem = self._start.pop(node_name)
+
+        if self._trace_allocations:
+            peak_memory = tracemalloc.get_traced_memory()[1] - mem
+        else:
+            peak_memory = _max_rss_bytes() - mem
+
+        self._records.append(
+            {
+                "run": self._run_index,
+                "node": node_name,
+                "wall_time_s": time.perf_counter() - wall,
+                "cpu_time_s": time.process_time() - cpu,
+                "peak_memory_bytes": peak_memory,
+                "success": success,
+            }
+        )
+
+    def stop(self) -> None:
+        """
+        Stops tracemalloc if it was started by this profiler, called by Simulator.run when a profiled
+        run ends
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def run_profile(self, run_index: int | None = None) -> pd.DataFrame:
+        """
+        Per node timing for a single run
+
+        Parameters
+        ----------
+        run_index : int | None, optional
+            Run to return, by default None which is the most recent run
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        if run_index is None or run_index == self._run_index:
+            records = self._records
+        else:
+            records = next((r for i, r in self._runs if i == run_index), [])
+
+        return pd.DataFrame(records, columns=list(self._COLUMNS))
+
+    def records(self) -> pd.DataFrame:
+        """
+        Every record retained by the profiler
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        return pd.DataFrame(
+            [r for _, run in self._runs for r in run], columns=list(self._COLUMNS)
+        )
+
+    def report(self) -> pd.DataFrame:
+        """
+        Aggregate per node statistics over every run retained by the profiler
+        """
+        return profile_report([self.records()])
+
+    def clear(self) -> None:
+        self.stop()
+        self._runs.clear()
+        self._start = {}
+        self._run_index = -1
+        self.new_run()
+
+
+def profile_report(profiles: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Aggregates per node profiles, e.g. the profiles returned by Simulator.run_batch with profile=True,
+    into a single report
+
+    Parameters
+    ----------
+    profiles : Iterable[pd.DataFrame]
+        Per run profiles from NodeProfiler
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by node, with the number of calls, total and mean wall/CPU time, and the maximum peak
+        memory.  Sorted by total wall time.
+    """
+    df = pd.concat(list(profiles), ignore_index=True)
+
+    report = df.groupby("node").agg(
+        calls=("wall_time_s", "size"),
+        total_wall_time_s=("wall_time_s", "sum"),
+        mean_wall_time_s=("wall_time_s", "mean"),
+        total_cpu_time_s=("cpu_time_s", "sum"),
+        mean_cpu_time_s=("cpu_time_s", "mean"),
+        max_peak_memory_bytes=("peak_memory_bytes", "max"),
+    )
+    report["fraction_wall_time"] = (
+        report["total_wall_time_s"] / report["total_wall_time_s"].sum()
+    )
+
+    return report.sort_values("total_wall_time_s", ascending=False)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Iterable
+from typing import Any
+
+_LOADERS: dict[str, Callable[[], Any]] = {}
+_RESOURCES: dict[str, Any] = {}
+_LOCK = threading.RLock()
+
+
+def register(name: str) -> Callable:
+    """
+    Decorator registering a function that loads a heavy, read-only resource, e.g. a calibration database
+    or an optical property.  The function is called at most once per process, the first time the resource
+    is requested with `get`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the resource
+
+    Returns
+    -------
+    Callable
+    """
+
+    def decorator(loader: Callable[[], Any]) -> Callable[[], Any]:
+        with _LOCK:
+            _LOADERS[name] = loader
+        return loader
+
+    return decorator
+
+
+def get(name: str) -> Any:
+    """
+    Returns a registered resource, loading it if it has not been loaded yet in this process.
+    The returned object is shared between every caller and must not be modified.
+
+    Parameters
+    ----------
+    name : str
+        Name of the resource
+
+    Returns
+    -------
+    Any
+    """
+    with _LOCK:
+        if name not in _RESOURCES:
+            if name not in _LOADERS:
+                msg = f"Unknown resource: {name}"
+                raise KeyError(msg)
+            _RESOURCES[name] = _LOADERS[name]()
+        return _RESOURCES[name]
+
+
+def warm_up(names: Iterable[str] | None = None) -> None:
+    """
+    Loads resources ahead of time, e.g. when starting a long lived worker
+
+    Parameters
+    ----------
+    names : Iterable[str] | None, optional
+        Resources to load, by default None which loads every registered resource
+    """
+    if names is None:
+        names = list(_LOADERS)
+    for name in names:
+        get(name)
+
+
+def release(names: Iterable[str] | None = None) -> None:
+    """
+    Drops loaded resources so that their memory can be reclaimed, they are reloaded on the next `get`
+
+    Parameters
+    ----------
+    names : Iterable[str] | None, optional
+        Resources to release, by default None which releases every loaded resource
+    """
+    with _LOCK:
+        if names is None:
+            names = list(_RESOURCES)
+        for name in names:
+            _RESOURCES.pop(name, None)
+
+
+def registered() -> list[str]:
+    return sorted(_LOADERS)
+
+
+def loaded() -> list[str]:
+    return sorted(_RESOURCES)
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import inspect
 from collections.abc import Callable
 from pathlib import Path
 
 import appdirs
 import numpy as np
+import scipy.fft
 import xarray as xr
 
+from hawcsimulator.filecache import cached_file
+from hawcsimulator.nodecache import fingerprint
+
 
 def _default_filter(w, wl):
     f = np.ones(w.shape)
@@ -105,38 +110,74 @@ def generate_ideal_l2_cal_db(
         filter_fn(hires_wavenumber_grid, littrow_wavel_nm),
     )
 
-    ils = np.zeros((len(hires_wavenumber_grid), len(result.sample_wavenumber)))
+    # Every sample's ILS is the same kernel shifted to the sample wavenumber, so they are computed
+    # together as the rows of one (sample, hires) array
+    ils = np.sinc(
+        (hires_wavenumber_grid - result.sample_wavenumber.to_numpy()[:, np.newaxis])
+        / wvnum_spacing
+    )
 
-    for idx, wvnum in enumerate(result.sample_wavenumber):
-        ideal_ils = np.sinc((hires_wavenumber_grid - float(wvnum)) / (wvnum_spacing))
+    if apodization is not None:
+        apodized_ils = scipy.fft.fftshift(
+            scipy.fft.fft(scipy.fft.fftshift(ils, axes=-1), axis=-1, workers=-1),
+            axes=-1,
+        )
+        apod_fun = np.zeros(apodized_ils.shape[-1])
+        c = len(apod_fun) // 2
+        apod_fun[c - (num_samples // 2) : (c + num_samples // 2)] = np.kaiser(
+            num_samples, apodization
+        )
 
-        if apodization is not None:
-            apodized_ils = np.fft.fftshift(np.fft.fft(np.fft.fftshift(ideal_ils)))
-            apod_fun = np.zeros(len(apodized_ils))
-            c = len(apod_fun) // 2
-            apod_fun[c - (num_samples // 2) : (c + num_samples // 2)] = np.kaiser(
-                num_samples, apodization
-            )
+        ils = scipy.fft.fftshift(
+            scipy.fft.ifft(
+                scipy.fft.ifftshift(apod_fun * apodized_ils, axes=-1),
+                axis=-1,
+                workers=-1,
+            ).real,
+            axes=-1,
+        )
 
-            ideal_ils = np.fft.fftshift(
-                np.fft.ifft(np.fft.ifftshift(apod_fun * apodized_ils)).real
-            )
+    if include_aliasing:
+        # Have to add on the aliased part of the ILS
+        ils += ils[:, ::-1]
 
-        if include_aliasing:
-            # Have to add on the aliased part of the ILS
-            ideal_ils += ideal_ils[::-1]
+    ils *= filter_fn(1e7 / hires_wavenumber_grid, littrow_wavel_nm)
 
-        ideal_ils *= filter_fn(1e7 / hires_wavenumber_grid, littrow_wavel_nm)
+    result["ils"] = (["hires_wavenumber", "sample_wavenumber"], ils.T)
 
-        ils[:, idx] = ideal_ils
+    return result
 
-    result["ils"] = (["hires_wavenumber", "sample_wavenumber"], ils)
 
-    return result
+def spectral_window(cal_db: xr.Dataset, rtol: float = 1e-4) -> tuple[float, float]:
+    """
+    The range of high resolution wavenumbers that contribute to any sample of the calibration database.
+    The ILS of every sample already includes the filter, so this is the filter passband widened by the
+    ILS half width.  Outside of it every ILS is below rtol times its peak.
+
+    Parameters
+    ----------
+    cal_db : xr.Dataset
+        Calibration database with "ils" on (hires_wavenumber, sample_wavenumber)
+    rtol : float, optional
+        Relative level of the ILS that defines the edges of the window, by default 1e-4
+
+    Returns
+    -------
+    tuple[float, float]
+        Lowest and highest wavenumber of the window in [cm^-1]
+    """
+    ils = np.abs(
+        cal_db["ils"].transpose("hires_wavenumber", "sample_wavenumber").to_numpy()
+    )
+    significant = (ils > rtol * ils.max(axis=0)).any(axis=1)
 
+    hires = cal_db["hires_wavenumber"].to_numpy()[significant]
 
-def calibration_database(name: str = "ideal", version: str = "v1"):
-    dir = (
+    return float(hires.min()), float(hires.max())
+
+
+def _calibration_dir() -> Path:
+    return (
         Path(
             appdirs.AppDirs(
                 appname="hawc-simulator", appauthor="usask-arg"
@@ -146,24 +187,116 @@ def calibration_database(name: str = "ideal", version: str = "v1"):
         / "calibration"
     )
 
-    file = dir / f"{name}_{version}.nc"
-
-    if not file.exists():
-        if name == "ideal":
-            cal_db = generate_ideal_l2_cal_db(
-                512,
-                0.002 * 3.4,
-                1362,
-                apodization=10,
-                include_aliasing=False,
-                filter_fn=lambda w, wl: bandpass_filter(  # noqa: ARG005
-                    w, 1364, 1.0, 0.2, 80
-                ),
-            )
-            file.parent.mkdir(parents=True, exist_ok=True)
-            cal_db.to_netcdf(file)
-
-            return file
-        error_message = f"Unknown calibration database name: {name}"
-        raise ValueError(error_message)
-    return file
+
+def _called_functions(fn: Callable, modules: tuple[str, ...]) -> list[Callable]:
+    """
+    fn and every function it calls through a global name, or an attribute of a global module, that is
+    defined in one of `modules`, recursively
+    """
+    found = []
+    stack = [fn]
+    while stack:
+        f = stack.pop()
+        if f in found:
+            continue
+        found.append(f)
+
+        code = getattr(f, "__code__", None)
+        if code is None:
+            continue
+        f_globals = getattr(f, "__globals__", {})
+        referenced = [f_globals[n] for n in code.co_names if n in f_globals]
+        referenced += [
+            getattr(m, n)
+            for m in referenced
+            if inspect.ismodule(m)
+            for n in code.co_names
+            if hasattr(m, n)
+        ]
+        stack.extend(
+            r
+            for r in referenced
+            if inspect.isfunction(r) and r.__module__.startswith(modules)
+        )
+
+    return found
+
+
+def _function_sources(fn: Callable) -> list[str]:
+    modules = ("hawcsimulator", fn.__module__)
+    sources = []
+    for f in _called_functions(fn, modules):
+        try:
+            sources.append(inspect.getsource(f))
+        except (OSError, TypeError):
+            sources.append(f"{f.__module__}.{f.__qualname__}")
+    return sources
+
+
+def cached_ideal_l2_cal_db(
+    num_samples: int,
+    opd_per_sample: float,
+    littrow_wavel_nm: float,
+    apodization: float | None = None,
+    filter_fn: Callable = _default_filter,
+    hires_reduction_factor: int = 10,
+    fc=0.01,
+    include_aliasing=False,
+    prefix: str = "ideal",
+) -> Path:
+    """
+    File containing the calibration database from generate_ideal_l2_cal_db for these parameters,
+    generating it if it does not exist yet.  The file name contains a hash of every generation
+    parameter, including the source of filter_fn, the values it captures and the functions it calls,
+    and the source of generate_ideal_l2_cal_db, so parameter studies and changes to the code never reuse
+    a stale database.
+
+    Parameters
+    ----------
+    prefix : str, optional
+        Prefix of the file name, by default "ideal"
+
+    Other parameters are passed to generate_ideal_l2_cal_db
+
+    Returns
+    -------
+    Path
+    """
+    params = {
+        "num_samples": num_samples,
+        "opd_per_sample": opd_per_sample,
+        "littrow_wavel_nm": littrow_wavel_nm,
+        "apodization": apodization,
+        "filter_fn": filter_fn,
+        "hires_reduction_factor": hires_reduction_factor,
+        "fc": fc,
+        "include_aliasing": include_aliasing,
+    }
+    key = {
+        **params,
+        "filter_source": _function_sources(filter_fn),
+        "generator_source": _function_sources(generate_ideal_l2_cal_db),
+    }
+
+    file = _calibration_dir() / f"{prefix}_{fingerprint(key)[:16]}.nc"
+
+    return cached_file(
+        file, lambda tmp: generate_ideal_l2_cal_db(**params).to_netcdf(tmp)
+    )
+
+
+def calibration_database(name: str = "ideal", version: str = "v1"):
+    if name == "ideal":
+        return cached_ideal_l2_cal_db(
+            512,
+            0.002 * 3.4,
+            1362,
+            apodization=10,
+            include_aliasing=False,
+            filter_fn=lambda w, wl: bandpass_filter(  # noqa: ARG005
+                w, 1364, 1.0, 0.2, 80
+            ),
+            prefix=f"{name}_{version}",
+        )
+    error_message = f"Unknown calibration database name: {name}"
+    raise ValueError(error_message)
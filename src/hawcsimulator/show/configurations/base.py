@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import xarray as xr
+from showlib.processing.l1b_to_l2 import stratospheric_aerosol_optical_property
+
+from hawcsimulator import resources
+from hawcsimulator.atmosphere.crosssections import h2o_cross_section_table
+from hawcsimulator.show.calibration import calibration_database
+
+
+@resources.register("show.calibration_database.ideal")
+def _ideal_calibration_database() -> xr.Dataset:
+    cal_db = xr.open_dataset(calibration_database("ideal", "v1")).load()
+    cal_db.close()
+
+    return cal_db
+
+
+@resources.register("show.h2o_optical_property")
+def _h2o_optical_property():
+    return h2o_cross_section_table()
+
+
+@resources.register("show.stratospheric_aerosol_optical_property")
+def _stratospheric_aerosol_optical_property():
+    return stratospheric_aerosol_optical_property()
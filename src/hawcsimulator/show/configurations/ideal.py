@@ -1,15 +1,13 @@
 from __future__ import annotations
 
 import numpy as np
-import xarray as xr
-from showlib.l2.optical import h2o_optical_property
-from showlib.processing.l1b_to_l2 import stratospheric_aerosol_optical_property
 
+import hawcsimulator.show.configurations.base  # noqa: F401
 import hawcsimulator.show.steps.fer as fer
 import hawcsimulator.show.steps.ideal_inst as ideal_inst
 import hawcsimulator.show.steps.l2 as l2
 import hawcsimulator.show.steps.por as por
-from hawcsimulator.show.calibration import calibration_database
+from hawcsimulator import resources
 from hawcsimulator.simulator import Simulator
 
 
@@ -24,9 +22,7 @@ class IdealSHOWSimulator(Simulator):
 
     def _initialize_data(self) -> dict:
         data = {}
-        data["calibration_database"] = xr.open_dataset(
-            calibration_database("ideal", "v1")
-        )
+        data["calibration_database"] = resources.get("show.calibration_database.ideal")
 
         data["viewing_tangent_altitudes"] = np.arange(0, 40001, 500.0)
         data["observer_altitude"] = 450000.0
@@ -37,8 +33,10 @@ class IdealSHOWSimulator(Simulator):
             1e7 / data["calibration_database"]["sample_wavenumber"].to_numpy()
         )
 
-        data["h2o_optical_property"] = h2o_optical_property()
-        data["aerosol_optical_property"] = stratospheric_aerosol_optical_property()
+        data["h2o_optical_property"] = resources.get("show.h2o_optical_property")
+        data["aerosol_optical_property"] = resources.get(
+            "show.stratospheric_aerosol_optical_property"
+        )
         data["aerosol_kwargs"] = {"extinction_wavelength_nm": 1350.0}
 
         return data
@@ -1,13 +1,167 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 import xarray as xr
+from scipy import sparse
 from showlib.l1b.data import L1bDataSet, L1bImage
 from skretrieval.core.lineshape import UserLineShape
 from skretrieval.retrieval.forwardmodel import SpectrometerMixin
 from skretrieval.retrieval.measvec import MeasurementVector, select
 
+from hawcsimulator.appconfig import APPDIRS
+from hawcsimulator.filecache import cached_file
+from hawcsimulator.nodecache import fingerprint
+from hawcsimulator.noise import ConstantNoise, NoiseStreams
+from hawcsimulator.show.interferogram import InterferogramModel
+
+
+def _interpolation_matrix(x: np.ndarray, xp: np.ndarray) -> sparse.csr_array:
+    """
+    Sparse matrix M such that M @ fp == np.interp(x, xp, fp, left=0, right=0) for increasing xp
+    """
+    idx = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, len(xp) - 2)
+    w = (x - xp[idx]) / (xp[idx + 1] - xp[idx])
+    inside = (x >= xp[0]) & (x <= xp[-1])
+
+    rows = np.concatenate([np.arange(len(x)), np.arange(len(x))])
+    cols = np.concatenate([idx, idx + 1])
+    vals = np.concatenate([np.where(inside, 1 - w, 0), np.where(inside, w, 0)])
+
+    return sparse.csr_array((vals, (rows, cols)), shape=(len(x), len(xp)))
+
+
+def _build_ils_operator(
+    cal_db: xr.Dataset,
+    sample_wavenumber: np.ndarray,
+    model_wavenumber: np.ndarray,
+    rtol: float,
+) -> sparse.csr_array:
+    hires = cal_db["hires_wavenumber"].to_numpy()
+    ils = cal_db["ils"].transpose("hires_wavenumber", "sample_wavenumber").to_numpy()
+    if hires[0] > hires[-1]:
+        hires = hires[::-1]
+        ils = ils[::-1]
+
+    # Same nearest neighbour lookup as cal_db.sel(sample_wavenumber=..., method="nearest")
+    nearest = cal_db.indexes["sample_wavenumber"].get_indexer(
+        sample_wavenumber, method="nearest"
+    )
+
+    # Every ILS interpolated to the model grid at once, i.e. UserLineShape.integration_weights
+    weights = (_interpolation_matrix(model_wavenumber, hires) @ ils[:, nearest]).T
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    # The far wings of the ILS carry no meaningful signal
+    weights[np.abs(weights) < rtol * np.abs(weights).max(axis=1, keepdims=True)] = 0
+
+    return sparse.csr_array(weights)
+
+
+def _ils_cache_dir(cal_db: xr.Dataset) -> Path:
+    source = cal_db.encoding.get("source")
+    if source is not None:
+        return Path(source).parent / "ils_operators"
+    return Path(APPDIRS.user_cache_dir) / "show" / "ils_operators"
+
+
+@functools.lru_cache(maxsize=16)
+def _load_ils_operator(file: Path) -> sparse.csr_array:
+    return sparse.csr_array(sparse.load_npz(file))
+
+
+def ils_operator(
+    cal_db: xr.Dataset,
+    sample_wavenumber: np.ndarray,
+    model_wavenumber: np.ndarray,
+    rtol: float = 1e-8,
+) -> sparse.csr_array:
+    """
+    The complete instrument spectral response as a sparse matrix mapping radiance on the model
+    wavenumber grid to the sample wavenumbers.  Row i is the ILS of the calibration database sample
+    nearest to sample_wavenumber[i] interpolated to the model grid and normalized, the same weights
+    that UserLineShape calculates one sample at a time.
+
+    Operators are cached on disk in an "ils_operators" folder next to the calibration database file,
+    keyed on the calibration database contents and the two grids, and in memory.
+
+    Parameters
+    ----------
+    cal_db : xr.Dataset
+        Calibration database with "ils" on (hires_wavenumber, sample_wavenumber)
+    sample_wavenumber : np.ndarray
+        Sample wavenumbers of the instrument in [cm^-1]
+    model_wavenumber : np.ndarray
+        Wavenumber grid of the front end radiance in [cm^-1]
+    rtol : float, optional
+        Weights smaller than rtol times the peak of their ILS are dropped, by default 1e-8
+
+    Returns
+    -------
+    sparse.csr_array
+        Shape (len(sample_wavenumber), len(model_wavenumber))
+    """
+    sample_wavenumber = np.asarray(sample_wavenumber, dtype=np.float64)
+    model_wavenumber = np.asarray(model_wavenumber, dtype=np.float64)
+
+    h = hashlib.sha256()
+    for part in (cal_db[["ils"]], sample_wavenumber, model_wavenumber, rtol):
+        h.update(fingerprint(part).encode())
+    file = _ils_cache_dir(cal_db) / f"ils_{h.hexdigest()[:32]}.npz"
+
+    def _write(tmp: Path) -> None:
+        operator = _build_ils_operator(cal_db, sample_wavenumber, model_wavenumber, rtol)
+        # Passed as a file object, save_npz appends ".npz" to paths without it
+        with tmp.open("wb") as f:
+            sparse.save_npz(f, sparse.csr_matrix(operator))
+
+    cached_file(file, _write)
+
+    return _load_ils_operator(file)
+
+
+def spectral_window_error(
+    cal_db: xr.Dataset,
+    model_wavenumber: np.ndarray,
+    radiance: np.ndarray,
+    window_wavenumber: np.ndarray,
+) -> float:
+    """
+    The largest relative change in the instrument spectra when the front end radiance is only
+    calculated on `window_wavenumber`, a subset of `model_wavenumber`.  Radiative transfer is
+    independent at every wavenumber, so this is the exact L1b change for the given radiance.
+
+    Parameters
+    ----------
+    cal_db : xr.Dataset
+        Calibration database
+    model_wavenumber : np.ndarray
+        Full model wavenumber grid in [cm^-1]
+    radiance : np.ndarray
+        Radiance on the full grid, shape (len(model_wavenumber), nlos)
+    window_wavenumber : np.ndarray
+        Band limited subset of model_wavenumber
+
+    Returns
+    -------
+    float
+        max |L1b_window - L1b_full| / max |L1b_full|
+    """
+    sample_wavenumber = cal_db["sample_wavenumber"].to_numpy()
+    inside = np.isin(model_wavenumber, window_wavenumber)
+
+    full = ils_operator(cal_db, sample_wavenumber, model_wavenumber) @ radiance
+    window = (
+        ils_operator(cal_db, sample_wavenumber, model_wavenumber[inside])
+        @ radiance[inside]
+    )
+
+    return float(np.abs(window - full).max() / np.abs(full).max())
+
 
 class L1bGenerator:
     def run(self, fer: xr.Dataset):
@@ -15,7 +169,41 @@ class L1bGenerator:
 
 
 class L1bGeneratorILS(L1bGenerator, SpectrometerMixin):
-    def __init__(self, cal_db: xr.Dataset, observation, noise_model=None, **kwargs):
+    def __init__(
+        self,
+        cal_db: xr.Dataset,
+        observation,
+        noise_model=None,
+        use_ils_operator: bool = False,
+        noise_streams: NoiseStreams | None = None,
+        interferogram_cfg: dict | None = None,
+        **kwargs,
+    ):
+        """
+        Parameters
+        ----------
+        cal_db : xr.Dataset
+        observation : SimulatedObservationGeometry
+        noise_model : NoiseModel | Callable, optional
+            Noise model, e.g. `DetectorNoise`, or a function returning the noise for a radiance, by
+            default 1% of the radiance
+        use_ils_operator : bool, optional
+            If True the spectral response is applied to every line of sight with a single sparse matrix
+            product using the cached `ils_operator` instead of per sample line shapes, by default False
+        noise_streams : NoiseStreams | None, optional
+            Random number streams for the noise of `run_ensemble`, by default None which is unseeded
+        interferogram_cfg : dict | None, optional
+            Keyword arguments of an `InterferogramModel`.  If set the spectra are simulated by forward
+            modelling the raw interferogram and inverting it instead of applying the ILS, by default None
+        """
+        self._cal_db = cal_db
+        self._streams = NoiseStreams() if noise_streams is None else noise_streams
+        self._use_ils_operator = use_ils_operator
+        self._interferogram_model = (
+            None
+            if interferogram_cfg is None
+            else InterferogramModel(**interferogram_cfg)
+        )
         self._ils = lambda w: UserLineShape(
             cal_db.hires_wavenumber.to_numpy(),
             cal_db.sel(sample_wavenumber=1e7 / w, method="nearest")["ils"].to_numpy(),
@@ -33,37 +221,128 @@ class L1bGeneratorILS(L1bGenerator, SpectrometerMixin):
             self, self._ils, spectral_native_coordinate="wavenumber_cminv", **kwargs
         )
 
-        self._inst_model = self._construct_inst_model()
+        if not use_ils_operator and self._interferogram_model is None:
+            self._inst_model = self._construct_inst_model()
 
         if noise_model is not None:
             self._noise_model = noise_model
         else:
-            self._noise_model = lambda rad: rad * 0.01
+            self._noise_model = ConstantNoise(0.01)
+
+    def _apply_ils_operator(self, fer) -> xr.Dataset:
+        sample_wavenumber = 1e7 / self._get_required_wavelength()["measurement"]
+        radiance = fer.data["radiance"] @ xr.DataArray(
+            [1.0, 0.0, 0.0, 0.0], dims=["stokes"], coords={"stokes": ["I", "Q", "U", "V"]}
+        )
+        model_wavenumber = fer.data["wavenumber_cminv"]
+
+        operator = ils_operator(
+            self._cal_db, sample_wavenumber, model_wavenumber.to_numpy()
+        )
+        hires = radiance.transpose(*model_wavenumber.dims, "los").to_numpy()
+
+        return self._sampled_dataset(fer, sample_wavenumber, operator @ hires)
+
+    def _apply_interferogram(self, fer) -> xr.Dataset:
+        radiance = fer.data["radiance"] @ xr.DataArray(
+            [1.0, 0.0, 0.0, 0.0], dims=["stokes"], coords={"stokes": ["I", "Q", "U", "V"]}
+        )
+        model_wavenumber = fer.data["wavenumber_cminv"]
+        hires = radiance.transpose(*model_wavenumber.dims, "los").to_numpy()
+
+        # The FER is calculated on a grid of increasing wavenumber
+        wavenumber = model_wavenumber.to_numpy()
+        if wavenumber[0] > wavenumber[-1]:
+            wavenumber = wavenumber[::-1]
+            hires = hires[::-1]
+
+        return self._sampled_dataset(
+            fer,
+            self._interferogram_model.sample_wavenumber,
+            self._interferogram_model(wavenumber, hires),
+        )
+
+    @staticmethod
+    def _sampled_dataset(
+        fer, sample_wavenumber: np.ndarray, radiance: np.ndarray
+    ) -> xr.Dataset:
+        data = xr.Dataset(
+            {"radiance": (["wavenumber", "los"], radiance)},
+            coords={"wavenumber": sample_wavenumber, "xyz": ["x", "y", "z"]},
+        )
+        for key in fer.data:
+            if key != "radiance" and not key.startswith("wf"):
+                data[key] = fer.data[key]
+
+        return data
+
+    def _model_radiance(self, fer: xr.Dataset) -> xr.Dataset:
+        if self._interferogram_model is not None:
+            return self._apply_interferogram(fer)
+
+        if self._use_ils_operator:
+            return self._apply_ils_operator(fer)
+
+        return self._inst_model["measurement"].model_radiance(fer, None)["I"].data
 
     def run(self, fer: xr.Dataset):
-        result = self._inst_model["measurement"].model_radiance(fer, None)["I"]
+        return self._l1b(self._model_radiance(fer))
+
+    def run_ensemble(self, fer: xr.Dataset, num_realizations: int) -> xr.Dataset:
+        """
+        Noisy realizations of the L1b from a single FER.  The instrument model is applied once and the
+        noise for every realization is drawn into a single array with a leading realization dimension.
+        Realization i uses the noise stream (scene_id, "radiance", i) of the generator's `NoiseStreams`.
+
+        Parameters
+        ----------
+        fer : xr.Dataset
+            Front end radiance
+        num_realizations : int
+            Number of noisy L1b realizations
+
+        Returns
+        -------
+        xr.Dataset
+            The L1bDataSet datasets of every realization concatenated along a "realization" dimension,
+            `L1bDataSet(ensemble.isel(realization=i), "", None)` recovers a single realization
+        """
+        data = self._model_radiance(fer)
+
+        sigma = self._noise_model(data["radiance"]).to_numpy()
+        noise = self._streams.standard_normal_ensemble(
+            sigma.shape, "radiance", num_realizations
+        )
+        noise *= sigma
+
+        return xr.concat([self._l1b(data, n).ds for n in noise], dim="realization")
+
+    def _l1b(self, data: xr.Dataset, noise: np.ndarray | None = None):
+        num_los = len(data["tangent_altitude"].to_numpy())
 
-        num_los = len(result.data["tangent_altitude"].to_numpy())
+        radiance = data["radiance"].to_numpy()
+        if noise is not None:
+            radiance = radiance + noise
 
         l1b = L1bImage.from_np_arrays(
-            result.data["radiance"].to_numpy()[::-1, :],
-            self._noise_model(result.data["radiance"]).to_numpy()[::-1, :],
-            result.data["tangent_altitude"].to_numpy(),
-            result.data["tangent_latitude"].to_numpy(),
-            result.data["tangent_longitude"].to_numpy(),
-            np.ones(num_los) * result.data["wavenumber"].to_numpy()[-1],
+            radiance[::-1, :],
+            self._noise_model(data["radiance"]).to_numpy()[::-1, :],
+            data["tangent_altitude"].to_numpy(),
+            data["tangent_latitude"].to_numpy(),
+            data["tangent_longitude"].to_numpy(),
+            np.ones(num_los) * data["wavenumber"].to_numpy()[-1],
             np.ones(num_los)
             * (
-                result.data["wavenumber"].to_numpy()[0]
-                - result.data["wavenumber"].to_numpy()[1]
+                data["wavenumber"].to_numpy()[0]
+                - data["wavenumber"].to_numpy()[1]
             ),
             pd.to_datetime("2021-01-01"),
             0.0,
             0.0,
-            float(result.data["observer_altitude"].to_numpy()[0]),
-            np.rad2deg(np.arccos(result.data["tangent_cos_sza"].to_numpy())),
-            result.data["tangent_solar_azimuth"].to_numpy(),
-            result.data["tangent_observer_azimuth"].to_numpy(),
+            float(data["observer_altitude"].to_numpy()[0]),
+            np.rad2deg(np.arccos(data["tangent_cos_sza"].to_numpy())),
+            data["tangent_solar_azimuth"].to_numpy(),
+            data["tangent_observer_azimuth"].to_numpy(),
         )
 
         return L1bDataSet.from_image(l1b)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import numpy as np
+import scipy.fft
+from scipy.signal import CZT
+
+from hawcsimulator.show.calibration import bandpass_filter
+
+
+def _ideal_filter(w, wl):  # noqa: ARG001
+    # Same filter as the "ideal" calibration database
+    return bandpass_filter(w, 1364, 1.0, 0.2, 80)
+
+
+class InterferogramModel:
+    """
+    Forward model of the raw spatial heterodyne interferogram and its inversion back to spectra.
+
+    The interferogram at optical path difference x is
+
+        I(x) = integral B(s) F(s) (1 + cos(2 pi (s - s_L) x)) ds
+
+    where B is the radiance, F the bandpass filter, and s_L the Littrow wavenumber.  Wavenumbers on
+    either side of Littrow give the same fringe frequency, so aliasing across Littrow and beyond the
+    detector Nyquist frequency is part of the model, it is only suppressed by the filter.  The
+    interferogram is sampled at x = 2 * opd_per_sample * k for k = -num_samples/2 ... num_samples/2 - 1,
+    matching the sample spacing of `generate_ideal_l2_cal_db`.
+
+    The forward model is a chirp-z transform of the radiance on its uniform model grid, and the
+    inversion an apodized FFT, both applied to every line of sight in a single batched call.  Spectra
+    are radiometrically calibrated by inverting the interferogram of a flat spectrum.
+
+    Parameters
+    ----------
+    num_samples : int, optional
+        Number of interferogram samples, by default 512
+    opd_per_sample : float, optional
+        Half the optical path difference between samples in [cm], by default 0.002 * 3.4
+    littrow_wavel_nm : float, optional
+        Littrow wavelength in [nm], by default 1362
+    apodization : float | None, optional
+        Beta of the Kaiser window applied to the interferogram, by default 10
+    filter_fn : Callable, optional
+        Filter transmission as a function of (wavelength_nm, littrow_wavel_nm), by default the filter of
+        the "ideal" calibration database
+    fc : float, optional
+        Spectral samples where the filter transmission is below fc are dropped, by default 0.01
+    """
+
+    def __init__(
+        self,
+        num_samples: int = 512,
+        opd_per_sample: float = 0.002 * 3.4,
+        littrow_wavel_nm: float = 1362,
+        apodization: float | None = 10,
+        filter_fn: Callable = _ideal_filter,
+        fc: float = 0.01,
+    ):
+        self._num_samples = num_samples
+        self._opd_per_sample = opd_per_sample
+        self._littrow_wavenumber = 1e7 / littrow_wavel_nm
+        self._littrow_wavel_nm = littrow_wavel_nm
+        self._filter_fn = filter_fn
+
+        if apodization is None:
+            self._apodization = np.ones(num_samples)
+        else:
+            self._apodization = np.kaiser(num_samples, apodization)
+
+        self._wvnum_spacing = 1 / (2 * num_samples * opd_per_sample)
+        all_samples = (
+            self._littrow_wavenumber
+            - np.arange(0, num_samples // 2) * self._wvnum_spacing
+        )
+        self._good_samples = filter_fn(1e7 / all_samples, littrow_wavel_nm) > fc
+        self._sample_wavenumber = all_samples[self._good_samples]
+
+        self._responses = {}
+
+    @property
+    def sample_wavenumber(self) -> np.ndarray:
+        """
+        Wavenumbers of the calibrated spectra, in decreasing order
+        """
+        return self._sample_wavenumber
+
+    @property
+    def opd(self) -> np.ndarray:
+        """
+        Optical path difference of every interferogram sample
+        """
+        return (
+            2
+            * self._opd_per_sample
+            * (np.arange(self._num_samples) - self._num_samples // 2)
+        )
+
+    def interferogram(
+        self, wavenumber: np.ndarray, radiance: np.ndarray
+    ) -> np.ndarray:
+        """
+        The raw interferogram of every line of sight
+
+        Parameters
+        ----------
+        wavenumber : np.ndarray
+            Uniformly spaced, increasing model wavenumbers in [cm^-1], shape (nwavenumber,)
+        radiance : np.ndarray
+            Radiance on the model grid, shape (nwavenumber, nlos)
+
+        Returns
+        -------
+        np.ndarray
+            Interferogram with shape (num_samples, nlos)
+        """
+        wavenumber = np.asarray(wavenumber, dtype=float)
+        spacing = wavenumber[1] - wavenumber[0]
+        if not np.allclose(np.diff(wavenumber), spacing, rtol=1e-6, atol=0):
+            msg = "The interferogram model requires a uniformly spaced, increasing wavenumber grid"
+            raise ValueError(msg)
+
+        filtered = radiance * (
+            self._filter_fn(1e7 / wavenumber, self._littrow_wavel_nm) * spacing
+        )[:, np.newaxis]
+
+        # sum_j b_j exp(2 pi i (s_j - s_L) x_k) for every sample k, as a chirp-z transform over j
+        step = 2 * self._opd_per_sample
+        czt = CZT(
+            len(wavenumber),
+            self._num_samples,
+            w=np.exp(2j * np.pi * spacing * step),
+            a=np.exp(2j * np.pi * spacing * step * (self._num_samples // 2)),
+        )
+        fringes = czt(filtered, axis=0) * np.exp(
+            2j * np.pi * (wavenumber[0] - self._littrow_wavenumber) * self.opd
+        )[:, np.newaxis]
+
+        return filtered.sum(axis=0) + fringes.real
+
+    def _raw_spectrum(self, interferogram: np.ndarray) -> np.ndarray:
+        fringes = interferogram - interferogram.mean(axis=0)
+        fringes *= self._apodization[:, np.newaxis]
+
+        # Zero path difference is sample num_samples // 2
+        spectrum = scipy.fft.fft(
+            scipy.fft.ifftshift(fringes, axes=0), axis=0, workers=-1
+        ).real
+
+        return spectrum[: self._num_samples // 2][self._good_samples]
+
+    def _response(self, wavenumber: np.ndarray) -> np.ndarray:
+        key = (float(wavenumber[0]), float(wavenumber[-1]), len(wavenumber))
+        if key not in self._responses:
+            flat = np.ones((len(wavenumber), 1))
+            self._responses[key] = self._raw_spectrum(
+                self.interferogram(wavenumber, flat)
+            )
+        return self._responses[key]
+
+    def spectrum(self, interferogram: np.ndarray, wavenumber: np.ndarray) -> np.ndarray:
+        """
+        Inverts interferograms back to calibrated spectra at `sample_wavenumber`
+
+        Parameters
+        ----------
+        interferogram : np.ndarray
+            Interferograms with shape (num_samples, nlos)
+        wavenumber : np.ndarray
+            Model wavenumbers the interferograms were calculated from, used for the radiometric
+            calibration
+
+        Returns
+        -------
+        np.ndarray
+            Spectra with shape (len(sample_wavenumber), nlos)
+        """
+        return self._raw_spectrum(interferogram) / self._response(
+            np.asarray(wavenumber, dtype=float)
+        )
+
+    def __call__(self, wavenumber: np.ndarray, radiance: np.ndarray) -> np.ndarray:
+        """
+        Simulated spectra of the radiance, going through the interferogram
+
+        Parameters
+        ----------
+        wavenumber : np.ndarray
+            Uniformly spaced, increasing model wavenumbers in [cm^-1], shape (nwavenumber,)
+        radiance : np.ndarray
+            Radiance on the model grid, shape (nwavenumber, nlos)
+
+        Returns
+        -------
+        np.ndarray
+            Spectra with shape (len(sample_wavenumber), nlos)
+        """
+        return self.spectrum(self.interferogram(wavenumber, radiance), wavenumber)
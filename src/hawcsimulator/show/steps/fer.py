@@ -1,32 +1,88 @@
 from __future__ import annotations
 
+import logging
+
 import numpy as np
 import sasktran2 as sk
-from hamilton.function_modifiers import extract_fields
+import xarray as xr
+from hamilton.function_modifiers import config, extract_fields
 from skretrieval.core.sasktranformat import SASKTRANRadiance
 
+from hawcsimulator import resources
 from hawcsimulator.datastructures.atmosphere import Atmosphere
 from hawcsimulator.datastructures.viewinggeo import ObservationContainer
-from hawcsimulator.fer import FERGeneratorBasic
+from hawcsimulator.fer import FERGeneratorBasic, PersistentFERGenerator
+from hawcsimulator.show.calibration import spectral_window
+from hawcsimulator.show.inst_model import spectral_window_error
+
+_MODEL_WAVENUMBER = np.arange(7295, 7340, 0.01)
+
+
+def _model_wavenumber(
+    calibration_database: xr.Dataset | None, spectral_window_rtol: float | None
+) -> np.ndarray:
+    if calibration_database is None or spectral_window_rtol is None:
+        return _MODEL_WAVENUMBER
+
+    low, high = spectral_window(calibration_database, spectral_window_rtol)
+    model_wavenumber = _MODEL_WAVENUMBER
+    wavenumber = model_wavenumber[
+        (model_wavenumber >= low) & (model_wavenumber <= high)
+    ]
+
+    # Change in the L1b of a flat spectrum, the fraction of the ILS area outside of the window
+    error = spectral_window_error(
+        calibration_database,
+        model_wavenumber,
+        np.ones((len(model_wavenumber), 1)),
+        wavenumber,
+    )
+    logging.info(
+        "Band limited SHOW FER uses %d of %d wavenumbers (%d saved), relative L1b change for a flat spectrum %.2e",
+        len(wavenumber),
+        len(model_wavenumber),
+        len(model_wavenumber) - len(wavenumber),
+        error,
+    )
+
+    return wavenumber
+
+
+@resources.register("show.persistent_fer_generator")
+def _persistent_fer_generator() -> PersistentFERGenerator:
+    return PersistentFERGenerator()
 
 
 @extract_fields(
     {
-        "front_end_radiance": SASKTRANRadiance,
+        "fer_gen": FERGeneratorBasic,
         "sk2_atmosphere": sk.Atmosphere,
     }
 )
-def sk2_atm_and_front_end_radiance(
+def sk2_atm_and_front_end_radiance_gen(
     observation: ObservationContainer,
     atmosphere: Atmosphere,
     altitude_grid: np.ndarray,
     sk2_kwargs: dict | None = None,
+    persistent_fer: bool = False,
+    calibration_database: xr.Dataset | None = None,
+    spectral_window_rtol: float | None = None,
 ) -> dict:
+    """
+    By default radiative transfer is calculated on the full 7295 to 7340 cm^-1 grid.  If
+    spectral_window_rtol is set, e.g. 1e-4, it is only calculated where the ILS of some sample in the
+    calibration database is above spectral_window_rtol of its peak, see `spectral_window`.
+    """
     if sk2_kwargs is None:
         sk2_kwargs = {}
 
     # Construct the FER generator
-    fer_gen = FERGeneratorBasic(observation.observation, altitude_grid)
+    if persistent_fer:
+        # Reuses the engine and model geometry from previous scenes where possible
+        fer_gen = resources.get("show.persistent_fer_generator")
+        fer_gen.update(observation.observation, altitude_grid)
+    else:
+        fer_gen = FERGeneratorBasic(observation.observation, altitude_grid)
 
     fer_gen.sk_config.los_refraction = True
     fer_gen.sk_config.multiple_scatter_source = (
@@ -34,13 +90,13 @@ def sk2_atm_and_front_end_radiance(
     )
     fer_gen.sk_config.num_streams = 2
 
-    for k, v in sk2_kwargs:
+    for k, v in sk2_kwargs.items():
         setattr(fer_gen.sk_config, k, v)
 
     sk2_atmosphere = sk.Atmosphere(
         model_geometry=fer_gen.model_geo,
         config=fer_gen.sk_config,
-        wavenumber_cminv=np.arange(7295, 7340, 0.01),
+        wavenumber_cminv=_model_wavenumber(calibration_database, spectral_window_rtol),
         calculate_derivatives=False,
     )
 
@@ -49,10 +105,23 @@ def sk2_atm_and_front_end_radiance(
     for k, v in atmosphere.constituents.items():
         sk2_atmosphere[k] = v
 
-    # Run the FER generator
-    rad = fer_gen.run(sk2_atmosphere)
-
     return {
-        "front_end_radiance": rad,
+        "fer_gen": fer_gen,
         "sk2_atmosphere": sk2_atmosphere,
     }
+
+
+@config.when(FER_provided=False)
+def front_end_radiance(
+    fer_gen: FERGeneratorBasic,
+    sk2_atmosphere: sk.Atmosphere,
+    fer_chunk_cfg: dict | None = None,
+) -> SASKTRANRadiance:
+    """
+    Runs the radiative transfer calculation.  If fer_chunk_cfg is set, e.g.
+    {"engine_memory_budget_bytes": 2e9} or {"chunk_size": 500}, the spectral grid is
+    calculated in blocks, see FERGeneratorBasic.run_chunked
+    """
+    if fer_chunk_cfg is not None:
+        return fer_gen.run_chunked(sk2_atmosphere, **fer_chunk_cfg)
+    return fer_gen.run(sk2_atmosphere)
@@ -5,21 +5,53 @@ from showlib.l1b.data import L1bDataSet
 from skretrieval.core.sasktranformat import SASKTRANRadiance
 
 from hawcsimulator.datastructures.viewinggeo import ObservationContainer
+from hawcsimulator.noise import NoiseStreams
 from hawcsimulator.show.inst_model import L1bGeneratorILS
 
 
-def l1b(
+def _l1b_generator(
     calibration_database: xr.Dataset,
     observation: ObservationContainer,
-    front_end_radiance: SASKTRANRadiance,
-    l1b_cfg: dict | None = None,
-) -> L1bDataSet:
+    l1b_cfg: dict | None,
+    noise_streams: NoiseStreams | None,
+) -> L1bGeneratorILS:
     if l1b_cfg is None:
         l1b_cfg = {}
 
-    l1b_gen = L1bGeneratorILS(
+    return L1bGeneratorILS(
         calibration_database,
         observation.observation,
+        noise_streams=noise_streams,
         **l1b_cfg,
     )
+
+
+def l1b(
+    calibration_database: xr.Dataset,
+    observation: ObservationContainer,
+    front_end_radiance: SASKTRANRadiance,
+    l1b_cfg: dict | None = None,
+    noise_streams: NoiseStreams | None = None,
+) -> L1bDataSet:
+    l1b_gen = _l1b_generator(
+        calibration_database, observation, l1b_cfg, noise_streams
+    )
     return l1b_gen.run(front_end_radiance)
+
+
+def l1b_ensemble(
+    calibration_database: xr.Dataset,
+    observation: ObservationContainer,
+    front_end_radiance: SASKTRANRadiance,
+    num_realizations: int,
+    l1b_cfg: dict | None = None,
+    noise_streams: NoiseStreams | None = None,
+) -> xr.Dataset:
+    """
+    `num_realizations` noisy L1b realizations sharing the same front end radiance, concatenated along
+    a "realization" dimension
+    """
+    l1b_gen = _l1b_generator(
+        calibration_database, observation, l1b_cfg, noise_streams
+    )
+    return l1b_gen.run_ensemble(front_end_radiance, num_realizations)
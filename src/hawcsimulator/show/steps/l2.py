@@ -15,3 +15,27 @@ def l2(
         l2_cfg = {}
 
     return process_l1b_to_l2(l1b, program_of_record, calibration_database, **l2_cfg)
+
+
+def l2_ensemble(
+    l1b_ensemble: xr.Dataset,
+    program_of_record: xr.Dataset,
+    calibration_database: xr.Dataset,
+    l2_cfg: dict | None = None,
+) -> xr.Dataset:
+    """
+    Retrieves every L1b realization, the profiles are concatenated along "time" and the results along
+    a "realization" dimension
+    """
+    if l2_cfg is None:
+        l2_cfg = {}
+
+    realizations = []
+    for i in range(l1b_ensemble.sizes["realization"]):
+        l1b = L1bDataSet(l1b_ensemble.isel(realization=i), "", None)
+        profiles = process_l1b_to_l2(
+            l1b, program_of_record, calibration_database, **l2_cfg
+        )
+        realizations.append(xr.concat([p.ds for p in profiles], dim="time"))
+
+    return xr.concat(realizations, dim="realization")
@@ -1,30 +1,323 @@
 from __future__ import annotations
 
+import contextlib
+import importlib
+import os
+import threading
 import warnings
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.context import BaseContext
+from typing import Any
 
+import numpy as np
+import pandas as pd
+import xarray as xr
 from hamilton import registry
+from hamilton.lifecycle import NodeExecutionHook, NodeExecutionMethod
 
 import hawcsimulator.steps.atmosphere as atmosphere
 import hawcsimulator.steps.limb_observation as limb_observation
+import hawcsimulator.steps.noise as noise
+from hawcsimulator import resources
+from hawcsimulator.nodecache import NodeCache, Unhashable, fingerprint
+from hawcsimulator.profiling import NodeProfiler
 
 registry.disable_autoload()
 from hamilton import driver  # noqa: E402
 
 
+class _RunAdapters(NodeExecutionHook, NodeExecutionMethod):
+    """
+    The lifecycle adapter every cached driver is built with.  It forwards to the adapters of the run
+    in progress, so cached drivers can be reused with any node cache or profiler.
+
+    The adapters are stored per thread, Hamilton's default executor runs every node in the thread that
+    called execute, so runs in different threads can share a cached driver with different adapters.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @property
+    def hooks(self) -> tuple:
+        return getattr(self._local, "hooks", ())
+
+    @property
+    def method(self) -> NodeExecutionMethod | None:
+        return getattr(self._local, "method", None)
+
+    def set(self, hooks: tuple, method: NodeExecutionMethod | None) -> None:
+        self._local.hooks = hooks
+        self._local.method = method
+
+    def run_before_node_execution(self, **kwargs: Any) -> None:
+        for hook in self.hooks:
+            hook.run_before_node_execution(**kwargs)
+
+    def run_after_node_execution(self, **kwargs: Any) -> None:
+        for hook in self.hooks:
+            hook.run_after_node_execution(**kwargs)
+
+    def run_to_execute_node(
+        self, *, node_callable: Any, node_kwargs: dict[str, Any], **kwargs: Any
+    ) -> Any:
+        method = self.method
+        if method is None:
+            return node_callable(**node_kwargs)
+        return method.run_to_execute_node(
+            node_callable=node_callable, node_kwargs=node_kwargs, **kwargs
+        )
+
+
+class DriverCache:
+    """
+    A cache of built Hamilton drivers keyed on the set of modules and a fingerprint of the resolved
+    configuration.
+
+    Building a driver imports and validates every step module, which is pure overhead when the
+    same simulator is run many times with the same modules and configuration.  The adapters of a run
+    are not part of the key, they are attached to the cached driver with `use_adapters`.
+    """
+
+    def __init__(self) -> None:
+        self._drivers = {}
+        self._hits = 0
+        self._misses = 0
+        self._run_adapters = _RunAdapters()
+
+    @staticmethod
+    def key(modules: list, config: dict) -> tuple | None:
+        try:
+            return (tuple(m.__name__ for m in modules), fingerprint(config))
+        except Unhashable:
+            return None
+
+    def get(self, modules: list, config: dict) -> driver.Driver:
+        key = self.key(modules, config)
+
+        if key in self._drivers:
+            self._hits += 1
+            return self._drivers[key]
+
+        self._misses += 1
+        dr = (
+            driver.Builder()
+            .with_modules(*modules)
+            .with_config(config)
+            .with_adapters(self._run_adapters)
+            .build()
+        )
+        # Configurations that can't be fingerprinted are never reused
+        if key is not None:
+            self._drivers[key] = dr
+
+        return dr
+
+    @contextlib.contextmanager
+    def use_adapters(self, adapters: tuple = ()) -> Iterator[None]:
+        """
+        Attaches node execution hooks (e.g. a NodeProfiler) and at most one node execution method (e.g.
+        a node cache adapter) to every cached driver for the duration of the context.  The adapters
+        only apply to runs in the calling thread.
+        """
+        methods = [a for a in adapters if isinstance(a, NodeExecutionMethod)]
+        if len(methods) > 1:
+            msg = "At most one node execution method can be used in a run"
+            raise ValueError(msg)
+
+        previous = (self._run_adapters.hooks, self._run_adapters.method)
+        self._run_adapters.set(
+            tuple(a for a in adapters if isinstance(a, NodeExecutionHook)),
+            methods[0] if methods else None,
+        )
+        try:
+            yield
+        finally:
+            self._run_adapters.set(*previous)
+
+    def invalidate(self) -> None:
+        """
+        Removes every cached driver, e.g. after a step module has been reloaded
+        """
+        self._drivers.clear()
+
+    def info(self) -> dict:
+        """
+        Cache statistics
+
+        Returns
+        -------
+        dict
+            Dictionary with keys "hits", "misses" and "size"
+        """
+        return {"hits": self._hits, "misses": self._misses, "size": len(self._drivers)}
+
+    def reset_stats(self) -> None:
+        self._hits = 0
+        self._misses = 0
+
+
+# Per-process simulator and node cache used by the workers of Simulator.run_batch
+_WORKER_SIMULATOR = None
+_WORKER_NODE_CACHE = None
+
+
+def _initialize_worker(
+    simulator_cls: type, node_cache: NodeCache | None, trace_allocations: bool
+) -> None:
+    global _WORKER_SIMULATOR, _WORKER_NODE_CACHE  # noqa: PLW0603
+
+    _WORKER_SIMULATOR = simulator_cls()
+    _WORKER_SIMULATOR.preload()
+    _WORKER_SIMULATOR._profiler = NodeProfiler(trace_allocations)
+    _WORKER_NODE_CACHE = node_cache
+
+
+def _run_worker(
+    index: int,
+    outputs: list[str],
+    input: dict,
+    extra_modules: list[str] | None,
+    config: dict | None,
+    profile: bool,
+) -> tuple[int, dict]:
+    if extra_modules is not None:
+        extra_modules = [importlib.import_module(m) for m in extra_modules]
+
+    result = _WORKER_SIMULATOR.run(
+        outputs,
+        input,
+        extra_modules=extra_modules,
+        config=config,
+        node_cache=_WORKER_NODE_CACHE,
+        profile=profile,
+    )
+    # The profile is returned with the result, so records don't need to accumulate in the worker
+    _WORKER_SIMULATOR.profiler.clear()
+
+    return index, result
+
+
+def _along_track_dataset(value) -> xr.Dataset | None:
+    """
+    The dataset underlying a simulator output, or None if the output isn't stored as a dataset.  Outputs
+    made of several spectra, e.g. the ALI L1bImage, are combined along a "product" dimension.
+    """
+    if isinstance(value, xr.Dataset):
+        return value
+    if isinstance(value, xr.DataArray):
+        return value.to_dataset(name=value.name or "value")
+    for attr in ("ds", "data"):
+        if isinstance(getattr(value, attr, None), xr.Dataset):
+            return getattr(value, attr)
+
+    spectra = getattr(value, "spectra", None)
+    if isinstance(spectra, dict) and spectra:
+        datasets = [_along_track_dataset(s) for s in spectra.values()]
+        if any(ds is None for ds in datasets):
+            msg = f"The spectra of {type(value).__name__} can't be converted to datasets"
+            raise TypeError(msg)
+        # The products share the geometry, only the radiances are stacked
+        return xr.concat(
+            datasets,
+            dim=xr.DataArray(list(spectra), dims="product", name="product"),
+            data_vars=["radiance", "radiance_noise"],
+            coords="minimal",
+            compat="equals",
+        )
+    return None
+
+
 class Simulator:
+    # Shared between all simulators in the process, the key includes the module names
+    _driver_cache = DriverCache()
+
     def __init__(self) -> None:
-        self._modules = [atmosphere, limb_observation]
+        self._modules = [atmosphere, limb_observation, noise]
+        self._preloaded_data = None
+        self._profiler = None
 
     def _initialize_data(self) -> dict:
         pass
 
+    def preload(self) -> None:
+        """
+        Calls _initialize_data once and reuses the result for every subsequent run of this
+        simulator instead of reloading it each time.
+        """
+        self._preloaded_data = self._initialize_data()
+
+    def release(self) -> None:
+        """
+        Drops any data stored by preload
+        """
+        self._preloaded_data = None
+
+    def _data(self) -> dict:
+        if self._preloaded_data is not None:
+            return self._preloaded_data
+        return self._initialize_data()
+
+    @property
+    def profiler(self) -> NodeProfiler:
+        """
+        Profiler that records per node timing and memory for runs with profile=True
+        """
+        if self._profiler is None:
+            self._profiler = NodeProfiler()
+        return self._profiler
+
+    @classmethod
+    def clear_driver_cache(cls) -> None:
+        """
+        Invalidates all cached Hamilton drivers, the next call to run will rebuild the DAG
+        """
+        cls._driver_cache.invalidate()
+
+    @classmethod
+    def driver_cache_info(cls) -> dict:
+        """
+        Hit/miss statistics for the Hamilton driver cache
+        """
+        return cls._driver_cache.info()
+
     def run(
         self,
         outputs: list[str],
         input: None | dict = None,
         extra_modules: list | None = None,
         config: dict | None = None,
-    ) -> dict:
+        use_driver_cache: bool = True,
+        node_cache: NodeCache | None = None,
+        profile: bool = False,
+    ) -> dict | tuple[dict, pd.DataFrame]:
+        """
+        Runs the simulator
+
+        Parameters
+        ----------
+        outputs : list[str]
+            Outputs to calculate
+        input : None | dict, optional
+            Inputs to the DAG, combined with the data loaded by _initialize_data, by default None
+        extra_modules : list | None, optional
+            Extra step modules, by default None
+        config : dict | None, optional
+            Driver configuration, by default None
+        use_driver_cache : bool, optional
+            Reuse a cached Hamilton driver for the same modules and configuration, by default True
+        node_cache : NodeCache | None, optional
+            On-disk node cache, by default None
+        profile : bool, optional
+            If True the per node timing and memory of this run is returned with the result, which can
+            be combined with hawcsimulator.profiling.profile_report, by default False
+
+        Returns
+        -------
+        dict | tuple[dict, pd.DataFrame]
+            The outputs, or (outputs, profile) if profile is True
+        """
         warnings.filterwarnings("ignore")
 
         if input is None:
@@ -37,25 +330,264 @@ class Simulator:
 
         default_config.update(config)
 
-        input = {**self._initialize_data(), **input}
+        input = {**self._data(), **input}
 
         if extra_modules is not None:
             all_modules = self._modules + extra_modules
         else:
             all_modules = self._modules
 
-        dr = (
-            driver.Builder()
-            .with_config(
-                {}
-            )  # we don't have any configuration or invariant data for this example.
-            .with_modules(
-                *all_modules
-            )  # we need to tell hamilton where to load function definitions from
-            .with_config(default_config)
-            .build()
+        adapters = ()
+        if node_cache is not None:
+            adapters = (*adapters, node_cache.adapter)
+        if profile:
+            adapters = (*adapters, self.profiler)
+
+        if use_driver_cache:
+            dr = self._driver_cache.get(all_modules, default_config)
+            run_adapters = self._driver_cache.use_adapters(adapters)
+        else:
+            builder = (
+                driver.Builder()
+                .with_modules(
+                    *all_modules
+                )  # we need to tell hamilton where to load function definitions from
+                .with_config(default_config)
+            )
+            if len(adapters) > 0:
+                builder = builder.with_adapters(*adapters)
+            dr = builder.build()
+            run_adapters = contextlib.nullcontext()
+
+        if node_cache is not None:
+            node_cache.prepare(dr.graph.nodes, input, default_config)
+
+        with run_adapters:
+            if not profile:
+                return dr.execute(outputs, inputs=input)
+
+            self.profiler.new_run()
+            try:
+                result = dr.execute(outputs, inputs=input)
+            finally:
+                self.profiler.stop()
+
+        return result, self.profiler.run_profile()
+
+    def run_batch(
+        self,
+        inputs: Iterable[dict],
+        outputs: list[str],
+        n_workers: int | None = None,
+        extra_modules: list | None = None,
+        config: dict | None = None,
+        ordered: bool = True,
+        node_cache: NodeCache | None = None,
+        profile: bool = False,
+        trace_allocations: bool = False,
+        mp_context: BaseContext | None = None,
+    ) -> list[dict] | Iterator[tuple[int, dict]]:
+        """
+        Runs the simulator for many scenes, distributing them over a pool of worker processes.
+
+        Every worker constructs its own simulator and calls preload once, so the calibration
+        database and optical properties are loaded a single time per worker rather than once
+        per scene.
+
+        Workers are constructed as `type(self)()` and the extra modules are imported by name, so
+        simulator subclasses whose constructor takes arguments, and step modules that only exist in
+        memory (e.g. created with types.ModuleType) rather than being importable, are not supported
+        with more than one worker.  With the "spawn" and "forkserver" start methods the subclass must
+        also be importable.
+
+        Parameters
+        ----------
+        inputs : Iterable[dict]
+            One input dictionary per scene, the same as the input argument to run.  "scene_id" is set
+            to the index of the scene unless it is given, so together with "noise_seed" the noise of
+            every scene is reproducible
+        outputs : list[str]
+            Outputs to calculate for every scene.  These must be picklable to be returned
+            from the worker processes
+        n_workers : int | None, optional
+            Number of worker processes, by default None which uses every available core.  If 1
+            the scenes are run sequentially in the current process, preloading this simulator
+        extra_modules : list | None, optional
+            Extra step modules, passed to run, by default None
+        config : dict | None, optional
+            Configuration passed to run for every scene, by default None
+        ordered : bool, optional
+            If True, a list of results in the same order as inputs is returned.  If False an
+            iterator of (index, result) is returned yielding scenes as they complete, by default True
+        node_cache : NodeCache | None, optional
+            On-disk node cache shared by every worker, by default None
+        profile : bool, optional
+            If True every result is a (result, profile) tuple as returned by run, the profiles can be
+            combined with hawcsimulator.profiling.profile_report, by default False
+        trace_allocations : bool, optional
+            Measure exact per node allocations with tracemalloc when profiling, by default False
+        mp_context : BaseContext | None, optional
+            Multiprocessing context used to start the workers, e.g. multiprocessing.get_context("spawn"),
+            by default None which is the platform default
+
+        Returns
+        -------
+        list[dict] | Iterator[tuple[int, dict]]
+            The results of run for every scene
+        """
+        # Scenes get independent noise streams, regardless of which worker runs them
+        inputs = [{"scene_id": i, **scene} for i, scene in enumerate(inputs)]
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, len(inputs)))
+
+        if n_workers == 1:
+            if profile and trace_allocations:
+                self._profiler = NodeProfiler(trace_allocations)
+            if self._preloaded_data is None:
+                self.preload()
+            results = (
+                (
+                    i,
+                    self.run(
+                        outputs,
+                        scene,
+                        extra_modules=extra_modules,
+                        config=config,
+                        node_cache=node_cache,
+                        profile=profile,
+                    ),
+                )
+                for i, scene in enumerate(inputs)
+            )
+            return [r for _, r in results] if ordered else results
+
+        module_names = (
+            [m.__name__ for m in extra_modules] if extra_modules is not None else None
+        )
+
+        def _iterate():
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=mp_context,
+                initializer=_initialize_worker,
+                initargs=(type(self), node_cache, trace_allocations),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _run_worker,
+                        i,
+                        outputs,
+                        scene,
+                        module_names,
+                        config,
+                        profile,
+                    )
+                    for i, scene in enumerate(inputs)
+                ]
+                for future in as_completed(futures):
+                    yield future.result()
+
+        if not ordered:
+            return _iterate()
+
+        results = [None] * len(inputs)
+        for i, result in _iterate():
+            results[i] = result
+        return results
+
+    def run_curtain(
+        self,
+        outputs: list[str],
+        input: dict | None = None,
+        latitudes: np.ndarray | None = None,
+        stride: int = 1,
+        output_file: str | os.PathLike | None = None,
+        n_workers: int | None = None,
+        extra_modules: list | None = None,
+        config: dict | None = None,
+        node_cache: NodeCache | None = None,
+    ) -> dict:
+        """
+        Simulates every latitude of the OMPS/CALIPSO/ERA5 curtain and combines the results into along
+        track datasets.
+
+        One scene is created per latitude by setting "tangent_latitude" in the input, and the scenes are
+        run in parallel with run_batch using the "omps_calipso_era5" atmosphere.  The curtain,
+        calibration database, optical properties and regridding matrices are loaded once per worker and
+        shared by every latitude.
+
+        Parameters
+        ----------
+        outputs : list[str]
+            Outputs to calculate for every latitude
+        input : dict | None, optional
+            Input shared by every scene, by default None
+        latitudes : np.ndarray | None, optional
+            Latitudes to simulate, by default None which uses every latitude of the curtain
+        stride : int, optional
+            Only simulate every stride'th latitude, by default 1
+        output_file : str | os.PathLike | None, optional
+            If set the along track datasets are written to this netCDF file, with one group per output,
+            by default None
+        n_workers : int | None, optional
+            Number of worker processes, see run_batch, by default None
+        extra_modules : list | None, optional
+            Extra step modules, passed to run_batch, by default None
+        config : dict | None, optional
+            Configuration passed to run_batch, by default None
+        node_cache : NodeCache | None, optional
+            On-disk node cache shared by every worker, by default None
+
+        Returns
+        -------
+        dict
+            For every output the along track dataset, concatenated along a "latitude" dimension.
+            The spectra of an L1bImage are combined along a "product" dimension.  Outputs that aren't
+            stored as xarray datasets are returned as a list with one entry per latitude
+        """
+        if input is None:
+            input = {}
+
+        if latitudes is None:
+            latitudes = resources.get("ompscalera.curtain").data["latitude"].to_numpy()
+        latitudes = np.atleast_1d(latitudes)[::stride]
+
+        config = {"atmosphere_method": "omps_calipso_era5", **(config or {})}
+
+        results = self.run_batch(
+            [{**input, "tangent_latitude": float(lat)} for lat in latitudes],
+            outputs,
+            n_workers=n_workers,
+            extra_modules=extra_modules,
+            config=config,
+            node_cache=node_cache,
         )
-        return dr.execute(outputs, inputs=input)
+
+        along_track = {}
+        for output in outputs:
+            values = [r[output] for r in results]
+            datasets = [_along_track_dataset(v) for v in values]
+            if any(ds is None for ds in datasets):
+                along_track[output] = values
+                continue
+            along_track[output] = xr.concat(
+                datasets,
+                dim=xr.DataArray(latitudes, dims="latitude", name="latitude"),
+                coords="minimal",
+                # Coordinates shared between scenes must be identical, they are not concatenated
+                compat="equals",
+            )
+
+        if output_file is not None:
+            mode = "w"
+            for output, value in along_track.items():
+                if isinstance(value, xr.Dataset):
+                    value.to_netcdf(output_file, mode=mode, group=output)
+                    mode = "a"
+
+        return along_track
 
 
 if __name__ == "__main__":
@@ -43,10 +43,22 @@ def atmosphere__default(constituents: dict | None = None) -> Atmosphere:
 
 
 @config.when(atmosphere_method="earthcare")
-def atmosphere__earthcare(constituents: dict | None = None) -> Atmosphere:
+def atmosphere__earthcare(
+    h2o_optical_property: OpticalProperty | None = None,
+    constituents: dict | None = None,
+) -> Atmosphere:
     """
     Constructs an atmosphere using the EarthCARE configuration.
 
+    Parameters
+    ----------
+    h2o_optical_property : OpticalProperty | None, optional
+        Optical property for H2O, e.g. a precomputed cross section table from
+        hawcsimulator.atmosphere.crosssections.  By default None which calculates line by line
+        cross sections with sk.optical.HITRANAbsorber
+    constituents : dict | None, optional
+        A dictionary of sasktran2.Constituent objects, with {key: Constituent}, by default None
+
     Returns
     -------
     Atmosphere
@@ -54,6 +66,9 @@ def atmosphere__earthcare(constituents: dict | None = None) -> Atmosphere:
     if constituents is None:
         constituents = {}
 
+    if h2o_optical_property is None:
+        h2o_optical_property = sk.optical.HITRANAbsorber("h2o")
+
     h2o = earthcare._water(30)
     alt_grid = np.arange(0, 65001, 1000.0)
     vmr = np.interp(
@@ -65,9 +80,7 @@ def atmosphere__earthcare(constituents: dict | None = None) -> Atmosphere:
             "O3", sk.optical.O3DBM(), climatology="std"
         ),
         "solar_irradiance": sk.constituent.SolarIrradiance(mode="average"),
-        "h2o": sk.constituent.VMRAltitudeAbsorber(
-            sk.optical.HITRANAbsorber("h2o"), alt_grid, vmr
-        ),
+        "h2o": sk.constituent.VMRAltitudeAbsorber(h2o_optical_property, alt_grid, vmr),
         "albedo": sk.constituent.LambertianSurface(0.3),
     }
 
@@ -87,8 +100,8 @@ def atmosphere__omps_calipso_era5(
 ) -> Atmosphere:
     if constituents is None:
         constituents = {}
-    if aerosol_kwargs is None:
-        aerosol_kwargs = {}
+    # Copied since the kwargs are modified below and may be shared between runs
+    aerosol_kwargs = {} if aerosol_kwargs is None else dict(aerosol_kwargs)
 
     lat = observation.observation.reference_latitude()["measurement"]
 
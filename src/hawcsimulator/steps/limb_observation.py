@@ -4,10 +4,34 @@ import numpy as np
 import pandas as pd
 import sasktran2 as sk
 from hamilton.function_modifiers import config
+from skretrieval.core.sasktranformat import SASKTRANRadiance
 
-from hawcsimulator.datastructures.viewinggeo import ObservationContainer
+from hawcsimulator.datastructures.viewinggeo import (
+    MultiSceneObservationContainer,
+    ObservationContainer,
+)
+from hawcsimulator.geometry.multiscene import MultiSceneLimbVertical
 from hawcsimulator.geometry.observation import SimulatedObservationGeometry
 
+# Altitude in [m] where the lines of sight are referenced, the sasktran2 default
+_REFERENCE_ALTITUDE = 25000.0
+
+
+def _solar_handler(
+    tangent_solar_zenith_angle: float | None,
+    tangent_solar_azimuth_angle: float | None,
+) -> sk.solar.SolarGeometryHandlerBase:
+    if (
+        tangent_solar_zenith_angle is not None
+        and tangent_solar_azimuth_angle is not None
+    ):
+        # Forced angles
+        return sk.solar.SolarGeometryHandlerForced(
+            tangent_solar_zenith_angle, tangent_solar_azimuth_angle
+        )
+    # Time angles
+    return sk.solar.SolarGeometryHandlerAstropy()
+
 
 @config.when(observation_method="limb")
 def observation__limb(
@@ -54,17 +78,9 @@ def observation__limb(
     tan_alts = viewing_tangent_altitudes
     obs_time = time
 
-    if (
-        tangent_solar_zenith_angle is not None
-        and tangent_solar_azimuth_angle is not None
-    ):
-        # Forced angles
-        solar_handler = sk.solar.SolarGeometryHandlerForced(
-            tangent_solar_zenith_angle, tangent_solar_azimuth_angle
-        )
-    else:
-        # Time angles
-        solar_handler = sk.solar.SolarGeometryHandlerAstropy()
+    solar_handler = _solar_handler(
+        tangent_solar_zenith_angle, tangent_solar_azimuth_angle
+    )
 
     viewing_geo = sk.viewinggeo.LimbVertical.from_tangent_parameters(
         solar_handler=solar_handler,
@@ -74,6 +90,7 @@ def observation__limb(
         time=obs_time,
         observer_altitude=observer_altitude,
         viewing_azimuth=0.0,
+        reference_altitude=_REFERENCE_ALTITUDE,
     )
 
     return ObservationContainer(
@@ -83,3 +100,113 @@ def observation__limb(
         ),
         obs_time,
     )
+
+
+@config.when(observation_method="limb_multi")
+def observation__limb_multi(
+    viewing_tangent_altitudes: np.ndarray,
+    time: pd.Timestamp | pd.DatetimeIndex,
+    tangent_latitude: np.ndarray,
+    tangent_longitude: np.ndarray,
+    observer_altitude: float,
+    sample_wavelengths: np.ndarray,
+    tangent_solar_zenith_angle: float | None = None,
+    tangent_solar_azimuth_angle: float | None = None,
+) -> MultiSceneObservationContainer:
+    """
+    Creates a single observation containing the lines of sight of several idealized limb scenes, e.g.
+    consecutive along-track scenes, so that they can be calculated in a single radiative transfer call.
+    Every scene is set up the same as with the "limb" observation method.  The scenes share one atmosphere,
+    which is constructed at the mean tangent latitude/longitude.
+
+    The radiance for the individual scenes is available through the `front_end_radiance_scenes` output.
+
+    Parameters
+    ----------
+    viewing_tangent_altitudes : np.array
+        Tangent altitudes for every scene in [m], assuming no refraction
+    time : pd.Timestamp | pd.DatetimeIndex
+        Time of the observation, either one for all scenes or one per scene
+    tangent_latitude : np.ndarray
+        Tangent latitude of each scene in [degrees]
+    tangent_longitude : np.ndarray
+        Tangent longitude of each scene in [degrees]
+    observer_altitude : float
+        Altitude of the observer in [m]
+    sample_wavelengths : np.ndarray
+        Observation sample wavelengths for the instrument in [nm]
+    tangent_solar_zenith_angle : float | None, optional
+        Solar zenith angle in [degrees], by default None indicating it will be calculated from the observation time
+    tangent_solar_azimuth_angle : float | None, optional
+        Relative solar azimuth angle in [degrees] where 0 degrees is forward scatter, by default None indicating it will be
+        calculated from the observation time
+
+    Returns
+    -------
+    MultiSceneObservationContainer
+    """
+    tangent_latitude = np.atleast_1d(tangent_latitude)
+    tangent_longitude = np.broadcast_to(tangent_longitude, tangent_latitude.shape)
+
+    if isinstance(time, pd.Timestamp):
+        times = [time] * len(tangent_latitude)
+    else:
+        times = list(time)
+
+    scenes = [
+        observation__limb(
+            viewing_tangent_altitudes,
+            t,
+            float(lat),
+            float(lon),
+            observer_altitude,
+            sample_wavelengths,
+            tangent_solar_zenith_angle,
+            tangent_solar_azimuth_angle,
+        )
+        for lat, lon, t in zip(tangent_latitude, tangent_longitude, times, strict=True)
+    ]
+
+    viewing_geo = MultiSceneLimbVertical(
+        [s.observation.sk2_geometry()["measurement"] for s in scenes],
+        _solar_handler(tangent_solar_zenith_angle, tangent_solar_azimuth_angle),
+        reference_altitude=_REFERENCE_ALTITUDE,
+    )
+
+    return MultiSceneObservationContainer(
+        SimulatedObservationGeometry(
+            viewing_geo=viewing_geo,
+            sample_wavel=sample_wavelengths,
+        ),
+        times[0],
+        scenes,
+        viewing_geo.scene_index,
+    )
+
+
+@config.when(observation_method="limb_multi")
+def front_end_radiance_scenes(
+    front_end_radiance: SASKTRANRadiance,
+    observation: MultiSceneObservationContainer,
+) -> list[SASKTRANRadiance]:
+    """
+    Splits the front end radiance of a multi scene observation back into the radiance of every scene.
+
+    Parameters
+    ----------
+    front_end_radiance : SASKTRANRadiance
+        Radiance for every line of sight of the combined observation
+    observation : MultiSceneObservationContainer
+
+    Returns
+    -------
+    list[SASKTRANRadiance]
+        The radiance for each scene, in the same order as observation.scenes
+    """
+    return [
+        SASKTRANRadiance(
+            front_end_radiance.data.isel(los=np.nonzero(observation.scene_index == i)[0]),
+            collapse_scalar_stokes=False,
+        )
+        for i in range(len(observation.scenes))
+    ]
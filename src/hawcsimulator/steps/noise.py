@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from hawcsimulator.noise import NoiseStreams
+
+
+def noise_streams(noise_seed: int | None = None, scene_id: int = 0) -> NoiseStreams:
+    """
+    Random number streams for the instrument noise of this scene.  Setting noise_seed makes the noise
+    reproducible, scenes are distinguished by scene_id which `Simulator.run_batch` sets to the index of
+    the scene if it is not in the input.
+    """
+    return NoiseStreams(noise_seed, scene_id)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+import sasktran2 as sk
+import xarray as xr
+
+from hawcsimulator.ali.inst_model import (
+    L1bGeneratorILS,
+    _demodulate_loop,
+    demodulate,
+    demodulate_fft,
+    stokes_products,
+)
+from hawcsimulator.fer import FERGeneratorBasic
+from hawcsimulator.geometry.observation import SimulatedObservationGeometry
+
+
+def test_demodulate_matches_loop():
+    rng = np.random.default_rng(0)
+    wavelength = np.arange(400, 800, 2.0)
+    aolp = rng.uniform(0, np.pi, 20)
+    dolp = rng.uniform(0.01, 0.5, 20)
+    modulation = dolp * np.cos(2 * np.pi * 13000 / wavelength[:, np.newaxis] + 2 * aolp)
+
+    expected_aolp, expected_dolp = _demodulate_loop(wavelength, modulation)
+    result_aolp, result_dolp = demodulate(wavelength, modulation)
+
+    np.testing.assert_array_equal(result_aolp, expected_aolp)
+    np.testing.assert_array_equal(result_dolp, expected_dolp)
+
+    # The recovered DOLP is the amplitude of the modulation
+    np.testing.assert_allclose(np.nanmedian(result_dolp, axis=1), dolp, rtol=1e-2)
+
+
+def test_demodulate_fft_recovers_aolp_and_dolp():
+    rng = np.random.default_rng(1)
+    wavelength = np.arange(450, 800, 1.0)
+    aolp = rng.uniform(0, np.pi, 20)
+    dolp = rng.uniform(0.01, 0.5, 20)
+    modulation = dolp * np.cos(2 * np.pi * 13000 / wavelength[:, np.newaxis] + 2 * aolp)
+
+    result_aolp, result_dolp = demodulate_fft(wavelength, modulation)
+
+    assert result_aolp.shape == (20, len(wavelength))
+    assert result_dolp.shape == (20, len(wavelength))
+
+    # The ends of the spectral range are affected by the finite window
+    interior = slice(30, -30)
+    np.testing.assert_allclose(
+        np.median(result_dolp[:, interior], axis=1), dolp, rtol=1e-2
+    )
+    aolp_error = (result_aolp - aolp[:, np.newaxis] + np.pi / 2) % np.pi - np.pi / 2
+    assert np.median(np.abs(aolp_error[:, interior])) < 1e-3
+
+
+def test_ils_l1b_demodulated_products():
+    viewing_geo = sk.viewinggeo.LimbVertical.from_tangent_parameters(
+        solar_handler=sk.solar.SolarGeometryHandlerForced(60.0, 0.0),
+        tangent_altitudes=np.arange(10000, 30001, 10000.0),
+        tangent_latitude=30.0,
+        tangent_longitude=0.0,
+        time=pd.Timestamp("2022-01-01T12:00:00"),
+        observer_altitude=450000.0,
+        viewing_azimuth=0.0,
+    )
+    observation = SimulatedObservationGeometry(
+        viewing_geo=viewing_geo, sample_wavel=np.arange(500, 800, 1.0)
+    )
+
+    fer_gen = FERGeneratorBasic(observation, np.arange(0, 65001, 1000.0))
+    fer_gen.sk_config.num_stokes = 3
+    atmo = sk.Atmosphere(
+        fer_gen.model_geo,
+        fer_gen.sk_config,
+        wavelengths_nm=np.arange(490, 810, 0.5),
+        calculate_derivatives=False,
+    )
+    sk.climatology.us76.add_us76_standard_atmosphere(atmo)
+    atmo["rayleigh"] = sk.constituent.Rayleigh()
+    fer = fer_gen.run(atmo)
+
+    cal_db = xr.Dataset({"include_modulation": True})
+    l1b = L1bGeneratorILS(cal_db, observation, pol_states=("I", "dolp", "aolp")).run(fer)
+
+    spectra = {k: v._ds for k, v in l1b._spectra.items()}
+    assert set(spectra) == {"I", "dolp", "aolp"}
+
+    # The demodulated DOLP is close to the DOLP of the FER, smoothed by the ILS
+    np.testing.assert_allclose(
+        np.nanmedian(spectra["dolp"]["radiance"].to_numpy(), axis=0),
+        np.nanmedian(stokes_products(fer)["dolp"], axis=0),
+        rtol=0.05,
+    )
+
+    with pytest.raises(ValueError, match="modulation"):
+        L1bGeneratorILS(
+            xr.Dataset({"include_modulation": False}), observation, pol_states=("dolp",)
+        )
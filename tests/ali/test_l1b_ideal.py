@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import types
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from hawcsimulator.ali.inst_model import L1bGeneratorIdeal
+from hawcsimulator.ali.inst_model_imager import (
+    L1bGeneratorIdealImager,
+    analyzer_matrix,
+    least_squares_stokes,
+)
+from hawcsimulator.noise import ConstantNoise, DetectorNoise, NoiseStreams
+from hawcsimulator.simulator import _along_track_dataset
+
+
+def _fer(num_wavel: int = 30, num_los: int = 12):
+    rng = np.random.default_rng(0)
+    radiance = np.concatenate(
+        [
+            rng.uniform(1, 2, (num_wavel, num_los, 1)),
+            rng.uniform(-0.3, 0.3, (num_wavel, num_los, 2)),
+            np.zeros((num_wavel, num_los, 1)),
+        ],
+        axis=2,
+    )
+    los = np.ones(num_los)
+    data = xr.Dataset(
+        {
+            "radiance": (["wavelength", "los", "stokes"], radiance),
+            "tangent_altitude": ("los", np.linspace(0, 30000, num_los)),
+            "tangent_latitude": ("los", 10 * los),
+            "tangent_longitude": ("los", 0 * los),
+            "wavelength_nm": ("wavelength", np.linspace(450, 800, num_wavel)),
+            "time": ("los", np.repeat(np.datetime64("2022-01-01"), num_los)),
+            "observer_altitude": ("los", 5e5 * los),
+            "tangent_cos_sza": ("los", np.linspace(0.1, 0.9, num_los)),
+            "tangent_solar_azimuth": ("los", 20 * los),
+            "tangent_observer_azimuth": ("los", 5 * los),
+        }
+    )
+    return types.SimpleNamespace(data=data)
+
+
+def test_ideal_l1b_polarization_states():
+    fer = _fer()
+    l1b = L1bGeneratorIdeal(None, None, ["I", "dolp", "aolp", "q"]).run(fer)
+
+    radiance = fer.data["radiance"]
+    I = radiance.isel(stokes=0).to_numpy()  # noqa: E741
+    Q = radiance.isel(stokes=1).to_numpy()
+    U = radiance.isel(stokes=2).to_numpy()
+
+    spectra = {k: v._ds for k, v in l1b._spectra.items()}
+    assert set(spectra) == {"I", "dolp", "aolp", "q"}
+
+    np.testing.assert_array_equal(spectra["I"]["radiance"], I)
+    np.testing.assert_allclose(spectra["dolp"]["radiance"], np.sqrt(Q**2 + U**2) / I)
+    np.testing.assert_allclose(spectra["aolp"]["radiance"], 0.5 * np.arctan(U / Q))
+    np.testing.assert_allclose(spectra["q"]["radiance"], Q / I)
+    np.testing.assert_allclose(spectra["I"]["radiance_noise"], 0.01 * I)
+
+    for ds in spectra.values():
+        np.testing.assert_allclose(
+            ds["solar_zenith_angle"],
+            np.rad2deg(np.arccos(fer.data["tangent_cos_sza"].to_numpy())),
+        )
+        assert float(ds["spacecraft_altitude"]) == 5e5
+
+
+def test_l1b_image_along_track_dataset(tmp_path):
+    l1b = L1bGeneratorIdeal(None, None, ["I", "dolp", "q"]).run(_fer())
+
+    ds = _along_track_dataset(l1b)
+    assert list(ds["product"].to_numpy()) == ["I", "dolp", "q"]
+    for k, spectra in l1b.spectra.items():
+        xr.testing.assert_equal(
+            ds["radiance"].sel(product=k, drop=True), spectra.ds["radiance"]
+        )
+    xr.testing.assert_equal(ds["tangent_altitude"], l1b.spectra["I"].ds["tangent_altitude"])
+
+    # Can be written as part of a curtain
+    ds.to_netcdf(tmp_path / "l1b.nc")
+
+
+def test_least_squares_stokes():
+    rng = np.random.default_rng(1)
+    stokes = np.stack([rng.uniform(1, 2, (5, 4)), *rng.uniform(-0.3, 0.3, (2, 5, 4))])
+
+    matrix = analyzer_matrix(
+        [0, 45, 90, 135, 30], transmission=[0.9, 1, 0.95, 1, 0.8], diattenuation=0.98
+    )
+    measurements = np.tensordot(matrix, stokes, axes=1)
+    variance = rng.uniform(0.5, 1, measurements.shape)
+
+    result, cov = least_squares_stokes(measurements, variance, matrix)
+    np.testing.assert_allclose(result, stokes)
+
+    # Covariance of a single pixel matches the dense propagation
+    inverse = np.linalg.pinv(matrix)
+    expected = inverse @ np.diag(variance[:, 2, 3]) @ inverse.T
+    np.testing.assert_allclose(cov[:, :, 2, 3], expected)
+
+    with pytest.raises(ValueError, match="three analyzers"):
+        least_squares_stokes(measurements[:2], variance[:2], matrix[:2])
+
+
+def test_imager_with_more_analyzers():
+    fer = _fer()
+    radiance = fer.data["radiance"]
+    I = radiance.isel(stokes=0).to_numpy()  # noqa: E741
+    Q = radiance.isel(stokes=1).to_numpy()
+    U = radiance.isel(stokes=2).to_numpy()
+
+    l1b = L1bGeneratorIdealImager(
+        None,
+        None,
+        pol_states=["I", "q", "u", "dolp"],
+        pol_angles=[0, 45, 90, 135],
+        transmission=0.9,
+    ).run(fer)
+    spectra = {k: v._ds for k, v in l1b._spectra.items()}
+
+    np.testing.assert_allclose(spectra["I"]["radiance"], I)
+    np.testing.assert_allclose(spectra["q"]["radiance"], Q / I)
+    np.testing.assert_allclose(spectra["u"]["radiance"], U / I)
+    np.testing.assert_allclose(spectra["dolp"]["radiance"], np.sqrt(Q**2 + U**2) / I)
+
+
+def test_ideal_l1b_ensemble():
+    fer = _fer()
+    gen = L1bGeneratorIdeal(
+        None, None, ["I", "dolp"], include_noise=True, noise_streams=NoiseStreams(2)
+    )
+
+    noisy = {k: v._ds for k, v in gen.run(fer)._spectra.items()}
+    gen._noise = False
+    expected = {k: v._ds for k, v in gen.run(fer)._spectra.items()}
+    ensemble = gen.run_ensemble(fer, 200)
+    assert len(ensemble) == 200
+
+    for k, ds in expected.items():
+        radiance = np.stack([l1b._spectra[k]._ds["radiance"] for l1b in ensemble])
+        residual = (radiance - ds["radiance"].to_numpy()) / ds["radiance_noise"].to_numpy()
+
+        # Independent unit normal noise around the noise free L1b
+        assert abs(residual.mean()) < 0.05
+        assert abs(residual.std() - 1) < 0.05
+        assert not np.allclose(radiance[0], radiance[1])
+        np.testing.assert_array_equal(radiance[0], noisy[k]["radiance"])
+
+
+def test_imager_l1b_ensemble():
+    fer = _fer()
+    gen = L1bGeneratorIdealImager(
+        None,
+        None,
+        noise_model=ConstantNoise(0.01),
+        pol_states=["I", "dolp"],
+        noise_streams=NoiseStreams(seed=1),
+    )
+    ensemble = gen.run_ensemble(fer, 50)
+    assert len(ensemble) == 50
+
+    intensity = np.stack([l1b._spectra["I"]._ds["radiance"] for l1b in ensemble])
+    np.testing.assert_allclose(
+        intensity.mean(axis=0), fer.data["radiance"].isel(stokes=0), rtol=0.02
+    )
+    assert not np.allclose(intensity[0], intensity[1])
+
+    # The first realization is the same as a single run with the same streams
+    np.testing.assert_array_equal(gen.run(fer)._spectra["I"]._ds["radiance"], intensity[0])
+
+
+def test_ideal_l1b_noise_model():
+    fer = _fer()
+    model = DetectorNoise(etendue=1e-4, integration_time=1.0, read_noise=10)
+
+    l1b = L1bGeneratorIdeal(None, None, ["I"], noise_model=model).run(fer)
+
+    intensity = fer.data["radiance"].isel(stokes=0)
+    np.testing.assert_allclose(
+        l1b._spectra["I"]._ds["radiance_noise"], model.noise_sigma(intensity)
+    )
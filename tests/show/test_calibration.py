@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+import xarray as xr
+
+from hawcsimulator.show import calibration
+from hawcsimulator.show.inst_model import spectral_window_error
+from hawcsimulator.show.steps import fer
+
+
+def test_ideal_ils_matches_single_sample():
+    cal_db = calibration.generate_ideal_l2_cal_db(
+        128, 0.002 * 3.4, 1362, apodization=10, include_aliasing=True
+    )
+
+    # Reference calculation for a single sample
+    hires = cal_db["hires_wavenumber"].to_numpy()
+    wvnum_spacing = 1 / (2 * 128 * 0.002 * 3.4)
+    wvnum = float(cal_db["sample_wavenumber"][5])
+
+    ils = np.sinc((hires - wvnum) / wvnum_spacing)
+    apodized = np.fft.fftshift(np.fft.fft(np.fft.fftshift(ils)))
+    apod_fun = np.zeros(len(apodized))
+    c = len(apod_fun) // 2
+    apod_fun[c - 64 : c + 64] = np.kaiser(128, 10)
+    ils = np.fft.fftshift(np.fft.ifft(np.fft.ifftshift(apod_fun * apodized)).real)
+    ils += ils[::-1]
+    ils *= calibration._default_filter(1e7 / hires, 1362)
+
+    np.testing.assert_allclose(cal_db["ils"].isel(sample_wavenumber=5), ils, atol=1e-14)
+
+
+def test_cache_keyed_on_parameters(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration, "_calibration_dir", lambda: tmp_path)
+
+    a = calibration.cached_ideal_l2_cal_db(64, 0.002 * 3.4, 1362, apodization=10)
+    assert calibration.cached_ideal_l2_cal_db(64, 0.002 * 3.4, 1362, apodization=10) == a
+
+    assert calibration.cached_ideal_l2_cal_db(64, 0.002 * 3.4, 1362, apodization=5) != a
+    assert (
+        calibration.cached_ideal_l2_cal_db(
+            64,
+            0.002 * 3.4,
+            1362,
+            apodization=10,
+            filter_fn=lambda w, wl: calibration.bandpass_filter(w, 1364, 1.0, 0.2, 80),  # noqa: ARG005
+        )
+        != a
+    )
+    assert len(list(tmp_path.glob("ideal_*.nc"))) == 3
+
+
+def _passband(w):
+    return calibration.bandpass_filter(w, 1364, 1.0, 0.2, 80)
+
+
+def _narrow_passband(w):
+    return calibration.bandpass_filter(w, 1364, 0.5, 0.2, 80)
+
+
+def test_cache_keyed_on_called_filter_code(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration, "_calibration_dir", lambda: tmp_path)
+
+    def filter_fn(w, wl):  # noqa: ARG001
+        return _passband(w)
+
+    a = calibration.cached_ideal_l2_cal_db(64, 0.002 * 3.4, 1362, filter_fn=filter_fn)
+
+    # Same filter_fn, but the function it calls has changed
+    monkeypatch.setitem(globals(), "_passband", _narrow_passband)
+    b = calibration.cached_ideal_l2_cal_db(64, 0.002 * 3.4, 1362, filter_fn=filter_fn)
+    assert b != a
+
+    # A database stored under the bare name and version is never used
+    (tmp_path / "ideal_v1.nc").touch()
+    assert calibration.calibration_database("ideal", "v1").name != "ideal_v1.nc"
+
+
+def _shifted_filter(center: float):
+    def filter_fn(w, wl):  # noqa: ARG001
+        return calibration.bandpass_filter(w, center, 1.0, 0.2, 80)
+
+    return filter_fn
+
+
+def test_cache_keyed_on_captured_values(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration, "_calibration_dir", lambda: tmp_path)
+
+    files = {
+        calibration.cached_ideal_l2_cal_db(64, 0.002 * 3.4, 1362, filter_fn=f)
+        for f in [_shifted_filter(1364), _shifted_filter(1370), _shifted_filter(1364)]
+    }
+    assert len(files) == 2
+
+
+def test_spectral_window_limits_l1b_change(tmp_path, caplog):
+    cal_db = calibration.generate_ideal_l2_cal_db(
+        128,
+        0.002 * 3.4,
+        1362,
+        apodization=10,
+        filter_fn=lambda w, wl: calibration.bandpass_filter(w, 1364, 1.0, 0.2, 80),  # noqa: ARG005
+    )
+    cal_db.to_netcdf(tmp_path / "cal_db.nc")
+    cal_db = xr.load_dataset(tmp_path / "cal_db.nc")
+
+    low, high = calibration.spectral_window(cal_db, rtol=1e-4)
+    sample = cal_db["sample_wavenumber"].to_numpy()
+    assert low < sample.min()
+    assert high > sample.max()
+
+    model_wavenumber = np.arange(7295, 7340, 0.01)
+    window = model_wavenumber[(model_wavenumber >= low) & (model_wavenumber <= high)]
+    assert len(window) < len(model_wavenumber) / 2
+
+    rng = np.random.default_rng(0)
+    lines = rng.uniform(7295, 7340, 100)
+    depth = rng.uniform(0, 1, 100)
+    radiance = np.exp(
+        -(depth * np.exp(-(((model_wavenumber[:, np.newaxis] - lines) / 0.03) ** 2))).sum(
+            axis=1
+        )
+    )[:, np.newaxis]
+
+    assert spectral_window_error(cal_db, model_wavenumber, radiance, window) < 1e-4
+
+    # The FER step only band limits when asked to, and logs the L1b change when it does
+    assert len(fer._model_wavenumber(cal_db, None)) == len(model_wavenumber)
+    with caplog.at_level(logging.INFO):
+        np.testing.assert_array_equal(fer._model_wavenumber(cal_db, 1e-4), window)
+    assert "relative L1b change" in caplog.text
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import numpy as np
+import xarray as xr
+from skretrieval.core.lineshape import UserLineShape
+
+from hawcsimulator.show.calibration import generate_ideal_l2_cal_db
+from hawcsimulator.show.inst_model import ils_operator
+
+
+def test_ils_operator_matches_line_shapes(tmp_path):
+    cal_db = generate_ideal_l2_cal_db(128, 0.002 * 3.4, 1362, apodization=10)
+    cal_db.to_netcdf(tmp_path / "cal_db.nc")
+    cal_db = xr.load_dataset(tmp_path / "cal_db.nc")
+
+    model_wavenumber = np.arange(7320, 7345, 0.01)
+    sample_wavenumber = cal_db["sample_wavenumber"].to_numpy()[::3] + 0.001
+
+    operator = ils_operator(cal_db, sample_wavenumber, model_wavenumber, rtol=0)
+
+    expected = np.vstack(
+        [
+            UserLineShape(
+                cal_db.hires_wavenumber.to_numpy(),
+                cal_db.sel(sample_wavenumber=w, method="nearest")["ils"].to_numpy(),
+                False,
+            ).integration_weights(w, model_wavenumber)
+            for w in sample_wavenumber
+        ]
+    )
+    np.testing.assert_allclose(operator.toarray(), expected, atol=1e-12)
+
+    # Cached next to the calibration database
+    assert len(list((tmp_path / "ils_operators").glob("*.npz"))) == 1
+    assert ils_operator(cal_db, sample_wavenumber, model_wavenumber, rtol=0) is operator
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+import sasktran2 as sk
+import xarray as xr
+from showlib.l1b.data import L1bDataSet
+
+from hawcsimulator.fer import FERGeneratorBasic
+from hawcsimulator.geometry.observation import SimulatedObservationGeometry
+from hawcsimulator.show.calibration import bandpass_filter, generate_ideal_l2_cal_db
+from hawcsimulator.show.inst_model import L1bGeneratorILS
+
+
+def _filter(w, wl):  # noqa: ARG001
+    return bandpass_filter(w, 1364, 1.0, 0.2, 80)
+
+
+@pytest.fixture(scope="module")
+def show_fer(tmp_path_factory):
+    file = tmp_path_factory.mktemp("show") / "cal_db.nc"
+    generate_ideal_l2_cal_db(
+        128, 0.002 * 3.4, 1362, apodization=10, filter_fn=_filter
+    ).to_netcdf(file)
+    cal_db = xr.load_dataset(file)
+
+    viewing_geo = sk.viewinggeo.LimbVertical.from_tangent_parameters(
+        solar_handler=sk.solar.SolarGeometryHandlerForced(60.0, 0.0),
+        tangent_altitudes=np.arange(10000, 30001, 10000.0),
+        tangent_latitude=30.0,
+        tangent_longitude=0.0,
+        time=pd.Timestamp("2022-01-01T12:00:00"),
+        observer_altitude=450000.0,
+        viewing_azimuth=0.0,
+    )
+    observation = SimulatedObservationGeometry(
+        viewing_geo=viewing_geo,
+        sample_wavenumber=cal_db["sample_wavenumber"].to_numpy(),
+    )
+
+    fer_gen = FERGeneratorBasic(observation, np.arange(0, 65001, 1000.0))
+    atmo = sk.Atmosphere(
+        fer_gen.model_geo,
+        fer_gen.sk_config,
+        wavenumber_cminv=np.arange(7295, 7340, 0.05),
+        calculate_derivatives=False,
+    )
+    sk.climatology.us76.add_us76_standard_atmosphere(atmo)
+    atmo["rayleigh"] = sk.constituent.Rayleigh()
+
+    return cal_db, observation, fer_gen.run(atmo)
+
+
+@pytest.mark.parametrize(
+    "l1b_cfg",
+    [
+        {"use_ils_operator": True},
+        {"interferogram_cfg": {"num_samples": 128, "filter_fn": _filter}},
+    ],
+)
+def test_l1b_modes_match_line_shapes(show_fer, l1b_cfg):
+    cal_db, observation, fer = show_fer
+
+    expected = L1bGeneratorILS(cal_db, observation).run(fer).ds
+    l1b = L1bGeneratorILS(cal_db, observation, **l1b_cfg).run(fer).ds
+
+    np.testing.assert_allclose(
+        l1b["radiance"].to_numpy(), expected["radiance"].to_numpy(), rtol=5e-3
+    )
+    np.testing.assert_allclose(
+        l1b["left_wavenumber"].to_numpy(), expected["left_wavenumber"].to_numpy()
+    )
+
+
+def test_l1b_ensemble_interferogram(show_fer):
+    cal_db, observation, fer = show_fer
+
+    l1b_gen = L1bGeneratorILS(
+        cal_db,
+        observation,
+        interferogram_cfg={"num_samples": 128, "filter_fn": _filter},
+    )
+    ensemble = l1b_gen.run_ensemble(fer, 2)
+
+    assert ensemble.sizes["realization"] == 2
+    assert (
+        ensemble["radiance"].isel(realization=0).shape
+        == l1b_gen.run(fer).ds["radiance"].shape
+    )
+    L1bDataSet(ensemble.isel(realization=1), "", None).image(0).skretrieval_l1()
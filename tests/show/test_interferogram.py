@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from hawcsimulator.show.calibration import bandpass_filter, generate_ideal_l2_cal_db
+from hawcsimulator.show.inst_model import ils_operator
+from hawcsimulator.show.interferogram import InterferogramModel
+
+
+def _filter(w, wl):  # noqa: ARG001
+    return bandpass_filter(w, 1364, 1.0, 0.2, 80)
+
+
+def _radiance(wavenumber: np.ndarray, num_los: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    lines = rng.uniform(wavenumber[0], wavenumber[-1], 50)
+    depth = rng.uniform(0, 0.5, 50)
+    optical_depth = (
+        depth * np.exp(-(((wavenumber[:, np.newaxis] - lines) / 0.03) ** 2))
+    ).sum(axis=1)
+
+    return np.exp(-optical_depth)[:, np.newaxis] * np.linspace(1, 2, num_los)
+
+
+def test_interferogram_matches_direct_sum():
+    model = InterferogramModel(num_samples=128, filter_fn=_filter)
+    wavenumber = np.arange(7320, 7345, 0.01)
+    radiance = _radiance(wavenumber, 3)
+
+    filtered = radiance * (_filter(1e7 / wavenumber, 1362) * 0.01)[:, np.newaxis]
+    phase = 2 * np.pi * np.outer(model.opd, wavenumber - 1e7 / 1362)
+    expected = filtered.sum(axis=0) + np.cos(phase) @ filtered
+
+    np.testing.assert_allclose(
+        model.interferogram(wavenumber, radiance), expected, rtol=1e-9
+    )
+
+
+def test_interferogram_spectra_match_ils(tmp_path):
+    cal_db = generate_ideal_l2_cal_db(
+        128, 0.002 * 3.4, 1362, apodization=10, filter_fn=_filter
+    )
+    cal_db.to_netcdf(tmp_path / "cal_db.nc")
+    cal_db = xr.load_dataset(tmp_path / "cal_db.nc")
+
+    model = InterferogramModel(num_samples=128, apodization=10, filter_fn=_filter)
+    np.testing.assert_allclose(
+        model.sample_wavenumber, cal_db["sample_wavenumber"].to_numpy()
+    )
+
+    wavenumber = np.arange(7295, 7340, 0.01)
+    radiance = _radiance(wavenumber, 4)
+
+    expected = ils_operator(cal_db, model.sample_wavenumber, wavenumber) @ radiance
+    np.testing.assert_allclose(model(wavenumber, radiance), expected, rtol=5e-3)
+
+
+def test_interferogram_requires_uniform_grid():
+    wavenumber = np.concatenate([np.arange(7300, 7310, 0.01), [7320.0]])
+
+    with pytest.raises(ValueError, match="uniformly spaced"):
+        InterferogramModel().interferogram(wavenumber, np.ones((len(wavenumber), 1)))
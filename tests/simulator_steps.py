@@ -0,0 +1,20 @@
+"""
+Step module and simulator importable by worker processes, the run_batch tests with more than one
+worker can't use modules that only exist in memory
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from hawcsimulator.noise import NoiseStreams
+from hawcsimulator.simulator import Simulator
+
+
+class StepsSimulator(Simulator):
+    def _initialize_data(self) -> dict:
+        return {}
+
+
+def noisy(value: float, noise_streams: NoiseStreams) -> np.ndarray:
+    return value + noise_streams.standard_normal((4,), "value")
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import time
+
+import numpy as np
+import pytest
+import sasktran2 as sk
+
+from hawcsimulator.atmosphere import crosssections
+from hawcsimulator.atmosphere.crosssections import h2o_cross_section_table, main
+
+
+def _small_table(**kwargs) -> sk.database.HITRANDatabase:
+    # Tables are generated on construction, which needs the HITRAN line list
+    try:
+        return h2o_cross_section_table(
+            start_wavenumber=7320,
+            end_wavenumber=7321,
+            wavenumber_resolution=0.1,
+            **kwargs,
+        )
+    except Exception as err:
+        pytest.skip(f"HITRAN line list not available: {err}")
+
+
+def test_table_matches_hitran_database(tmp_path):
+    table = _small_table(db_root=tmp_path / "table")
+    direct = sk.database.HITRANDatabase(
+        molecule="H2O",
+        start_wavenumber=7320,
+        end_wavenumber=7321,
+        wavenumber_resolution=0.1,
+        reduction_factor=1,
+        db_root=tmp_path / "direct",
+    )
+
+    wavenumbers = [7320.0, 7320.5, 7320.9]
+    np.testing.assert_allclose(
+        table.load_ds()["xs"].sel(wavenumber_cminv=wavenumbers, method="nearest"),
+        direct.load_ds()["xs"].sel(wavenumber_cminv=wavenumbers, method="nearest"),
+    )
+
+
+def test_cli_prints_table_path(tmp_path, capsys):
+    table = _small_table(db_root=tmp_path)
+
+    main(["--start", "7320", "--end", "7321", "--resolution", "0.1", "--db-root", str(tmp_path)])
+
+    assert capsys.readouterr().out.strip() == str(table.path())
+
+
+class _FakeTable:
+    def __init__(self, file):
+        self._file = file
+        self.generated = 0
+        if not file.exists():
+            self.generate()
+
+    def path(self):
+        return self._file
+
+    def clear(self):
+        self._file.unlink()
+
+    def generate(self):
+        self._file.write_text("xs")
+        self.generated += 1
+
+
+def test_cli_rebuilds_only_existing_tables(tmp_path, monkeypatch):
+    tables = []
+
+    def fake_table(**kwargs):
+        tables.append(_FakeTable(tmp_path / "table.nc"))
+        return tables[-1]
+
+    monkeypatch.setattr(crosssections, "h2o_cross_section_table", fake_table)
+
+    # A new table is generated once, even with --rebuild
+    crosssections.main(["--rebuild"])
+    assert tables[-1].generated == 1
+
+    old = time.time() - 10
+    os.utime(tmp_path / "table.nc", (old, old))
+
+    crosssections.main([])
+    assert tables[-1].generated == 0
+
+    crosssections.main(["--rebuild"])
+    assert tables[-1].generated == 1
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import sasktran2 as sk
+import xarray as xr
+
+import hawcsimulator.atmosphere.earthcare as earthcare
+from hawcsimulator.atmosphere.earthcare import store
+from hawcsimulator.steps.atmosphere import atmosphere__earthcare
+
+
+def _latitude_average(central_latitude: float, data: xr.Dataset) -> xr.Dataset:
+    # Previous implementation, masking the unsorted track
+    data = data.where(data["latitude"] > central_latitude - 1, drop=True)
+    data = data.where(data["latitude"] < central_latitude + 1, drop=True)
+    return data.mean(dim="nx")
+
+
+def _load_lat_lon(data: xr.Dataset, folder) -> xr.Dataset:
+    ds = xr.open_dataset(folder / store._REFERENCE_FILE)
+    data["latitude"] = ds["latitude"]
+    data["longitude"] = ds["longitude"]
+    data["height"] = ds["height"]
+    return data
+
+
+@pytest.fixture
+def scene(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    nx, nz = 200, 20
+    # The latitude along the track is not monotonic, e.g. a descending then ascending pass
+    latitude = np.concatenate([np.linspace(40, 20, nx // 2), np.linspace(21, 39, nx // 2)])
+    height = np.linspace(0, 20, nz)
+
+    def geolocated(variables):
+        return xr.Dataset(
+            {
+                **{k: (["nx", "nz"], v) for k, v in variables.items()},
+                "latitude": (["nx"], latitude),
+                "longitude": (["nx"], np.zeros(nx)),
+                "height": (["nz"], height),
+            }
+        )
+
+    folder = tmp_path / "earthcare"
+    folder.mkdir()
+    for k, var in store._AEROSOL_VARS.items():
+        for wavel in ("0.680", "1.020"):
+            geolocated({var: rng.uniform(-0.1, 1, (nx, nz))}).to_netcdf(
+                folder / f"scene_{k}_3d-1-{wavel}.nc"
+            )
+
+    humidity = rng.uniform(-1, 10, (nx, nz))
+    humidity[0, 0] = np.nan
+    xr.Dataset({"specific_humidity": (["nx", "nz"], humidity)}).to_netcdf(
+        folder / store._WATER_FILE
+    )
+    xr.Dataset(
+        {"temperature": (["nx", "nz"], rng.uniform(200, 300, (nx, nz)))}
+    ).to_netcdf(folder / store._TEMPERATURE_FILE)
+    for var, file in store._BRDF_FILES.items():
+        xr.Dataset({var: (["x", "band"], rng.uniform(0, 1, (nx, 7)))}).to_netcdf(
+            folder / file
+        )
+
+    monkeypatch.setattr(
+        store,
+        "load_user_config",
+        lambda: {"earthcare_folder": str(folder), "earthcare_store": str(tmp_path / "scene.nc")},
+    )
+    store.open_group.cache_clear()
+    yield folder
+    store.open_group.cache_clear()
+
+
+def test_store_matches_direct_read(scene):
+    # Previous implementation, reading the scene files directly
+    water = _load_lat_lon(xr.load_dataset(scene / store._WATER_FILE), scene)
+    water["specific_humidity"].values[water["specific_humidity"].values < 0] = 0
+    water["specific_humidity"].values[np.isnan(water["specific_humidity"].values)] = 0
+    water = _latitude_average(30.5, water)
+    expected = earthcare._to_uniform_spacing(water, 1000, "specific_humidity")
+
+    np.testing.assert_allclose(
+        earthcare._water(30.5).to_numpy(),
+        expected.to_numpy() * 28.9647 / 18.02 / 1000,
+    )
+
+    ext = xr.load_dataset(scene / "scene_ext_3d-1-1.020.nc")
+    ext["Extinction"].values[ext["Extinction"].values < 0] = 0
+    ext = earthcare._to_uniform_spacing(
+        _latitude_average(30.5, ext), 1000, "Extinction"
+    )
+    np.testing.assert_allclose(
+        earthcare._aerosol(30.5, 1)["k"].sel(wavelength=1020.0).to_numpy(),
+        ext.to_numpy(),
+    )
+
+    temperature = _latitude_average(
+        30.5, _load_lat_lon(xr.load_dataset(scene / store._TEMPERATURE_FILE), scene)
+    )
+    np.testing.assert_allclose(
+        earthcare._temperature(30.5).to_numpy(),
+        earthcare._to_uniform_spacing(temperature, 1000, "temperature").to_numpy(),
+    )
+
+    brdf = earthcare._brdf(30.5)
+    assert brdf["iso"].shape == (4,)
+
+    with pytest.raises(ValueError, match="outside the range"):
+        earthcare._water(50.0)
+
+
+def test_earthcare_atmosphere_uses_injected_h2o(scene, monkeypatch):  # noqa: ARG001
+    def line_by_line(*args, **kwargs):
+        msg = "Line by line cross sections should not be used"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(sk.optical, "HITRANAbsorber", line_by_line)
+
+    # Only evaluated by the radiative transfer, so any object stands in for the cross section table
+    h2o_optical_property = object()
+
+    # The O3 cross sections are downloaded on first use
+    try:
+        atmosphere = atmosphere__earthcare(h2o_optical_property=h2o_optical_property)
+    except OSError as err:
+        pytest.skip(f"sasktran2 databases not available: {err}")
+
+    h2o = atmosphere.constituents["h2o"]
+    assert isinstance(h2o, sk.constituent.VMRAltitudeAbsorber)
+    np.testing.assert_allclose(h2o.vmr[:21], earthcare._water(30).to_numpy()[:21])
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import sasktran2 as sk
+
+from hawcsimulator import fer
+from hawcsimulator.fer import FERGeneratorBasic, PersistentFERGenerator
+from hawcsimulator.geometry.observation import SimulatedObservationGeometry
+from hawcsimulator.steps.limb_observation import (
+    front_end_radiance_scenes,
+    observation__limb,
+    observation__limb_multi,
+)
+
+
+def _observation(sza: float = 60.0, saa: float = 0.0):
+    viewing_geo = sk.viewinggeo.LimbVertical.from_tangent_parameters(
+        solar_handler=sk.solar.SolarGeometryHandlerForced(sza, saa),
+        tangent_altitudes=np.arange(10000, 40001, 5000.0),
+        tangent_latitude=30.0,
+        tangent_longitude=0.0,
+        time=pd.Timestamp("2022-01-01T12:00:00"),
+        observer_altitude=450000.0,
+        viewing_azimuth=0.0,
+    )
+    return SimulatedObservationGeometry(
+        viewing_geo=viewing_geo, sample_wavel=np.array([745.0])
+    )
+
+
+def _radiance(fer_gen, albedo: float, temperature_offset: float = 0.0):
+    return (
+        _radiance_dataset(fer_gen, albedo, temperature_offset)
+        .data["radiance"]
+        .to_numpy()
+    )
+
+
+def _radiance_dataset(fer_gen, albedo: float, temperature_offset: float = 0.0):
+    atmo = sk.Atmosphere(
+        fer_gen.model_geo,
+        fer_gen.sk_config,
+        wavelengths_nm=np.array([470.0, 745.0]),
+        calculate_derivatives=False,
+    )
+    sk.climatology.us76.add_us76_standard_atmosphere(atmo)
+    atmo.temperature_k = atmo.temperature_k + temperature_offset
+    atmo["rayleigh"] = sk.constituent.Rayleigh()
+    atmo["albedo"] = sk.constituent.LambertianSurface(albedo)
+
+    return fer_gen.run(atmo)
+
+
+def _persistent_matches_basic(scenes: list[dict]) -> dict:
+    alt_grid = np.arange(0, 65001, 1000.0)
+    persistent = PersistentFERGenerator()
+
+    for scene in scenes:
+        observation = scene.get("observation", {})
+        atmosphere = scene.get("atmosphere", {"albedo": 0.3})
+
+        persistent.update(_observation(**observation), alt_grid)
+        np.testing.assert_allclose(
+            _radiance(persistent, **atmosphere),
+            _radiance(FERGeneratorBasic(_observation(**observation), alt_grid), **atmosphere),
+        )
+
+    return persistent.cache_info()
+
+
+def test_persistent_fer_matches_basic():
+    # Only the surface changes, the engine is reused
+    info = _persistent_matches_basic(
+        [{"atmosphere": {"albedo": 0.1}}, {"atmosphere": {"albedo": 0.5}}]
+    )
+    assert info["engine_misses"] == 1
+    assert info["engine_hits"] == 1
+    assert info["model_geometries"] == 1
+
+    # The temperature changes the refractive index, the geometry key is shared but not the engine
+    info = _persistent_matches_basic(
+        [
+            {"atmosphere": {"albedo": 0.3}},
+            {"atmosphere": {"albedo": 0.3, "temperature_offset": 5.0}},
+            {"atmosphere": {"albedo": 0.3}},
+        ]
+    )
+    assert info["engine_misses"] == 2
+    assert info["engine_hits"] == 1
+    assert info["model_geometries"] == 2
+
+
+def test_persistent_fer_changing_solar_geometry():
+    # Every scene needs its own geometry and engine, but never more than FERGeneratorBasic
+    info = _persistent_matches_basic(
+        [{"observation": {"sza": sza, "saa": saa}} for sza, saa in [(60, 0), (61, 10), (62, 20)]]
+    )
+    assert info["engine_misses"] == 3
+    assert info["model_geometries"] == 3
+
+
+def test_chunked_fer_matches_full():
+    fer_gen = FERGeneratorBasic(_observation(), np.arange(0, 65001, 1000.0))
+    fer_gen.sk_config.multiple_scatter_source = (
+        sk.MultipleScatterSource.DiscreteOrdinates
+    )
+    fer_gen.sk_config.num_streams = 2
+
+    atmo = sk.Atmosphere(
+        fer_gen.model_geo,
+        fer_gen.sk_config,
+        wavelengths_nm=np.linspace(450.0, 800.0, 7),
+        calculate_derivatives=False,
+    )
+    sk.climatology.us76.add_us76_standard_atmosphere(atmo)
+    atmo["rayleigh"] = sk.constituent.Rayleigh()
+    atmo["albedo"] = sk.constituent.LambertianSurface(0.3)
+
+    full = fer_gen.run(atmo).data["radiance"]
+
+    for kwargs in [{"chunk_size": 3}, {"engine_memory_budget_bytes": 1}]:
+        chunked = fer_gen.run_chunked(atmo, **kwargs).data["radiance"]
+        np.testing.assert_allclose(chunked.to_numpy(), full.to_numpy())
+
+
+def test_chunked_fer_matches_full_wavenumber_grid(monkeypatch):
+    # The SHOW steps chunk an atmosphere defined on a wavenumber grid
+    fer_gen = FERGeneratorBasic(_observation(), np.arange(0, 65001, 1000.0))
+
+    atmo = sk.Atmosphere(
+        fer_gen.model_geo,
+        fer_gen.sk_config,
+        wavenumber_cminv=np.linspace(7300.0, 7330.0, 7),
+        calculate_derivatives=False,
+    )
+    sk.climatology.us76.add_us76_standard_atmosphere(atmo)
+    atmo["rayleigh"] = sk.constituent.Rayleigh()
+
+    full = fer_gen.run(atmo).data
+    chunked = fer_gen.run_chunked(atmo, chunk_size=3).data
+
+    np.testing.assert_allclose(
+        chunked["radiance"].to_numpy(), full["radiance"].to_numpy()
+    )
+    np.testing.assert_allclose(
+        chunked["wavenumber_cminv"].to_numpy(), full["wavenumber_cminv"].to_numpy()
+    )
+
+    # Without access to the constituents the full grid is calculated at once
+    monkeypatch.setattr(fer, "_constituents", lambda atmosphere: None)  # noqa: ARG005
+    assert fer_gen.bytes_per_spectral_point(atmo) > 0
+    np.testing.assert_allclose(
+        fer_gen.run_chunked(atmo, chunk_size=3).data["radiance"].to_numpy(),
+        full["radiance"].to_numpy(),
+    )
+
+
+def test_multi_scene_fer_matches_single_scenes():
+    alt_grid = np.arange(0, 65001, 1000.0)
+    tan_alts = np.arange(10000, 40001, 5000.0)
+    time = pd.Timestamp("2022-06-01T12:00:00")
+    latitudes = np.array([10.0, 14.0])
+
+    multi = observation__limb_multi(
+        tan_alts, time, latitudes, 0.0, 450000.0, np.array([745.0])
+    )
+    multi_rad = FERGeneratorBasic(multi.observation, alt_grid)
+    scenes = front_end_radiance_scenes(
+        _radiance_dataset(multi_rad, 0.3), multi
+    )
+
+    for lat, scene in zip(latitudes, scenes, strict=True):
+        single = observation__limb(
+            tan_alts, time, lat, 0.0, 450000.0, np.array([745.0])
+        )
+        expected = _radiance_dataset(
+            FERGeneratorBasic(single.observation, alt_grid), 0.3
+        )
+        # Scenes share the reference solar zenith angle and earth radius of the model geometry
+        np.testing.assert_allclose(
+            scene.data["radiance"].to_numpy(),
+            expected.data["radiance"].to_numpy(),
+            rtol=5e-3,
+        )
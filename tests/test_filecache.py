@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+
+from hawcsimulator.filecache import cached_file
+
+
+def _write_once(file):
+    def write(tmp):
+        # Count how many times the file is generated
+        with (file.parent / "generated").open("a") as f:
+            f.write("x")
+        tmp.write_text("contents")
+
+    return cached_file(file, write)
+
+
+def test_cached_file_generated_once(tmp_path):
+    file = tmp_path / "cache" / "data.txt"
+
+    with ProcessPoolExecutor(4) as executor:
+        list(executor.map(_write_once, [file] * 8))
+
+    assert file.read_text() == "contents"
+    assert (file.parent / "generated").read_text() == "x"
+    assert list(file.parent.glob("*.tmp")) == []
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import sys
+import types
+
+import numpy as np
+import sasktran2 as sk
+
+from hawcsimulator import nodecache
+from hawcsimulator.nodecache import NodeCache, fingerprint
+from hawcsimulator.simulator import Simulator
+
+
+def test_fingerprint_by_value():
+    a = {"x": np.arange(10.0), "y": [1, "a"]}
+    b = {"y": [1, "a"], "x": np.arange(10.0)}
+
+    assert fingerprint(a) == fingerprint(b)
+    assert fingerprint(a) != fingerprint({"x": np.arange(11.0), "y": [1, "a"]})
+
+    def scaled(factor):
+        return lambda x: factor * x
+
+    assert fingerprint(scaled(1)) == fingerprint(scaled(1))
+    assert fingerprint(scaled(1)) != fingerprint(scaled(2))
+
+    def offset(x, dx=1.0, *, dy=0.0):
+        return x + dx + dy
+
+    def offset_defaults(x, dx=2.0, *, dy=0.0):
+        return x + dx + dy
+
+    offset_defaults.__qualname__ = offset.__qualname__
+    assert fingerprint(offset) != fingerprint(offset_defaults)
+
+    times = np.array(["2022-01-01", "2022-01-02"], dtype="datetime64[ns]")
+    assert fingerprint(times) != fingerprint(times[::-1])
+
+    config = sk.Config()
+    assert fingerprint(config) == fingerprint(sk.Config())
+    config.num_streams = 8
+    assert fingerprint(config) != fingerprint(sk.Config())
+
+
+def test_lru_eviction(tmp_path):
+    cache = NodeCache(tmp_path, max_size_bytes=3000)
+
+    for i in range(5):
+        cache.store("node", f"{i}", np.zeros(100))
+
+    keys = [e["key"] for e in cache.entries()]
+    assert "0" not in keys
+    assert "4" in keys
+    assert cache.size_bytes() <= 3000
+
+    found, value = cache.load("node", "4")
+    assert found
+    np.testing.assert_array_equal(value, np.zeros(100))
+
+    assert cache.purge("node") == len(keys)
+    assert cache.entries() == []
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = NodeCache(tmp_path)
+    cache.store("node", "truncated", np.zeros(100))
+    file = cache.entries()[0]["file"]
+    file.write_bytes(file.read_bytes()[:50])
+
+    # References a module that no longer exists
+    (tmp_path / "node-incompatible.pkl").write_bytes(b"cno_such_module\nThing\n.")
+
+    for key in ["truncated", "incompatible"]:
+        assert cache.load("node", key) == (False, None)
+    assert cache.entries() == []
+    assert cache.info()["misses"] == 2
+
+
+calls = []
+
+
+def expensive(value: float) -> float:
+    calls.append(value)
+    return value + 1
+
+
+# Minimal step module so the tests don't depend on any external databases
+steps = types.ModuleType("test_nodecache_steps")
+expensive.__module__ = steps.__name__
+steps.expensive = expensive
+sys.modules[steps.__name__] = steps
+
+
+def test_simulator_node_cache(tmp_path):
+    simulator = Simulator()
+    simulator._initialize_data = dict
+    cache = NodeCache(tmp_path, nodes=("expensive",))
+    calls.clear()
+
+    def run(**config):
+        return simulator.run(
+            ["expensive"],
+            {"value": 1.0},
+            extra_modules=[steps],
+            config=config,
+            node_cache=cache,
+        )["expensive"]
+
+    assert run() == 2.0
+    assert run() == 2.0
+    assert calls == [1.0]
+    assert cache.info()["hits"] == 1
+
+    assert run(extra=1) == 2.0
+    assert calls == [1.0, 1.0]
+    assert cache.info()["misses"] == 2
+
+
+def test_simulator_node_cache_keyed_on_environment(tmp_path, monkeypatch):
+    simulator = Simulator()
+    simulator._initialize_data = dict
+    cache = NodeCache(tmp_path, nodes=("expensive",))
+    calls.clear()
+
+    def run():
+        return simulator.run(
+            ["expensive"], {"value": 1.0}, extra_modules=[steps], node_cache=cache
+        )["expensive"]
+
+    run()
+    run()
+    assert calls == [1.0]
+
+    monkeypatch.setattr(nodecache, "_environment_fingerprint", lambda: "upgraded")
+    run()
+    assert calls == [1.0, 1.0]
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import numpy as np
+import xarray as xr
+
+from hawcsimulator.noise import ConstantNoise, DetectorNoise, NoiseStreams
+
+
+def test_streams_are_reproducible():
+    a = NoiseStreams(seed=5, scene_id=3).standard_normal((4, 6), "I", realization=2)
+    b = NoiseStreams(seed=5, scene_id=3).standard_normal((4, 6), "I", realization=2)
+    np.testing.assert_array_equal(a, b)
+
+    # Every part of the key gives an independent stream
+    for other in (
+        NoiseStreams(seed=6, scene_id=3).standard_normal((4, 6), "I", realization=2),
+        NoiseStreams(seed=5, scene_id=4).standard_normal((4, 6), "I", realization=2),
+        NoiseStreams(seed=5, scene_id=3).standard_normal((4, 6), "dolp", realization=2),
+        NoiseStreams(seed=5, scene_id=3).standard_normal((4, 6), "I", realization=1),
+    ):
+        assert not np.allclose(a, other)
+
+
+def test_unseeded_streams_record_their_seed():
+    streams = NoiseStreams()
+    a = streams.standard_normal((10,), "I")
+    np.testing.assert_array_equal(
+        NoiseStreams(streams.seed).standard_normal((10,), "I"), a
+    )
+
+
+def test_ensemble_independent_of_size():
+    streams = NoiseStreams(seed=1)
+    small = streams.standard_normal_ensemble((3, 2), "I", 2)
+    large = streams.standard_normal_ensemble((3, 2), "I", 5)
+
+    assert large.shape == (5, 3, 2)
+    np.testing.assert_array_equal(small, large[:2])
+    np.testing.assert_array_equal(large[4], streams.standard_normal((3, 2), "I", 4))
+
+
+def test_preallocated_output():
+    out = np.zeros((3, 4))
+    result = NoiseStreams(seed=1).standard_normal((3, 4), "I", out=out)
+    assert result is out
+    assert np.all(out != 0)
+
+
+def test_constant_noise_uses_draws():
+    signal = xr.DataArray(np.full((2, 3), 10.0))
+    draws = NoiseStreams(seed=1).standard_normal(signal.shape, "I")
+
+    noisy, sigma = ConstantNoise(0.1).calc_noise(signal, standard_normal=draws)
+
+    np.testing.assert_allclose(sigma, 1.0)
+    np.testing.assert_allclose(noisy, 10.0 + draws)
+
+
+def _detector(**kwargs) -> DetectorNoise:
+    return DetectorNoise(
+        etendue=1e-4, integration_time=1.0, quantum_efficiency=0.5, **kwargs
+    )
+
+
+def test_detector_noise_sigma():
+    signal = xr.DataArray(np.full((3, 4), 1e7), dims=["wavelength", "los"])
+    model = _detector(read_noise=10, dark_current=100, gain=5)
+
+    # 500 signal electrons, 100 dark electrons, read noise and quantization
+    expected = np.sqrt(500 + 100 + 10**2 + 5**2 / 12) / 5e-5
+    np.testing.assert_allclose(model.noise_sigma(signal), expected)
+    np.testing.assert_allclose(model(signal), expected)
+
+
+def test_detector_noise_statistics():
+    signal = xr.DataArray(np.full((2000, 50), 1e7), dims=["los", "wavelength"])
+    model = _detector(read_noise=10, dark_current=100, gain=5, adc_bits=14)
+
+    draws = NoiseStreams(seed=1).standard_normal(signal.shape, "I")
+    noisy, sigma = model.calc_noise(signal, standard_normal=draws)
+
+    assert noisy.dims == signal.dims
+    np.testing.assert_allclose(noisy.mean(), 1e7, rtol=1e-3)
+    np.testing.assert_allclose(noisy.std(), sigma.mean(), rtol=2e-2)
+
+    # Quantized to whole digital numbers with the dark signal removed
+    dn = (noisy.to_numpy() * 5e-5 + 100) / 5
+    np.testing.assert_allclose(dn, np.round(dn), atol=1e-6)
+
+
+def test_detector_noise_saturates():
+    signal = xr.DataArray(np.full((2, 2), 1e10), dims=["wavelength", "los"])
+    model = _detector(gain=5, adc_bits=12)
+
+    noisy, _ = model.calc_noise(signal, standard_normal=np.zeros((2, 2)))
+    np.testing.assert_allclose(noisy, (2**12 - 1) * 5 / 5e-5)
+
+
+def test_detector_noise_wavelength_dependent_efficiency():
+    signal = xr.DataArray(np.full((3, 2), 1e7), dims=["los", "wavelength"])
+    model = DetectorNoise(
+        etendue=1e-4,
+        integration_time=1.0,
+        quantum_efficiency=xr.DataArray([0.5, 0.25], dims=["wavelength"]),
+    )
+
+    sigma = model.noise_sigma(signal)
+    np.testing.assert_allclose(sigma[:, 0], np.sqrt(500) / 5e-5)
+    np.testing.assert_allclose(sigma[:, 1], np.sqrt(250) / 2.5e-5)
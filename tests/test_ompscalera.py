@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import numpy as np
+import xarray as xr
+
+from hawcsimulator.atmosphere import ompscalera
+
+
+def _curtain_file(path):
+    rng = np.random.default_rng(0)
+
+    def group(n, latitude, altitude, var):
+        return xr.Dataset(
+            {var: (["time", "altitude"], rng.uniform(size=(n, len(altitude))))},
+            coords={"latitude": ("time", latitude), "altitude": altitude},
+        )
+
+    xr.DataTree.from_dict(
+        {
+            "OMPS": group(30, np.linspace(-60, 60, 30), np.arange(0, 45, 1.0), "extinction"),
+            "ERA5": group(
+                50, np.linspace(50, -50, 50), np.linspace(0, 45, 80), "specific_humidity"
+            ),
+            "CALIPSO": group(10, np.linspace(-50, 50, 10), np.arange(0, 30, 1.0), "backscatter"),
+        }
+    ).to_netcdf(path)
+    return path
+
+
+def test_curtain_profiles(tmp_path):
+    file = _curtain_file(tmp_path / "curtain.nc")
+    curtain = ompscalera.Curtain(file)
+
+    latitudes = np.array([30.0, -10.0, 45.0, 0.0])
+    profiles = curtain.profiles(latitudes)
+
+    # Previous per scene implementation
+    ds = xr.open_datatree(file)
+    omps = xr.Dataset(ds["OMPS"])
+    era5 = xr.Dataset(ds["ERA5"]).swap_dims({"time": "latitude"}).fillna(0.0)
+    omps = (
+        omps.swap_dims({"time": "latitude"})
+        .interp(latitude=era5.latitude)
+        .interp(altitude=np.arange(0, 40.0, 0.5))
+    )
+    h2o = ompscalera._to_uniform_spacing(
+        era5, 0.5, omps.altitude.to_numpy(), "specific_humidity"
+    ) * 28.97 / 18.01528
+
+    for i, lat in enumerate(latitudes):
+        np.testing.assert_allclose(
+            profiles["extinction"].isel(latitude=i),
+            omps["extinction"].interp(latitude=lat),
+        )
+        np.testing.assert_allclose(
+            profiles["h2o_vmr"].isel(latitude=i), h2o.interp(latitude=lat)
+        )
+        np.testing.assert_allclose(
+            curtain.profiles(lat)["h2o_vmr"], profiles["h2o_vmr"].isel(latitude=i)
+        )
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import sys
+import threading
+import tracemalloc
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from hawcsimulator.profiling import NodeProfiler, profile_report
+from hawcsimulator.simulator import Simulator
+
+
+def tripled(value: float) -> float:
+    return 3 * value
+
+
+# Minimal step module so the tests don't depend on any external databases
+steps = types.ModuleType("test_profiling_steps")
+tripled.__module__ = steps.__name__
+steps.tripled = tripled
+sys.modules[steps.__name__] = steps
+
+
+def test_profile_report():
+    profiler = NodeProfiler()
+
+    for _ in range(3):
+        profiler.new_run()
+        for node in ["atmosphere", "front_end_radiance"]:
+            profiler.run_before_node_execution(node_name=node)
+            profiler.run_after_node_execution(node_name=node, success=True)
+
+    assert len(profiler.run_profile()) == 2
+
+    report = profile_report([profiler.records()])
+    assert isinstance(report, pd.DataFrame)
+    assert set(report.index) == {"atmosphere", "front_end_radiance"}
+    assert (report["calls"] == 3).all()
+
+
+def test_profiler_retains_bounded_runs():
+    profiler = NodeProfiler(max_runs=2)
+
+    for _ in range(5):
+        profiler.new_run()
+        profiler.run_before_node_execution(node_name="atmosphere")
+        profiler.run_after_node_execution(node_name="atmosphere", success=True)
+
+    assert list(profiler.run_profile()["run"]) == [5]
+    assert list(profiler.run_profile(4)["run"]) == [4]
+    assert profiler.run_profile(1).empty
+    assert list(profiler.records()["run"]) == [4, 5]
+
+
+def test_profile_returned():
+    simulator = Simulator()
+    simulator._initialize_data = dict
+
+    for value in [1.0, 2.0]:
+        result, profile = simulator.run(
+            ["tripled"], {"value": value}, extra_modules=[steps], profile=True
+        )
+        assert result == {"tripled": 3 * value}
+        # Only the nodes of this run
+        assert list(profile["node"]) == ["tripled"]
+
+
+def test_trace_allocations_stopped_after_run():
+    simulator = Simulator()
+    simulator._initialize_data = dict
+    simulator._profiler = NodeProfiler(trace_allocations=True)
+
+    def run():
+        return simulator.run(
+            ["tripled"], {"value": 1.0}, extra_modules=[steps], profile=True
+        )
+
+    _, profile = run()
+    assert not profile["peak_memory_bytes"].isna().any()
+    assert not tracemalloc.is_tracing()
+
+    # Tracing started by someone else is left running
+    tracemalloc.start()
+    try:
+        run()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+_barrier = threading.Barrier(2, timeout=30)
+
+
+def synchronized(value: float) -> float:
+    # Both runs are in progress at the same time
+    _barrier.wait()
+    return value
+
+
+synchronized.__module__ = steps.__name__
+steps.synchronized = synchronized
+
+
+def test_profile_with_concurrent_runs():
+    def run(profile: bool):
+        simulator = Simulator()
+        simulator._initialize_data = dict
+        return simulator.run(
+            ["synchronized"], {"value": 1.0}, extra_modules=[steps], profile=profile
+        )
+
+    # The runs share a cached driver, the unprofiled run must not detach the profiler of the other
+    with ThreadPoolExecutor(2) as executor:
+        profiled = executor.submit(run, True)
+        plain = executor.submit(run, False)
+
+        assert plain.result() == {"synchronized": 1.0}
+        result, profile = profiled.result()
+
+    assert result == {"synchronized": 1.0}
+    assert list(profile["node"]) == ["synchronized"]
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import xarray as xr
+from skretrieval.core.lineshape import Rectangle
+
+from hawcsimulator.atmosphere import regrid
+
+
+def test_rectangle_weights_match_lineshape():
+    in_grid = np.sort(np.random.default_rng(1).uniform(0, 40, 60))
+    out_grid = np.arange(1, 39, 0.5)
+
+    ls = Rectangle(width=0.5)
+    expected = np.array([ls.integration_weights(a, in_grid) for a in out_grid])
+
+    weights = regrid.rectangle_weights(in_grid, out_grid, 0.5)
+    np.testing.assert_allclose(weights.toarray(), expected, atol=1e-14)
+
+    # Cached on the grids and width
+    assert regrid.rectangle_weights(in_grid.copy(), out_grid, 0.5) is weights
+
+    with pytest.raises(ValueError, match="do not overlap"):
+        regrid.rectangle_weights(in_grid, np.array([100.0]), 0.5)
+
+
+def test_to_uniform_spacing_many_profiles():
+    in_grid = np.linspace(0, 20, 41)
+    out_grid = np.arange(0, 20.1, 1.0)
+    data = xr.DataArray(
+        np.random.default_rng(2).uniform(size=(3, 41, 5)),
+        dims=["wavelength", "altitude", "latitude"],
+        coords={"wavelength": [1.0, 2.0, 3.0], "altitude": in_grid},
+    )
+
+    result = regrid.to_uniform_spacing(data, "altitude", out_grid, 1.0)
+
+    transform = xr.DataArray(
+        regrid.rectangle_weights(in_grid, out_grid, 1.0).toarray(),
+        dims=["altitude2", "altitude"],
+        coords={"altitude2": out_grid},
+    )
+    expected = (transform @ data).rename({"altitude2": "altitude"})
+
+    assert result.dims == expected.dims
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+    np.testing.assert_array_equal(result["wavelength"], data["wavelength"])
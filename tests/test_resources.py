@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from hawcsimulator import resources
+
+
+def test_resource_loaded_once():
+    calls = []
+
+    @resources.register("test.resource")
+    def _loader():
+        calls.append(1)
+        return object()
+
+    a = resources.get("test.resource")
+    b = resources.get("test.resource")
+    assert a is b
+    assert len(calls) == 1
+    assert "test.resource" in resources.loaded()
+
+    resources.release(["test.resource"])
+    assert "test.resource" not in resources.loaded()
+
+    resources.warm_up(["test.resource"])
+    assert len(calls) == 2
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import multiprocessing
+import sys
+import types
+
+import numpy as np
+import pytest
+import simulator_steps
+import xarray as xr
+
+from hawcsimulator.noise import NoiseStreams
+from hawcsimulator.simulator import Simulator
+
+
+def doubled(value: float) -> float:
+    return 2 * value
+
+
+# Minimal step module so the tests don't depend on any external databases
+steps = types.ModuleType("test_simulator_steps")
+doubled.__module__ = steps.__name__
+steps.doubled = doubled
+sys.modules[steps.__name__] = steps
+
+
+def test_driver_cache_reused():
+    Simulator.clear_driver_cache()
+    Simulator._driver_cache.reset_stats()
+
+    simulator = Simulator()
+    simulator._initialize_data = dict
+
+    assert simulator.run(["doubled"], {"value": 1.0}, extra_modules=[steps])[
+        "doubled"
+    ] == 2.0
+    simulator.run(["doubled"], {"value": 2.0}, extra_modules=[steps])
+
+    info = Simulator.driver_cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 1
+    assert info["size"] == 1
+
+    simulator.run(["doubled"], {"value": 1.0}, extra_modules=[steps], config={"extra": 1})
+    assert Simulator.driver_cache_info()["size"] == 2
+
+    Simulator.clear_driver_cache()
+    assert Simulator.driver_cache_info()["size"] == 0
+
+
+def test_driver_cache_key():
+    Simulator.clear_driver_cache()
+
+    simulator = Simulator()
+    simulator._initialize_data = dict
+
+    # Large arrays with identical (truncated) reprs, and lists vs tuples, are different configurations
+    large = np.zeros(5000)
+    changed = large.copy()
+    changed[2500] = 1
+    assert repr(large) == repr(changed)
+    for extra in [large, changed, [1, 2], (1, 2)]:
+        simulator.run(["doubled"], {"value": 1.0}, extra_modules=[steps], config={"extra": extra})
+    assert Simulator.driver_cache_info()["size"] == 4
+
+    # New profilers reuse the cached driver
+    for _ in range(2):
+        simulator._profiler = None
+        simulator.run(
+            ["doubled"], {"value": 1.0}, extra_modules=[steps], config={"extra": (1, 2)}, profile=True
+        )
+    assert Simulator.driver_cache_info()["size"] == 4
+
+    Simulator.clear_driver_cache()
+
+
+def profile(value: float, tangent_latitude: float) -> xr.Dataset:
+    return xr.Dataset(
+        {"h2o": (["altitude"], value * np.ones(3) + tangent_latitude)},
+        coords={"altitude": [0.0, 1.0, 2.0]},
+    )
+
+
+profile.__module__ = steps.__name__
+steps.profile = profile
+
+
+def test_run_curtain(tmp_path):
+    simulator = Simulator()
+    simulator._initialize_data = dict
+
+    result = simulator.run_curtain(
+        ["profile", "doubled"],
+        {"value": 1.0},
+        latitudes=np.array([-10.0, 0.0, 10.0, 20.0]),
+        stride=2,
+        output_file=tmp_path / "curtain.nc",
+        n_workers=1,
+        extra_modules=[steps],
+    )
+
+    assert result["profile"]["h2o"].dims == ("latitude", "altitude")
+    np.testing.assert_array_equal(result["profile"]["latitude"], [-10.0, 10.0])
+    np.testing.assert_array_equal(result["profile"]["h2o"].isel(altitude=0), [-9.0, 11.0])
+    assert result["doubled"] == [2.0, 2.0]
+
+    written = xr.open_dataset(tmp_path / "curtain.nc", group="profile")
+    xr.testing.assert_identical(written.load(), result["profile"])
+
+
+def shifted_profile(value: float, tangent_latitude: float) -> xr.Dataset:
+    return xr.Dataset(
+        {"h2o": (["altitude"], value * np.ones(3))},
+        coords={
+            "altitude": [0.0, 1.0, 2.0],
+            "pressure": (["altitude"], np.array([1000.0, 900.0, 800.0]) + tangent_latitude),
+        },
+    )
+
+
+shifted_profile.__module__ = steps.__name__
+steps.shifted_profile = shifted_profile
+
+
+def test_run_curtain_rejects_differing_coordinates():
+    simulator = Simulator()
+    simulator._initialize_data = dict
+
+    with pytest.raises(ValueError, match="pressure"):
+        simulator.run_curtain(
+            ["shifted_profile"],
+            {"value": 1.0},
+            latitudes=np.array([-10.0, 10.0]),
+            n_workers=1,
+            extra_modules=[steps],
+        )
+
+
+def noisy(value: float, noise_streams: NoiseStreams) -> np.ndarray:
+    return value + noise_streams.standard_normal((4,), "value")
+
+
+noisy.__module__ = steps.__name__
+steps.noisy = noisy
+
+
+def test_run_batch_noise_is_reproducible():
+    simulator = Simulator()
+    simulator._initialize_data = dict
+
+    inputs = [{"value": 1.0, "noise_seed": 3}, {"value": 1.0, "noise_seed": 3}]
+    first = simulator.run_batch(inputs, ["noisy"], n_workers=1, extra_modules=[steps])
+    second = simulator.run_batch(
+        inputs[::-1], ["noisy"], n_workers=1, extra_modules=[steps]
+    )
+
+    # Every scene gets its own stream, determined by the seed and the scene index
+    assert not np.allclose(first[0]["noisy"], first[1]["noisy"])
+    np.testing.assert_array_equal(first[0]["noisy"], second[0]["noisy"])
+    np.testing.assert_array_equal(
+        first[1]["noisy"],
+        1.0 + NoiseStreams(3, scene_id=1).standard_normal((4,), "value"),
+    )
+
+
+def test_run_batch_workers_match_serial():
+    simulator = simulator_steps.StepsSimulator()
+    inputs = [{"value": float(i), "noise_seed": 3} for i in range(3)]
+
+    def run(**kwargs):
+        return simulator.run_batch(
+            inputs, ["noisy"], extra_modules=[simulator_steps], **kwargs
+        )
+
+    serial = run(n_workers=1)
+    parallel = run(n_workers=2, mp_context=multiprocessing.get_context("spawn"))
+
+    for s, p in zip(serial, parallel, strict=True):
+        np.testing.assert_array_equal(s["noisy"], p["noisy"])